@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from "react"
+import { useRef, useState } from "react"
 import { Check, CreditCard, Loader2 } from "lucide-react"
 import { motion } from "framer-motion"
 
@@ -20,9 +20,18 @@ type CheckoutCardProps = {
     onPaymentComplete?: (checkoutId: string) => void
 }
 
+// 같은 키로 다시 보내도 결과가 바뀌지 않는 결제 실패 상태
+const TERMINAL_FAILURE_STATUSES = new Set(["declined", "canceled", "cancelled", "expired"])
+
 export default function CheckoutCard({ info, onPaymentComplete }: CheckoutCardProps) {
     const [status, setStatus] = useState<"idle" | "processing" | "success" | "error">("idle")
     const [message, setMessage] = useState("")
+    // 결제 시도당 하나의 키: 네트워크 오류로 재시도할 때는 같은 키를 보내 중복 결제를 막음
+    const idempotencyKey = useRef(crypto.randomUUID())
+    // 결제가 확실히 끝난(실패한) 경우에만 다음 시도에 새 키를 씀. 그 외(진행 중, 네트워크/5xx 오류)는 같은 키로 재시도
+    const rotateIdempotencyKey = () => {
+        idempotencyKey.current = crypto.randomUUID()
+    }
 
     const formatCurrency = (amount: string | number | undefined, currency: string = "USD") => {
         if (amount === undefined || amount === null) return ""
@@ -58,15 +67,20 @@ export default function CheckoutCard({ info, onPaymentComplete }: CheckoutCardPr
             // 2. Call Backend API
             const res = await fetch("http://localhost:8000/api/pay", {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: { "Content-Type": "application/json", "Idempotency-Key": idempotencyKey.current },
                 body: JSON.stringify({
                     store_url: info.storeUrl,
                     checkout_id: info.checkoutId,
                     payment_token: mockToken,
+                    idempotency_key: idempotencyKey.current,
                 }),
             })
 
             if (!res.ok) {
+                // 409는 같은 키의 결제가 아직 처리 중이라는 뜻이므로 키를 유지함
+                if (res.status >= 400 && res.status < 500 && res.status !== 409) {
+                    rotateIdempotencyKey()
+                }
                 throw new Error("Payment API failed")
             }
 
@@ -80,6 +94,10 @@ export default function CheckoutCard({ info, onPaymentComplete }: CheckoutCardPr
                     onPaymentComplete(info.checkoutId)
                 }
             } else {
+                // 상점이 결제를 거절한 결과는 서버에 저장되어 있으므로 그때만 다음 시도를 새 키로 보냄
+                if (data.error || TERMINAL_FAILURE_STATUSES.has(data.status)) {
+                    rotateIdempotencyKey()
+                }
                 throw new Error(data.error || "Payment failed")
             }
         } catch (err) {
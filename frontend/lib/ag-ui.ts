@@ -255,6 +255,11 @@ function extractUpdate(payload: unknown): StreamUpdate {
       value = rawValue as Record<string, unknown>
     }
 
+    // compact 도구 출력 모드: 상품 카드는 도구 결과 대신 CUSTOM "products" 이벤트로 전달됨
+    if (name === "products" && value && Array.isArray(value.products)) {
+      return { products: value.products as ProductCard[], ...(todos ? { todos } : {}) }
+    }
+
     if (name.toLowerCase().includes("status") && value) {
       const label =
         typeof value === "string"
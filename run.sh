@@ -5,6 +5,8 @@ ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 BACKEND_PORT="${BACKEND_PORT:-8000}"
 FRONTEND_PORT="${FRONTEND_PORT:-3001}"
 START_FRONTEND="${START_FRONTEND:-1}"
+# 워커 수 (대화 상태/캐시는 STATE_DIR의 SQLite로 공유됩니다)
+BACKEND_WORKERS="${BACKEND_WORKERS:-1}"
 FRONTEND_PID=""
 
 # Colors
@@ -33,8 +35,8 @@ EOF
 echo ""
 echo -e "${YELLOW}🧹 캐시 정리 시작...${NC}"
 
+# shopping_agent/.cache(공용 캐시)는 지우지 않습니다. 무효화는 CACHE_VERSION으로 합니다.
 cleanup_targets=(
-  "$ROOT_DIR/shopping_agent/.cache"
   "$ROOT_DIR/__pycache__"
   "$ROOT_DIR/frontend/.next"
   "$ROOT_DIR/frontend/node_modules/.cache"
@@ -110,6 +112,6 @@ if [ "$START_FRONTEND" != "0" ] && [ -d "$ROOT_DIR/frontend" ]; then
 fi
 
 echo ""
-echo -e "${CYAN}🚀 에이전트 서버 실행 (포트 $BACKEND_PORT)${NC}"
+echo -e "${CYAN}🚀 에이전트 서버 실행 (포트 $BACKEND_PORT, 워커 $BACKEND_WORKERS)${NC}"
 echo -e "${BOLD}   (종료하려면 Ctrl+C)${NC}"
-uv run uvicorn shopping_agent.api.app:app --host 0.0.0.0 --port "$BACKEND_PORT"
+uv run uvicorn shopping_agent.api.app:app --host 0.0.0.0 --port "$BACKEND_PORT" --workers "$BACKEND_WORKERS"
@@ -0,0 +1,122 @@
+"""
+codec 벤치마크: 표준 json과 shopping_agent.codec(현재 백엔드)의 인코딩/디코딩 시간 비교
+
+    PYTHONPATH=. python scripts/bench_codec.py
+
+상품 .js 디코딩, L2 캐시 값 인코딩, JSON-RPC 요청 본문, 체크아웃 응답, 도구 결과(<products>)처럼
+실제 핫패스에서 다루는 크기의 payload를 씁니다. 마지막에 두 경로의 출력이 같은지도 확인합니다.
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+
+from shopping_agent import codec
+
+
+def _product() -> dict:
+    variants = [
+        {
+            "id": 40000000000 + i,
+            "title": f"Size {i} / Color {i % 7}",
+            "option1": f"{i}",
+            "option2": "Black",
+            "option3": None,
+            "sku": f"SKU-{i:05d}",
+            "requires_shipping": True,
+            "taxable": True,
+            "featured_image": None,
+            "available": i % 3 != 0,
+            "name": f"Product - Size {i}",
+            "public_title": f"Size {i}",
+            "options": [f"{i}", "Black"],
+            "price": 12800 + i,
+            "weight": 450,
+            "compare_at_price": None,
+            "inventory_management": "shopify",
+            "barcode": "",
+            "requires_selling_plan": False,
+            "selling_plan_allocations": [],
+        }
+        for i in range(80)
+    ]
+    return {
+        "id": 7000000001,
+        "title": "Merino Wool Crew — 메리노 니트",
+        "handle": "merino-crew",
+        "description": "<p>" + "Soft merino. " * 200 + "</p>",
+        "published_at": "2025-01-01T00:00:00-05:00",
+        "created_at": "2024-12-01T00:00:00-05:00",
+        "vendor": "X",
+        "type": "Sweater",
+        "tags": ["wool", "knit"] * 10,
+        "price": 12800,
+        "price_min": 12800,
+        "price_max": 12880,
+        "available": True,
+        "price_varies": True,
+        "compare_at_price": None,
+        "variants": variants,
+        "images": [f"//cdn.shopify.com/s/files/1/x/{i}.jpg" for i in range(12)],
+        "featured_image": "//cdn.shopify.com/s/files/1/x/0.jpg",
+        "options": [{"name": "Size", "position": 1, "values": [str(i) for i in range(80)]}],
+        "url": "/products/merino-crew",
+    }
+
+
+def _checkout() -> dict:
+    return {
+        "id": "c-1",
+        "status": "ready_for_complete",
+        "currency": "USD",
+        "line_items": [
+            {
+                "id": f"li-{i}",
+                "item": {"id": str(i), "title": "Item 상품", "price": 1000, "image_url": "https://x/y.jpg"},
+                "quantity": 1,
+                "totals": [{"type": "subtotal", "amount": 1000}],
+            }
+            for i in range(5)
+        ],
+        "totals": [{"type": "subtotal", "amount": 5000}, {"type": "total", "amount": 5500}],
+        "messages": [],
+        "links": [{"type": "terms", "url": "https://x"}],
+    }
+
+
+def _compact(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def bench(label: str, baseline, candidate, number: int) -> None:
+    base = min(timeit.repeat(baseline, number=number, repeat=5)) / number * 1e6
+    ours = min(timeit.repeat(candidate, number=number, repeat=5)) / number * 1e6
+    print(f"{label:34s} stdlib {base:8.1f}us  codec {ours:8.1f}us  x{base / ours:.1f}")
+
+
+def main() -> None:
+    product = _product()
+    raw = json.dumps(product).encode()
+    checkout = _checkout()
+    checkout_text = json.dumps(checkout)
+    rpc = {"jsonrpc": "2.0", "id": "x", "method": "create_checkout", "params": {"checkout": checkout}}
+    products = {
+        "total": 20,
+        "products": [{"id": i, "title": f"상품 {i}", "handle": f"h-{i}", "price": "128.00"} for i in range(10)],
+    }
+
+    print(f"backend {codec.BACKEND}, product .js {len(raw)} bytes")
+    bench(f"loads product .js ({len(raw) // 1024}KB)", lambda: json.loads(raw), lambda: codec.decode_product(raw), 500)
+    bench("dumps product (cache L2)", lambda: _compact(product), lambda: codec.dumps(product), 500)
+    bench("dumps JSON-RPC create_checkout", lambda: json.dumps(rpc).encode(), lambda: codec.dumpb(rpc), 5000)
+    bench("loads checkout", lambda: json.loads(checkout_text), lambda: codec.decode_checkout(checkout_text), 5000)
+    bench("dumps <products> output", lambda: _compact(products), lambda: codec.dumps(products), 5000)
+
+    assert codec.loads(codec.dumps(product)) == product
+    assert codec.dumps(products) == _compact(products)
+    print("same output as stdlib compact: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Admission Control
+
+/agent 스트리밍 실행 수를 제한해 요청이 몰려도 LLM/상점 호출이 무한정 늘어나지 않게 합니다.
+
+- 전체(global)와 상점별 동시 실행 상한
+- 상한에 걸리면 정해진 길이의 대기열에서 queue_timeout까지 기다림
+- 대기열이 가득 찼거나 시간 안에 자리가 나지 않으면 즉시 429 + Retry-After
+
+AdmissionMiddleware가 /agent, /agent/{store} 요청 전체(스트림 종료까지)에 슬롯을 잡고,
+라우터(/agent)는 상점이 정해진 뒤 상점 노드에서 상점 슬롯을 잡습니다.
+"""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, Optional
+import asyncio
+import json
+import logging
+import math
+import time
+
+from shopping_agent.config import AdmissionConfig, config
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """대기열이 가득 찼거나 대기 시간이 초과되어 실행을 받지 못함"""
+
+    def __init__(self, scope: str, reason: str, retry_after: int):
+        super().__init__(f"rate limit: {scope} busy ({reason}), retry after {retry_after}s")
+        self.scope = scope
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Limiter:
+    """동시 실행 상한 + 제한된 길이의 FIFO 대기열"""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+
+    async def acquire(self, timeout: float, retry_after: int) -> None:
+        if self._semaphore.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                raise AdmissionRejected(self.name, "queue full", retry_after)
+            self.waiting += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(self.name, "queue timeout", retry_after) from None
+            finally:
+                self.waiting -= 1
+                metrics.observe("admission.wait_seconds", time.monotonic() - started)
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting}
+
+
+class AdmissionController:
+    """전체/상점별 실행 슬롯 관리자"""
+
+    def __init__(self, settings: AdmissionConfig, stores: Iterable[str] = ()):
+        self.settings = settings
+        self._global = _Limiter("global", settings.max_concurrent_runs, settings.max_queue)
+        self._stores = {name: self._store_limiter(name) for name in stores}
+
+    def _store_limiter(self, store: str) -> _Limiter:
+        return _Limiter(store, self.settings.max_concurrent_per_store, self.settings.max_queue)
+
+    def _limiter(self, store: str) -> _Limiter:
+        limiter = self._stores.get(store)
+        if limiter is None:
+            limiter = self._stores[store] = self._store_limiter(store)
+        return limiter
+
+    def retry_after(self) -> int:
+        """대기열이 빠지는 데 걸릴 시간 추정치 (최근 실행 시간 중앙값 기준)"""
+        typical = metrics.percentile("admission.run_seconds", 0.5) or self.settings.retry_after
+        backlog = self._global.waiting / self._global.limit
+        return int(min(max(1, math.ceil(typical * max(backlog, 1.0))), 60))
+
+    async def _acquire(self, limiter: _Limiter, timeout: float) -> None:
+        try:
+            await limiter.acquire(timeout, self.retry_after())
+        except AdmissionRejected as exc:
+            metrics.incr("admission.rejected")
+            metrics.incr(f"admission.rejected.{exc.scope}")
+            logger.warning(f"[Admission] rejected: {exc}")
+            raise
+
+    @asynccontextmanager
+    async def run(self, store: Optional[str] = None) -> AsyncIterator[None]:
+        """요청 하나의 실행 슬롯 (store가 있으면 상점 슬롯 → 전체 슬롯 순으로 확보)"""
+        deadline = time.monotonic() + self.settings.queue_timeout
+        acquired: list[_Limiter] = []
+        try:
+            for limiter in ([self._limiter(store)] if store else []) + [self._global]:
+                await self._acquire(limiter, max(deadline - time.monotonic(), 0.0))
+                acquired.append(limiter)
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                metrics.observe("admission.run_seconds", time.monotonic() - started)
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    @asynccontextmanager
+    async def store_slot(self, store: str) -> AsyncIterator[None]:
+        """라우터 실행 안에서 상점이 정해진 뒤 잡는 상점 슬롯 (전체 슬롯은 이미 확보됨)"""
+        limiter = self._limiter(store)
+        await self._acquire(limiter, self.settings.queue_timeout)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "global": self._global.snapshot(),
+            "stores": {name: limiter.snapshot() for name, limiter in self._stores.items()},
+            "queue_depth": self._global.waiting + sum(limiter.waiting for limiter in self._stores.values()),
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        from shopping_agent.agents.stores import STORE_URLS
+
+        _controller = AdmissionController(config.admission, STORE_URLS.keys())
+    return _controller
+
+
+class AdmissionMiddleware:
+    """/agent 스트리밍 엔드포인트 앞단의 ASGI 미들웨어 (스트림이 끝날 때까지 슬롯 유지)"""
+
+    def __init__(self, app, prefix: str = "/agent", controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.prefix = prefix
+        self._controller = controller
+
+    def _store_for(self, path: str) -> Optional[str]:
+        rest = path[len(self.prefix):].strip("/")
+        return rest.split("/")[0] or None
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope.get("method") != "POST"
+            or not (path == self.prefix or path.startswith(f"{self.prefix}/"))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self._controller or get_admission_controller()
+        try:
+            async with controller.run(self._store_for(path)):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as exc:
+            await self._reject(send, exc)
+
+    @staticmethod
+    async def _reject(send, exc: AdmissionRejected) -> None:
+        body = json.dumps({"error": str(exc), "retry_after": exc.retry_after}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(exc.retry_after).encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
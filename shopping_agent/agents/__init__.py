@@ -1,12 +1,22 @@
-from shopping_agent.agents.routing import create_store_router_graph
-from shopping_agent.agents.store_agent import create_store_agent
+from shopping_agent.agents.classifier import StorePrediction, classify_store
+from shopping_agent.agents.registry import StoreGraphRegistry
+from shopping_agent.agents.routing import create_store_router_graph, routing_stats
+from shopping_agent.agents.store_agent import create_store_agent, get_chat_model
 from shopping_agent.agents.store_factory import StoreAgentFactory
 from shopping_agent.agents.stores import STORE_PROMPTS, STORE_URLS
+from shopping_agent.agents.tool_cache import ToolResultCacheMiddleware, tool_cache_stats
 
 __all__ = [
     "STORE_PROMPTS",
     "STORE_URLS",
     "StoreAgentFactory",
+    "StoreGraphRegistry",
+    "StorePrediction",
+    "ToolResultCacheMiddleware",
+    "classify_store",
     "create_store_agent",
     "create_store_router_graph",
+    "get_chat_model",
+    "routing_stats",
+    "tool_cache_stats",
 ]
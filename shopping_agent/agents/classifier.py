@@ -0,0 +1,203 @@
+"""
+Local Store Classifier
+
+LLM 라우팅 전에 실행하는 결정적(deterministic) 1차 분류기입니다.
+STORE_PROMPTS/STORE_URLS에서 만든 브랜드/키워드 사전과
+문자 n-gram 나이브 베이즈 모델로 상점과 신뢰도를 반환합니다.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+from shopping_agent.agents.stores import STORE_PROMPTS, STORE_URLS
+
+# 상점명 한글 표기 (사전에서 상점명과 같은 강한 신호로 취급)
+_STORE_ALIASES = {
+    "monos": ["모노스"],
+    "everlane": ["에버레인"],
+    "allbirds": ["올버즈", "올버드"],
+}
+
+# 한 상점에서만 파는 브랜드 (상점명과 같은 명시적 신호로 취급)
+_STORE_BRANDS = {
+    "kith": ["nike", "나이키", "new balance", "뉴발란스", "adidas", "아디다스", "jordan", "조던"],
+}
+
+# 프롬프트에 없는 대표 상품 키워드 (사전에 추가)
+_EXTRA_KEYWORDS = {
+    "monos": ["캐리어", "수하물", "luggage", "suitcase", "carry-on"],
+    "everlane": ["티셔츠", "청바지", "캐시미어", "t-shirt", "denim", "cashmere"],
+    "allbirds": ["울 러너", "wool runner", "tree runner", "tree dasher"],
+    "kith": ["덩크", "dunk"],
+}
+
+# 프롬프트만으로는 부족한 학습 예시 (요청 동사는 상점과 무관하므로 명사구만 사용)
+_SEED_EXAMPLES = {
+    "monos": ["기내용 캐리어", "여행 가방", "수하물 가방", "carry-on luggage"],
+    "everlane": ["니트 스웨터", "셔츠", "cashmere sweater", "denim jeans"],
+    "allbirds": ["울 러너", "편한 신발", "울 슈즈", "wool runners", "러닝화"],
+    "kith": ["나이키 덩크", "뉴발란스 990", "아디다스 삼바", "스니커즈", "nike dunk", "jordan 1", "hoodie"],
+    "general": ["안녕", "안녕하세요", "하이", "hi", "hello", "고마워", "감사합니다", "뭐 할 수 있어?", "어떤 상점이 있어?", "도와줘"],
+}
+
+_NGRAM_RANGE = (2, 3)
+_SMOOTHING = 0.5
+
+
+@dataclass(frozen=True)
+class StorePrediction:
+    store: Optional[str]
+    confidence: float
+    # lexicon-name: 상점명/브랜드, lexicon: 상품 키워드, model: n-gram 모델 (+model: 모델도 같은 상점)
+    source: str
+
+    @property
+    def explicit(self) -> bool:
+        """상점명이나 그 상점 브랜드를 직접 언급했는지"""
+        return self.source.startswith("lexicon-name")
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s.\-]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _ngrams(text: str) -> list[str]:
+    grams: list[str] = []
+    for token in _normalize(text).split(" "):
+        if not token:
+            continue
+        padded = f"<{token}>"
+        for n in range(_NGRAM_RANGE[0], _NGRAM_RANGE[1] + 1):
+            grams.extend(padded[i:i + n] for i in range(max(len(padded) - n + 1, 0)))
+    return grams
+
+
+def _split_keywords(text: str) -> list[str]:
+    parts = re.split(r",|\s등\s|\s및\s|\s등$", text)
+    return [part.strip().lower() for part in parts if len(part.strip()) >= 2]
+
+
+def _store_descriptions() -> dict[str, list[str]]:
+    """상점 프롬프트의 소개 문장과 general 프롬프트의 '지원 상점 안내' 항목을 모읍니다."""
+    descriptions: dict[str, list[str]] = {name: [] for name in STORE_PROMPTS}
+    for name, prompt in STORE_PROMPTS.items():
+        for line in prompt.splitlines():
+            stripped = line.strip()
+            if name != "general" and stripped.lower().startswith(name) and "는 " in stripped:
+                descriptions[name].append(stripped)
+            match = re.match(r"- \*\*(\w+)\*\*:\s*(.+)", stripped)
+            if match and match.group(1).lower() in descriptions:
+                descriptions[match.group(1).lower()].append(match.group(2))
+    return descriptions
+
+
+def _build_lexicon(descriptions: dict[str, list[str]]) -> tuple[dict[str, set[str]], dict[str, set[str]]]:
+    names: dict[str, set[str]] = {}
+    keywords: dict[str, set[str]] = {}
+    for store, url in STORE_URLS.items():
+        if not url:
+            continue
+        host = urlparse(url).netloc.lower().removeprefix("www.")
+        names[store] = {store, host, host.split(".")[0], *_STORE_ALIASES.get(store, []), *_STORE_BRANDS.get(store, [])}
+        words: set[str] = set()
+        for text in descriptions.get(store, []):
+            body = re.sub(r"^\w+(는|은)\s", "", text)
+            body = re.sub(r"(을|를)?\s*(판매합니다|로 유명합니다|으로 유명합니다)\.?$", "", body)
+            words.update(_split_keywords(body))
+            words.update(w.lower() for w in re.findall(r"[A-Z][a-zA-Z]+(?: [A-Z][a-zA-Z]+)*", body))
+        words.update(_EXTRA_KEYWORDS.get(store, []))
+        keywords[store] = {w for w in words if w not in names[store]}
+    return names, keywords
+
+
+class _NaiveBayes:
+    def __init__(self, examples: dict[str, list[str]]):
+        self.labels = sorted(examples)
+        self.counts = {label: Counter() for label in self.labels}
+        for label, texts in examples.items():
+            for text in texts:
+                self.counts[label].update(_ngrams(text))
+        self.totals = {label: sum(counter.values()) for label, counter in self.counts.items()}
+        self.vocab = set().union(*self.counts.values())
+
+    def predict(self, text: str) -> tuple[Optional[str], float, float]:
+        grams = _ngrams(text)
+        if not grams:
+            return None, 0.0, 0.0
+        coverage = sum(1 for gram in grams if gram in self.vocab) / len(grams)
+        vocab_size = len(self.vocab)
+        scores = {}
+        for label in self.labels:
+            denominator = self.totals[label] + _SMOOTHING * vocab_size
+            scores[label] = sum(
+                math.log((self.counts[label][gram] + _SMOOTHING) / denominator) for gram in grams
+            )
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        norm = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / norm, coverage
+
+
+class StoreClassifier:
+    """사전 + n-gram 나이브 베이즈 기반 상점 분류기"""
+
+    def __init__(self) -> None:
+        descriptions = _store_descriptions()
+        self.store_names, self.store_keywords = _build_lexicon(descriptions)
+        examples = {store: list(texts) for store, texts in descriptions.items()}
+        for store, texts in _SEED_EXAMPLES.items():
+            examples.setdefault(store, []).extend(texts)
+        for store in self.store_names:
+            examples[store].extend(self.store_names[store] | self.store_keywords[store])
+        self.model = _NaiveBayes(examples)
+
+    def lexicon_match(self, text: str) -> StorePrediction:
+        normalized = _normalize(text)
+        named = [store for store, names in self.store_names.items() if any(name in normalized for name in names)]
+        if len(named) == 1:
+            return StorePrediction(named[0], 0.95, "lexicon-name")
+        if len(named) > 1:
+            return StorePrediction(None, 0.0, "lexicon-ambiguous")
+
+        hits = {
+            store: sum(1 for keyword in keywords if keyword in normalized)
+            for store, keywords in self.store_keywords.items()
+        }
+        matched = [store for store, count in hits.items() if count]
+        if len(matched) == 1:
+            store = matched[0]
+            return StorePrediction(store, min(0.85 + 0.05 * (hits[store] - 1), 0.9), "lexicon")
+        return StorePrediction(None, 0.0, "lexicon")
+
+    def predict(self, text: str) -> StorePrediction:
+        lexical = self.lexicon_match(text)
+        if lexical.source == "lexicon-ambiguous":
+            # 여러 상점이 함께 언급되면 LLM이 문맥으로 판단하도록 넘깁니다.
+            return lexical
+        label, probability, coverage = self.model.predict(text)
+        # 학습 어휘로 설명되지 않는 문장은 확률이 높아도 신뢰하지 않습니다.
+        model_confidence = probability * coverage
+        if lexical.store:
+            if label == lexical.store:
+                return StorePrediction(lexical.store, max(lexical.confidence, model_confidence), f"{lexical.source}+model")
+            return lexical
+        return StorePrediction(label, model_confidence, "model")
+
+
+_classifier: Optional[StoreClassifier] = None
+
+
+def get_store_classifier() -> StoreClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = StoreClassifier()
+    return _classifier
+
+
+def classify_store(text: str) -> StorePrediction:
+    return get_store_classifier().predict(text)
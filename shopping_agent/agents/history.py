@@ -0,0 +1,170 @@
+"""
+History Budget Middleware
+
+상점 에이전트의 모델 호출마다 메시지 기록을 토큰 예산 안으로 줄입니다.
+저장된 state는 그대로 두고 모델에 보내는 요청만 바꿉니다.
+
+1. 이전 턴의 도구 결과를 짧은 요약으로 접습니다.
+   (가장 최근 상품 목록/체크아웃은 구조화된 JSON으로 남깁니다)
+2. 그래도 예산을 넘으면 오래된 턴부터 빼고, 뺀 요청은 시스템 프롬프트에 한 줄씩 요약합니다.
+"""
+
+import logging
+import re
+from typing import Any, Optional
+
+from deepagents.graph import AgentMiddleware
+from langchain_core.messages import AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from shopping_agent import codec
+from shopping_agent.config import config
+from shopping_agent.metrics import metrics
+from shopping_agent.tools.output import compact_checkout, dumps
+
+logger = logging.getLogger(__name__)
+
+_PRODUCTS_BLOCK = re.compile(r"<products>\s*(.*?)\s*</products>", re.DOTALL)
+
+
+def _count(messages: list[AnyMessage]) -> int:
+    return count_tokens_approximately(messages)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}… (+{len(text) - limit}자 생략)"
+
+
+def _parse_products(content: str) -> Optional[list[dict]]:
+    match = _PRODUCTS_BLOCK.search(content)
+    if not match:
+        return None
+    try:
+        products = codec.loads(match.group(1)).get("products")
+    except (ValueError, AttributeError):
+        return None
+    return products if isinstance(products, list) else None
+
+
+def _parse_checkout(content: str) -> Optional[dict]:
+    start = content.find("{")
+    if start < 0:
+        return None
+    try:
+        payload = codec.loads(content[start:])
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not ("status" in payload and ("id" in payload or "line_items" in payload)):
+        return None
+    return payload
+
+
+def _compact_products(products: list[dict]) -> list[dict]:
+    keys = ("id", "title", "handle", "price", "url", "store_url")
+    return [{key: product.get(key) for key in keys if product.get(key) is not None} for product in products]
+
+
+def _checkout_summary(payload: dict) -> str:
+    totals = {t.get("type"): t.get("amount") for t in payload.get("totals") or [] if isinstance(t, dict)}
+    total = totals.get("total")
+    suffix = f", total={total}" if total is not None else ""
+    return f"[이전 체크아웃] id={payload.get('id')}, status={payload.get('status')}{suffix}"
+
+
+def _products_summary(products: list[dict]) -> str:
+    titles = ", ".join(f"{p.get('title')}({p.get('handle')})" for p in products[:5])
+    return f"[이전 검색 결과 {len(products)}개] {titles}"
+
+
+class HistoryBudgetMiddleware(AgentMiddleware):
+    """모델 호출당 토큰 예산을 지키도록 이전 턴 도구 결과를 접고 오래된 턴을 덜어내는 미들웨어"""
+
+    def __init__(self, token_budget: Optional[int] = None, tool_summary_chars: Optional[int] = None):
+        super().__init__()
+        self.token_budget = token_budget or config.agent.history_token_budget
+        self.tool_summary_chars = tool_summary_chars or config.agent.history_tool_summary_chars
+
+    def _collapse_tool_results(self, messages: list[AnyMessage], turn_start: int) -> tuple[list[AnyMessage], dict[int, str]]:
+        """이전 턴 도구 결과를 접고, (접은 메시지, 구조화 상태로 남긴 메시지 index → 내용)을 반환합니다."""
+        latest_products = latest_checkout = None
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+                continue
+            if latest_products is None and _parse_products(message.content) is not None:
+                latest_products = index
+            if latest_checkout is None and _parse_checkout(message.content) is not None:
+                latest_checkout = index
+
+        collapsed = list(messages)
+        structured: dict[int, str] = {}
+        for index, message in enumerate(messages[:turn_start]):
+            if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+                continue
+            content = message.content
+            if (products := _parse_products(content)) is not None:
+                if index == latest_products:
+                    text = f"<products>\n{dumps({'products': _compact_products(products)})}\n</products>"
+                    structured[index] = text
+                else:
+                    text = _products_summary(products)
+            elif (checkout := _parse_checkout(content)) is not None:
+                if index == latest_checkout:
+                    text = dumps(compact_checkout(checkout))
+                    structured[index] = text
+                else:
+                    text = _checkout_summary(checkout)
+            else:
+                text = _truncate(content, self.tool_summary_chars)
+            if text != content:
+                collapsed[index] = message.model_copy(update={"content": text})
+        return collapsed, structured
+
+    def _drop_old_turns(self, messages: list[AnyMessage]) -> int:
+        """예산에 맞을 때까지 앞에서부터 뺄 메시지 수를 반환합니다."""
+        start = 0
+        while _count(messages[start:]) > self.token_budget:
+            # 턴 경계(HumanMessage)에서만 잘라야 도구 호출/결과 쌍이 깨지지 않습니다.
+            next_turn = next(
+                (i for i in range(start + 1, len(messages)) if isinstance(messages[i], HumanMessage)),
+                None,
+            )
+            if next_turn is None:
+                break
+            start = next_turn
+        return start
+
+    def _apply(self, request: Any) -> Any:
+        messages = list(request.messages)
+        before = _count(messages)
+        if before <= self.token_budget:
+            return request
+
+        turn_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        messages, structured = self._collapse_tool_results(messages, turn_start)
+        cut = self._drop_old_turns(messages)
+        dropped = [_truncate(m.text, 80) for m in messages[:cut] if isinstance(m, HumanMessage)]
+        messages = messages[cut:]
+
+        overrides: dict[str, Any] = {"messages": messages}
+        if cut:
+            # 빠진 턴의 요청과, 빠진 턴에 있던 최신 상품/체크아웃 상태는 시스템 프롬프트로 옮깁니다.
+            summary = "\n".join(f"- {text}" for text in dropped[-5:])
+            note = f"\n\n## 이전 대화 요약 (자동 축약)\n사용자가 앞서 요청한 내용:\n{summary}"
+            carried = [text for index, text in sorted(structured.items()) if index < cut]
+            if carried:
+                note += "\n\n최근 상품/체크아웃 상태:\n" + "\n".join(carried)
+            overrides["system_prompt"] = f"{request.system_prompt or ''}{note}"
+
+        after = _count(messages)
+        saved = before - after
+        metrics.observe("history.tokens_saved", saved)
+        metrics.observe("history.tokens_sent", after)
+        logger.info(f"[History] {before} -> {after} tokens (saved {saved}, dropped {cut} messages)")
+        return request.override(**overrides)
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._apply(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._apply(request))
@@ -0,0 +1,52 @@
+"""
+Store Graph Registry
+
+상점 그래프를 처음 사용할 때 컴파일해 보관하는 지연 레지스트리입니다.
+"""
+
+import threading
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+
+class StoreGraphRegistry(Mapping):
+    """상점명 → 컴파일된 그래프 (최초 접근 시 생성, thread-safe)
+
+    키 목록은 생성 시점에 고정되며, 그래프는 `registry[name]`으로
+    처음 접근할 때 factory로 한 번만 만들어집니다.
+    """
+
+    def __init__(self, names: Iterable[str], factory: Callable[[str], Any]):
+        self._names = tuple(names)
+        self._factory = factory
+        self._graphs: dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in self._names}
+
+    def __getitem__(self, name: str) -> Any:
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+        lock = self._locks.get(name)
+        if lock is None:
+            raise KeyError(name)
+        with lock:
+            graph = self._graphs.get(name)
+            if graph is None:
+                graph = self._factory(name)
+                self._graphs[name] = graph
+        return graph
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._locks
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def is_built(self, name: str) -> bool:
+        return name in self._graphs
+
+    def built(self) -> list[str]:
+        return [name for name in self._names if name in self._graphs]
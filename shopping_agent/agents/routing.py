@@ -1,13 +1,29 @@
+import asyncio
 import logging
-from typing import Any, TypedDict
+import re
+from collections.abc import Mapping
+from typing import Any, Optional, TypedDict
 
-from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.config import get_config
 from langgraph.graph import END, StateGraph
 
+from shopping_agent.admission import get_admission_controller
+from shopping_agent.agents.classifier import StorePrediction, classify_store
+from shopping_agent.agents.speculation import speculations
 from shopping_agent.agents.store_factory import StoreAgentFactory
+from shopping_agent.config import config
+from shopping_agent.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# 구매/결제 후속 요청은 직전 상점에 머물러야 합니다.
+# 영어 단어는 border, buyer 같은 다른 단어 속에서 걸리지 않도록 단어 경계로 찾습니다.
+_PURCHASE_INTENT = re.compile(
+    r"결제|구매|주문|살래|살게|사줘|장바구니|담아|체크아웃|\b(?:checkout|buy|purchase|order)\b",
+    re.IGNORECASE,
+)
+
 
 from typing import Any, Annotated, TypedDict
 from langgraph.graph.message import add_messages
@@ -57,15 +73,96 @@ def _last_user_message(messages: list) -> str:
     return ""
 
 
+def _has_assistant_turn(messages: list) -> bool:
+    return any(_message_role(message).lower() in {"assistant", "ai"} for message in messages)
+
+
+def _resolve_sticky(
+    previous: str,
+    user_message: str,
+    prediction: StorePrediction,
+    store_names: Mapping[str, Any],
+) -> tuple[Optional[str], str]:
+    """직전 상점이 있는 스레드에서 로컬 규칙으로 상점을 정합니다.
+
+    Returns:
+        (상점, 사유). 상점이 None이면 LLM 재라우팅이 필요합니다.
+    """
+    candidate = prediction.store
+    if prediction.source == "lexicon-ambiguous":
+        return None, "ambiguous"
+    switching = candidate not in (None, previous, "general") and candidate in store_names
+    # 상품 키워드/모델 추측만으로는 옮기지 않습니다 (이전 상점도 답할 수 있는 후속 질문일 수 있음).
+    if switching and prediction.explicit and prediction.confidence >= config.agent.router_local_threshold:
+        return candidate, "switch"
+    if _PURCHASE_INTENT.search(user_message):
+        return previous, "purchase"
+    if switching and prediction.confidence >= config.agent.router_reroute_threshold:
+        return None, "possible-switch"
+    return previous, "follow-up"
+
+
+def routing_stats() -> dict:
+    """로컬 분류기/고정 라우팅으로 생략한 라우터 LLM 호출 비율"""
+    local = metrics.counter("router.local")
+    sticky = metrics.counter("router.sticky")
+    llm = metrics.counter("router.llm")
+    total = local + sticky + llm
+    return {
+        "local": local,
+        "sticky": sticky,
+        "llm": llm,
+        "llm_avoided_ratio": round((local + sticky) / total, 3) if total else None,
+    }
+
+
 def _select_messages(state: RouterState) -> dict:
     return {"messages": state.get("messages", [])}
 
 
+async def _aget_graph(store_agents: Mapping[str, Any], store_name: str) -> Any:
+    """상점 그래프 조회. 지연 레지스트리에서 아직 컴파일 전이면 이벤트 루프 밖에서 컴파일합니다."""
+    is_built = getattr(store_agents, "is_built", None)
+    if is_built is None or is_built(store_name):
+        return store_agents[store_name]
+    return await asyncio.to_thread(store_agents.__getitem__, store_name)
+
+
+def _store_node(store_agents: Mapping[str, Any], store_name: str) -> RunnableLambda:
+    """상점 그래프를 실행 시점에 조회하는 노드 (지연 레지스트리면 이때 컴파일됨)"""
+
+    def invoke(state: RouterState, config: RunnableConfig) -> dict:
+        return store_agents[store_name].invoke(_select_messages(state), config)
+
+    async def ainvoke(state: RouterState, config: RunnableConfig) -> dict:
+        try:
+            # 라우터 run은 상점이 정해진 지금 상점별 실행 슬롯을 잡습니다.
+            async with get_admission_controller().store_slot(store_name):
+                graph = await _aget_graph(store_agents, store_name)
+                return await graph.ainvoke(_select_messages(state), config)
+        finally:
+            thread_id = config.get("configurable", {}).get("thread_id")
+            if thread_id:
+                await speculations.discard(thread_id)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=store_name)
+
+
 def create_store_router_graph(
-    store_agents: dict[str, Any],
+    store_agents: Mapping[str, Any],
     default_store: str = "general",
     checkpointer: Any = None,
+    speculative: bool = False,
 ):
+    """
+    상점 자동 라우팅 그래프 생성
+
+    Args:
+        store_agents: 상점명 → 상점 그래프 (StoreGraphRegistry 등 지연 매핑 허용)
+        default_store: 라우팅 실패 시 사용할 상점
+        checkpointer: 라우터 그래프 체크포인터
+        speculative: True면 라우터 LLM 호출과 동시에 유력 상점의 첫 모델 호출을 미리 실행
+    """
     if not store_agents:
         raise ValueError("store_agents must not be empty")
 
@@ -79,17 +176,75 @@ def create_store_router_graph(
         if not user_message:
             logger.info(f"[Router] No user message, using default store: {default_store}")
             return {"store": default_store}
+        prediction = classify_store(user_message)
+
+        # 이전 턴에서 고른 상점은 체크포인트된 state에 남아 있으므로 후속 턴은 그대로 유지합니다.
+        previous = state.get("store")
+        rerouting = False
+        if previous in store_agents and previous != "general" and _has_assistant_turn(messages):
+            sticky_store, reason = _resolve_sticky(previous, user_message, prediction, store_agents)
+            if sticky_store:
+                metrics.incr("router.local" if reason == "switch" else "router.sticky")
+                logger.info(f"[Router] Sticky routing: {previous} -> {sticky_store} ({reason})")
+                return {"store": sticky_store}
+            logger.info(f"[Router] Re-routing from {previous} ({reason})")
+            rerouting = True
+
+        # 대화 도중의 'general' 판정(예: "고마워")과 상점 전환 여부는 문맥 판단이 필요하므로 LLM에 맡깁니다.
+        local_ok = (
+            not rerouting
+            and prediction.store in store_agents
+            and prediction.confidence >= config.agent.router_local_threshold
+            and not (prediction.store == "general" and _has_assistant_turn(messages))
+        )
+        if local_ok:
+            metrics.incr("router.local")
+            logger.info(
+                f"[Router] Local classifier store: {prediction.store} "
+                f"(confidence={prediction.confidence:.2f}, source={prediction.source})"
+            )
+            return {"store": prediction.store}
+
+        metrics.incr("router.llm")
+        run_config = get_config()
+        thread_id = run_config.get("configurable", {}).get("thread_id")
+        spec = None
+        committed = missed = False
         try:
-            # ✨ 개선: 마지막 메시지만 보내는 대신 전체 메시지 기록을 보내 문맥 파악 가능하게 함
-            store = await StoreAgentFactory.detect_store_via_llm(messages)
-            logger.info(f"[Router] LLM detected store: {store}")
-        except Exception as e:
-            logger.error(f"[Router] Error detecting store: {e}")
-            store = default_store
-        if store not in store_agents:
-            logger.warning(f"[Router] Store '{store}' not in agents, using default: {default_store}")
-            store = default_store
-        return {"store": store}
+            if speculative and thread_id:
+                # 'general'은 추측 근거가 약한 경우가 대부분이라 미리 실행하지 않습니다.
+                candidate = previous if previous in store_agents and previous != "general" else prediction.store
+                if candidate in store_agents and candidate != "general":
+                    spec = speculations.start(
+                        thread_id,
+                        candidate,
+                        store_agents[candidate],
+                        _select_messages(state),
+                        recursion_limit=run_config.get("recursion_limit", 200),
+                    )
+            try:
+                # ✨ 개선: 마지막 메시지만 보내는 대신 전체 메시지 기록을 보내 문맥 파악 가능하게 함
+                store = await StoreAgentFactory.detect_store_via_llm(messages)
+                logger.info(f"[Router] LLM detected store: {store}")
+            except Exception as e:
+                logger.error(f"[Router] Error detecting store: {e}")
+                store = default_store
+            if store not in store_agents:
+                logger.warning(f"[Router] Store '{store}' not in agents, using default: {default_store}")
+                store = default_store
+            if spec is not None:
+                if spec.store == store:
+                    speculations.commit(thread_id)
+                    committed = True
+                else:
+                    logger.info(f"[Router] Speculation for {spec.store} cancelled (routed to {store})")
+                    missed = True
+            return {"store": store}
+        finally:
+            # 취소(클라이언트 연결 끊김 등)나 예외로 빠져나가도 추측 실행과 그 체크포인트를 정리해야
+            # 이 thread가 다음 턴에 다시 추측 실행할 수 있습니다.
+            if spec is not None and not committed:
+                await speculations.discard(thread_id, missed=missed)
 
     def select_store(state: RouterState) -> str:
         store = state.get("store", default_store)
@@ -100,11 +255,8 @@ def create_store_router_graph(
     graph = StateGraph(RouterState)
     graph.add_node("route", route)
 
-    for store_name, agent in store_agents.items():
-        graph.add_node(
-            store_name,
-            RunnableLambda(_select_messages) | agent,
-        )
+    for store_name in store_agents:
+        graph.add_node(store_name, _store_node(store_agents, store_name))
         graph.add_edge(store_name, END)
 
     graph.add_conditional_edges(
@@ -0,0 +1,167 @@
+"""
+Speculative Store Execution
+
+라우터 LLM 호출과 동시에 가장 유력한 상점 에이전트의 첫 모델 호출을 미리 실행합니다.
+
+- 추측 실행은 별도(임시) thread에서 tools 노드 직전까지만 돌므로 도구 부작용이 없습니다.
+- 라우터가 같은 상점을 고르면 실제 실행의 첫 모델 호출이 추측 결과를 재사용합니다.
+- 다른 상점을 고르면 추측 실행을 취소하고 임시 thread 체크포인트를 삭제합니다.
+"""
+
+import asyncio
+import contextvars
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from deepagents.graph import AgentMiddleware
+from langchain_core.callbacks import adispatch_custom_event
+from langchain_core.messages import AIMessage
+from langgraph.config import get_config
+
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SPECULATION_KEY = "speculation_id"
+
+
+@dataclass
+class Speculation:
+    id: str
+    thread_id: str
+    store: str
+    agent: Any
+    spec_thread_id: str
+    result: asyncio.Future
+    task: Optional[asyncio.Task] = None
+    committed: bool = False
+    request_signature: Optional[list] = field(default=None, repr=False)
+
+
+def _signature(messages: list) -> list:
+    return [(getattr(m, "type", ""), str(getattr(m, "content", ""))) for m in messages]
+
+
+class SpeculationRegistry:
+    """thread_id별로 진행 중인 추측 실행을 관리합니다."""
+
+    def __init__(self) -> None:
+        self._by_id: dict[str, Speculation] = {}
+        self._by_thread: dict[str, Speculation] = {}
+
+    def start(self, thread_id: str, store: str, agent: Any, payload: dict, recursion_limit: int = 200) -> Optional[Speculation]:
+        # interrupt로 멈춘 지점을 남기려면 체크포인터가 필요합니다.
+        if getattr(agent, "checkpointer", None) is None or thread_id in self._by_thread:
+            return None
+        loop = asyncio.get_running_loop()
+        spec_id = str(uuid.uuid4())
+        spec = Speculation(
+            id=spec_id,
+            thread_id=thread_id,
+            store=store,
+            agent=agent,
+            spec_thread_id=f"{thread_id}:speculative:{spec_id}",
+            result=loop.create_future(),
+        )
+        config = {
+            "configurable": {"thread_id": spec.spec_thread_id, SPECULATION_KEY: spec_id},
+            "callbacks": [],
+            "recursion_limit": recursion_limit,
+        }
+        # 빈 컨텍스트에서 실행해 부모 run의 콜백(스트리밍 이벤트)을 물려받지 않습니다.
+        spec.task = asyncio.create_task(
+            agent.ainvoke(payload, config, interrupt_before=["tools"]),
+            context=contextvars.Context(),
+        )
+        spec.task.add_done_callback(lambda _task: self._resolve(spec, None))
+        self._by_id[spec_id] = spec
+        self._by_thread[thread_id] = spec
+        metrics.incr("router.speculation.started")
+        return spec
+
+    def _resolve(self, spec: Speculation, response: Any, request_messages: Optional[list] = None) -> None:
+        if spec.result.done():
+            return
+        if request_messages is not None:
+            spec.request_signature = _signature(request_messages)
+        spec.result.set_result(response)
+
+    def record(self, spec_id: str, request_messages: list, response: Any) -> None:
+        spec = self._by_id.get(spec_id)
+        if spec is not None:
+            self._resolve(spec, response, request_messages)
+
+    def commit(self, thread_id: str) -> None:
+        spec = self._by_thread.get(thread_id)
+        if spec is not None:
+            spec.committed = True
+            metrics.incr("router.speculation.hit")
+
+    def take(self, thread_id: str, store: str) -> Optional[Speculation]:
+        """실제 실행의 첫 모델 호출에서 한 번만 꺼내 씁니다."""
+        spec = self._by_thread.get(thread_id)
+        if spec is None or not spec.committed or spec.store != store:
+            return None
+        spec.committed = False
+        return spec
+
+    async def discard(self, thread_id: str, missed: bool = False) -> None:
+        spec = self._by_thread.pop(thread_id, None)
+        if spec is None:
+            return
+        self._by_id.pop(spec.id, None)
+        if missed:
+            metrics.incr("router.speculation.miss")
+        if spec.task and not spec.task.done():
+            spec.task.cancel()
+            try:
+                await spec.task
+            except BaseException:
+                pass
+        try:
+            await spec.agent.checkpointer.adelete_thread(spec.spec_thread_id)
+        except Exception as exc:
+            logger.warning(f"[Speculation] Failed to delete speculative thread {spec.spec_thread_id}: {exc}")
+
+
+speculations = SpeculationRegistry()
+
+
+class SpeculativeModelMiddleware(AgentMiddleware):
+    """추측 실행의 첫 모델 응답을 기록하고, 확정되면 실제 실행에서 재사용하는 미들웨어"""
+
+    def __init__(self, store_name: str):
+        super().__init__()
+        self.store_name = store_name
+
+    def wrap_model_call(self, request, handler):
+        return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        configurable = get_config().get("configurable", {})
+        spec_id = configurable.get(SPECULATION_KEY)
+        if spec_id:
+            response = await handler(request)
+            speculations.record(spec_id, request.messages, response)
+            return response
+
+        spec = speculations.take(configurable.get("thread_id"), self.store_name)
+        if spec is None:
+            return await handler(request)
+
+        response = await spec.result
+        if response is None or spec.request_signature != _signature(request.messages):
+            logger.info(f"[Speculation] Discarding speculative response for {self.store_name}: input changed")
+            return await handler(request)
+
+        logger.info(f"[Speculation] Reusing speculative first step for {self.store_name}")
+        message = next((m for m in getattr(response, "result", [response]) if isinstance(m, AIMessage)), None)
+        if message is not None and message.content and not message.tool_calls:
+            # 모델 스트림이 없으므로 텍스트 응답은 직접 내보냅니다.
+            await adispatch_custom_event(
+                "manually_emit_message",
+                {"message_id": message.id or str(uuid.uuid4()), "message": message.text},
+            )
+        return response
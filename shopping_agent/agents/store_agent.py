@@ -1,12 +1,17 @@
+from functools import lru_cache
 from pathlib import Path
 
 from deepagents import create_deep_agent
 from deepagents.backends import CompositeBackend, FilesystemBackend, StateBackend
 from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import MemorySaver
 
+from shopping_agent.checkpoint import get_checkpointer
 from shopping_agent.config import config
-from shopping_agent.agents.stores import STORE_PROMPTS
+from shopping_agent.agents.history import HistoryBudgetMiddleware
+from shopping_agent.agents.speculation import SpeculativeModelMiddleware
+from shopping_agent.agents.stores import STORE_PROMPTS, get_store_prompt
+from shopping_agent.agents.tool_cache import ToolResultCacheMiddleware
+from shopping_agent.agents.tool_executor import ToolConcurrencyMiddleware, ToolDeadlineMiddleware
 from shopping_agent.tools import ShoppingToolsMiddleware
 
 
@@ -30,12 +35,26 @@ def _build_backend():
     )
 
 
-def create_store_agent(store_name: str):
+@lru_cache(maxsize=1)
+def get_chat_model():
+    """상점 에이전트들이 공유하는 Gemini 모델 클라이언트 (프로세스당 1개)"""
+    return init_chat_model(
+        model=config.agent.model_name,
+        model_provider="google_genai",
+        api_key=config.google_api_key,
+        temperature=config.agent.temperature,
+        retries=config.agent.max_retries,
+        request_timeout=config.agent.request_timeout,
+    )
+
+
+def create_store_agent(store_name: str, model=None):
     """
     상점별 Deep Agent 생성 (미들웨어 패턴 적용)
 
     Args:
         store_name: 상점 이름 (monos, everlane, allbirds, kith)
+        model: 사용할 채팅 모델 (기본값: 공유 Gemini 클라이언트)
 
     Returns:
         DeepAgent 인스턴스
@@ -45,24 +64,24 @@ def create_store_agent(store_name: str):
     if store_key not in STORE_PROMPTS:
         raise ValueError(f"지원하지 않는 상점: {store_name}")
 
-    # Gemini 모델 초기화
-    model = init_chat_model(
-        model=config.agent.model_name,
-        model_provider="google_genai",
-        api_key=config.google_api_key,
-        temperature=config.agent.temperature,
-        retries=config.agent.max_retries,
-        request_timeout=config.agent.request_timeout,
-    )
+    middleware = [
+        # TodoListMiddleware는 create_deep_agent에 기본 포함됨
+        ShoppingToolsMiddleware(),      # 쇼핑 도구 (search, stock, exchange, customs)
+        SpeculativeModelMiddleware(store_key),  # 라우팅과 병렬로 미리 실행한 첫 모델 호출 재사용
+        HistoryBudgetMiddleware(),      # 모델 호출당 토큰 예산 (이전 도구 결과 축약)
+    ]
+    if config.agent.tool_cache_enabled:
+        middleware.append(ToolResultCacheMiddleware())  # thread별 멱등 도구 결과 재사용
+    # 캐시 적중은 마감 시간/슬롯과 무관하게 바로 반환되도록 두 미들웨어를 가장 안쪽에 둡니다.
+    middleware.append(ToolDeadlineMiddleware())     # 도구별 마감 시간 (슬롯 대기 시간 포함)
+    middleware.append(ToolConcurrencyMiddleware())  # 한 스텝의 도구 호출을 전용 풀에서 병렬 실행
 
     return create_deep_agent(
-        model=model,
-        system_prompt=STORE_PROMPTS[store_key],
-        middleware=[
-            # TodoListMiddleware는 create_deep_agent에 기본 포함됨
-            ShoppingToolsMiddleware(),      # 쇼핑 도구 (search, stock, exchange, customs)
-        ],
+        model=model or get_chat_model(),
+        system_prompt=get_store_prompt(store_key),
+        middleware=middleware,
         backend=_build_backend(),
-        checkpointer=MemorySaver(),
+        # 라우터 하위 실행 시에는 라우터 체크포인터가 쓰이고, 단독 실행(/agent/{store})만 이 scope를 씁니다.
+        checkpointer=get_checkpointer(store_key),
     )
 
@@ -5,12 +5,32 @@ Store Agent Factory
 """
 
 import json
+import logging
+import time
+from functools import lru_cache
 
 import langchain_google_genai as google
 
 from shopping_agent.agents.store_agent import create_store_agent
 from shopping_agent.agents.stores import STORE_URLS
 from shopping_agent.config import config
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_router_model():
+    """라우팅 전용 Gemini 클라이언트 (프로세스당 1개, 짧은 타임아웃/출력 예산)"""
+    return google.ChatGoogleGenerativeAI(
+        model=config.agent.model_name,
+        google_api_key=config.google_api_key,
+        temperature=0,
+        max_tokens=config.agent.router_max_tokens,
+        thinking_level=config.agent.router_thinking_level,
+        retries=config.agent.router_max_retries,
+        request_timeout=config.agent.router_request_timeout,
+    )
 
 
 class StoreAgentFactory:
@@ -29,13 +49,9 @@ class StoreAgentFactory:
     @staticmethod
     async def detect_store_via_llm(messages: list) -> str:
         """전체 대화 맥락을 기반으로 인텔리전트 라우팅 수행"""
-        llm = google.ChatGoogleGenerativeAI(
-            model=config.agent.model_name,
-            google_api_key=config.google_api_key,
-            temperature=0,
-            retries=config.agent.max_retries,
-            request_timeout=config.agent.request_timeout,
-        )
+        started = time.perf_counter()
+        model_ms = 0.0
+        llm = get_router_model()
 
         history_str = ""
         for i, msg in enumerate(messages[-5:]):  # 최근 5개 메시지만 문맥으로 사용
@@ -45,7 +61,7 @@ class StoreAgentFactory:
                 content = msg.get("content", "")
             history_str += f"{role}: {content}\n"
         
-        print(f"DEBUG: Router History Context:\n{history_str}")  # 디버깅용 로그 추가
+        logger.debug(f"[Router] History context:\n{history_str}")
 
         system_prompt = f"""사용자의 현재 요청과 대화 맥락을 분석하여 가장 적합한 상점을 하나만 선택하세요.
 
@@ -77,10 +93,12 @@ class StoreAgentFactory:
             if not last_query or not str(last_query).strip():
                 return "general"
 
+            model_started = time.perf_counter()
             response = await llm.ainvoke(
                 [("system", system_prompt), ("human", f"현재 요청: {last_query}")],
                 config={"metadata": {"emit-messages": False, "emit-tool-calls": False}},
             )
+            model_ms = (time.perf_counter() - model_started) * 1000
             content = response.content
             if isinstance(content, list):
                 content = "".join(p if isinstance(p, str) else p.get("text", "") for p in content)
@@ -89,5 +107,10 @@ class StoreAgentFactory:
                 content = content[content.find("{"):content.rfind("}")+1]
             return json.loads(content).get("store", "general")
         except Exception as e:
-            print(f"⚠️ LLM 라우팅 실패: {e}")
+            logger.warning(f"[Router] LLM 라우팅 실패: {e}")
             return "general"  # 기본값
+        finally:
+            # 모델 호출을 제외한 라우팅 자체 오버헤드(프롬프트 구성, 파싱 등)
+            total_ms = (time.perf_counter() - started) * 1000
+            metrics.observe("router.llm_ms", model_ms)
+            metrics.observe("router.overhead_ms", total_ms - model_ms)
@@ -1,3 +1,5 @@
+from shopping_agent.config import config
+
 STORE_PROMPTS = {
     "monos": """당신은 Monos 직구 전문 Deep Agent입니다.
 상점 URL: https://monos.com
@@ -99,3 +101,21 @@ STORE_URLS = {
     "kith": "https://kith.com",
     "general": None
 }
+
+_PRODUCTS_RULE = "6. 상품 목록을 보여줄 때 <products> JSON 블록 유지"
+# compact 모드에서는 상품 카드가 커스텀 이벤트로 화면에 표시되므로 답변에 다시 옮겨 적을 필요가 없습니다.
+_PRODUCTS_RULE_COMPACT = "6. 상품 카드는 화면에 자동으로 표시되므로 <products> JSON을 답변에 옮겨 적지 말고 상품명/가격만 자연어로 안내"
+
+
+# 회로가 열려 마지막 정상 응답을 돌려준 도구 결과(STALE_NOTE)를 안내하는 규칙 (상점 에이전트 공통)
+_STALE_RULE = "11. 도구 결과에 stale 표시가 있으면 상점이 응답하지 않아 이전에 저장된 정보임을 알리고, 가격/재고가 바뀌었을 수 있다고 안내"
+
+
+def get_store_prompt(store_key: str) -> str:
+    """설정(compact_tool_output)에 맞춘 상점 시스템 프롬프트"""
+    prompt = STORE_PROMPTS[store_key]
+    if config.agent.compact_tool_output:
+        prompt = prompt.replace(_PRODUCTS_RULE, _PRODUCTS_RULE_COMPACT)
+    if STORE_URLS.get(store_key):
+        prompt = f"{prompt}\n{_STALE_RULE}"
+    return prompt
@@ -0,0 +1,182 @@
+"""
+Tool Result Cache Middleware
+
+같은 대화(thread) 안에서 반복되는 멱등 도구 호출 결과를 재사용합니다.
+(매 턴 반복되는 get_exchange_rate, 같은 handle의 check_product_stock 등)
+
+- 도구별 TTL 동안 같은 인자의 호출은 도구를 실행하지 않고 저장된 결과를 돌려줍니다.
+- 상태를 바꾸는 도구(set_shipping_address, ucp_*_checkout)가 실행되면 같은 thread의 관련 도구 캐시를 비웁니다.
+- 워커 간에 같은 thread를 보도록 SharedStore에 저장합니다.
+- 도구가 emit()한 화면용 이벤트(compact 모드의 상품 카드 등)도 함께 저장해 적중 시 다시 보냅니다.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Mapping, Optional
+
+from deepagents.graph import AgentMiddleware
+from langchain_core.messages import ToolMessage
+
+from shopping_agent import codec
+from shopping_agent.metrics import metrics
+from shopping_agent.shared_store import SharedStore, get_shared_store
+from shopping_agent.tools.output import emit, record_events
+
+logger = logging.getLogger(__name__)
+
+# 도구별 캐시 TTL(초). 여기 없는 도구는 캐시하지 않습니다.
+DEFAULT_TOOL_TTLS: dict[str, float] = {
+    "get_exchange_rate": 600,
+    "calculate_customs": 3600,
+    "search_product": 300,
+    "check_product_stock": 60,
+    "build_line_item_from_handle": 60,
+    # 배송지는 thread 밖(다른 대화)에서도 바뀔 수 있어 짧게 둡니다.
+    "get_shipping_address_info": 120,
+    "get_ucp_capabilities": 3600,
+}
+
+# 상태 변경 도구 → 결과가 바뀔 수 있어 비워야 하는 도구
+DEFAULT_INVALIDATIONS: dict[str, tuple[str, ...]] = {
+    "set_shipping_address": ("get_shipping_address_info",),
+    "ucp_create_checkout": ("check_product_stock", "build_line_item_from_handle"),
+    "ucp_create_checkout_from_handle": ("check_product_stock", "build_line_item_from_handle"),
+    "ucp_update_checkout": ("check_product_stock", "build_line_item_from_handle"),
+    "ucp_complete_checkout": ("check_product_stock", "build_line_item_from_handle"),
+    "ucp_cancel_checkout": ("check_product_stock", "build_line_item_from_handle"),
+}
+
+# 도구가 실패를 문자열로 돌려주는 경우(재시도해야 할 결과)와 회로 차단 중 보관본(stale)은 캐시하지 않습니다.
+_FAILURE_MARKERS = ("수 없습니다", "실패", "에러", "Error", "시간 초과", '"stale":true', "(stale)")
+
+_NAMESPACE = "tool_cache"
+_STATS_NAMESPACE = "tool_cache_stats"
+_PURGE_INTERVAL = 300.0
+
+
+def _thread_id(request: Any) -> Optional[str]:
+    runtime = getattr(request, "runtime", None)
+    run_config = getattr(runtime, "config", None) or {}
+    return run_config.get("configurable", {}).get("thread_id")
+
+
+def _args_key(args: Any) -> str:
+    return codec.dumps(args, sort_keys=True, default=str)
+
+
+def _cacheable(result: Any) -> bool:
+    if not isinstance(result, ToolMessage) or result.status == "error":
+        return False
+    content = result.content
+    return isinstance(content, str) and not any(marker in content for marker in _FAILURE_MARKERS)
+
+
+def tool_cache_stats() -> dict:
+    """프로세스 내 도구 캐시 적중률"""
+    hits = metrics.counter("tool_cache.hit")
+    misses = metrics.counter("tool_cache.miss")
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "invalidations": metrics.counter("tool_cache.invalidate"),
+        "hit_ratio": round(hits / total, 3) if total else None,
+    }
+
+
+class ToolResultCacheMiddleware(AgentMiddleware):
+    """thread별 멱등 도구 호출 결과 캐시 미들웨어"""
+
+    def __init__(
+        self,
+        ttls: Optional[Mapping[str, float]] = None,
+        invalidations: Optional[Mapping[str, tuple[str, ...]]] = None,
+        store: Optional[Callable[[], SharedStore]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__()
+        self.ttls = dict(DEFAULT_TOOL_TTLS if ttls is None else ttls)
+        self.invalidations = dict(DEFAULT_INVALIDATIONS if invalidations is None else invalidations)
+        self._store = store or get_shared_store
+        self._clock = clock
+        self._last_purge = clock()
+
+    def _namespace(self, thread_id: str, tool_name: str) -> str:
+        return f"{_NAMESPACE}:{thread_id}:{tool_name}"
+
+    def _lookup(self, request: Any) -> tuple[Optional[dict], Optional[tuple[str, str]], int]:
+        """(캐시 항목, 저장 위치, thread 적중 수)를 반환합니다. 캐시 대상이 아니면 저장 위치도 None입니다.
+
+        SharedStore(SQLite)를 읽으므로 비동기 경로에서는 스레드에서 호출합니다.
+        """
+        name = request.tool_call["name"]
+        thread_id = _thread_id(request)
+        if not thread_id or name not in self.ttls:
+            return None, None, 0
+        location = (self._namespace(thread_id, name), _args_key(request.tool_call.get("args", {})))
+        cached = self._store().get(location[0], location[1])
+        if cached is None:
+            metrics.incr("tool_cache.miss")
+            return None, location, 0
+        hits = self._store().incr(_STATS_NAMESPACE, thread_id, ttl=max(self.ttls.values()))
+        return cached, location, hits
+
+    def _hit(self, request: Any, cached: dict, hits: int) -> ToolMessage:
+        """캐시 적중 메시지. 원래 실행 때 보낸 커스텀 이벤트(상품 카드 등)를 호출 컨텍스트에서 다시 보냅니다."""
+        name = request.tool_call["name"]
+        for event_name, value in cached.get("events") or []:
+            emit(event_name, value)
+        metrics.incr("tool_cache.hit")
+        metrics.incr(f"tool_cache.hit.{name}")
+        logger.info(f"[ToolCache] hit {name} (thread={_thread_id(request)}, thread_hits={hits})")
+        return ToolMessage(
+            content=cached["content"],
+            tool_call_id=request.tool_call["id"],
+            name=name,
+            response_metadata={
+                "tool_cache": {
+                    "hit": True,
+                    "age": round(self._clock() - cached["stored_at"], 1),
+                    "thread_hits": hits,
+                }
+            },
+        )
+
+    def _after(self, request: Any, result: Any, location: Optional[tuple[str, str]], events: list) -> Any:
+        name = request.tool_call["name"]
+        if location is not None and _cacheable(result):
+            namespace, key = location
+            entry = {"content": result.content, "stored_at": self._clock(), "events": events}
+            self._store().put(namespace, key, entry, ttl=self.ttls[name])
+
+        thread_id = _thread_id(request)
+        targets = self.invalidations.get(name)
+        if thread_id and targets:
+            for target in targets:
+                self._store().clear(self._namespace(thread_id, target))
+            metrics.incr("tool_cache.invalidate")
+            logger.info(f"[ToolCache] {name} invalidated {', '.join(targets)} (thread={thread_id})")
+
+        now = self._clock()
+        if now - self._last_purge >= _PURGE_INTERVAL:
+            self._last_purge = now
+            self._store().purge_expired()
+        return result
+
+    def wrap_tool_call(self, request, handler):
+        cached, location, hits = self._lookup(request)
+        if cached is not None:
+            return self._hit(request, cached, hits)
+        with record_events() as events:
+            result = handler(request)
+        return self._after(request, result, location, events)
+
+    async def awrap_tool_call(self, request, handler):
+        # SharedStore 조회/저장은 잠금 대기가 있을 수 있으므로 이벤트 루프 밖에서 합니다.
+        cached, location, hits = await asyncio.to_thread(self._lookup, request)
+        if cached is not None:
+            return self._hit(request, cached, hits)
+        with record_events() as events:
+            result = await handler(request)
+        return await asyncio.to_thread(self._after, request, result, location, events)
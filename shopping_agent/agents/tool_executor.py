@@ -0,0 +1,203 @@
+"""
+Tool Concurrency / Deadline Middleware
+
+한 모델 스텝에서 나온 여러 도구 호출(get_exchange_rate + check_product_stock 여러 개 등)은
+LangGraph가 호출마다 별도 태스크로 동시에 실행합니다. 동기(httpx) 도구는 이벤트 루프의
+기본 executor에서 돌기 때문에 체크포인터 등 다른 to_thread 작업과 스레드를 나눠 쓰고,
+CPU 수에 따라 동시 실행 수가 정해집니다.
+
+이 미들웨어는
+1. 동기 도구를 도구 전용 bounded 스레드 풀에서 실행하고,
+2. thread(한 스텝)당 동시에 실행되는 도구 호출 수를 제한합니다.
+결과 순서는 LangGraph가 도구 호출 순서대로 합치므로 그대로 유지됩니다.
+
+ToolDeadlineMiddleware는 도구별 마감 시간(남은 실행 예산 이내)을 걸고,
+넘기면 도구를 기다리지 않고 구조화된 timeout 결과를 모델에 돌려줍니다.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from deepagents.graph import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+from shopping_agent import deadline
+from shopping_agent.config import config
+from shopping_agent.metrics import metrics
+from shopping_agent.tools.output import dumps
+
+logger = logging.getLogger(__name__)
+
+# 도구별 마감 시간(초). 여기 없는 도구(write_todos, task 등)는 제한하지 않습니다.
+DEFAULT_TOOL_TIMEOUTS: dict[str, float] = {
+    "search_product": 15,
+    "check_product_stock": 10,
+    "get_exchange_rate": 10,
+    "calculate_customs": 5,
+    "get_shipping_address_info": 5,
+    "set_shipping_address": 5,
+    "get_ucp_capabilities": 15,
+    "build_line_item_from_handle": 15,
+    "ucp_create_checkout": 25,
+    "ucp_create_checkout_from_handle": 30,
+    "ucp_get_checkout": 15,
+    "ucp_update_checkout": 20,
+    "ucp_complete_checkout": 30,
+    "ucp_cancel_checkout": 20,
+    "ucp_wait_for_checkout_status": 35,
+}
+
+
+@lru_cache(maxsize=1)
+def get_tool_executor() -> ThreadPoolExecutor:
+    """모든 상점 에이전트가 함께 쓰는 동기 도구 실행 풀"""
+    return ThreadPoolExecutor(max_workers=config.agent.tool_pool_size, thread_name_prefix="tool")
+
+
+async def run_in_tool_pool(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # contextvars를 복사해야 도구 안의 콜백/커스텀 이벤트가 현재 실행(run)에 연결됩니다.
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_tool_executor(), call)
+
+
+# 원본 도구 id → 풀 실행 복사본 (도구는 모듈 수준 싱글턴이라 id가 바뀌지 않음)
+_pooled_tools: dict[int, StructuredTool] = {}
+
+
+def pooled_tool(tool: Optional[BaseTool]) -> Optional[BaseTool]:
+    """async 구현이 없는 동기 도구를 도구 풀에서 실행하는 복사본으로 바꿉니다."""
+    if not isinstance(tool, StructuredTool) or tool.func is None or tool.coroutine is not None:
+        return tool
+    pooled = _pooled_tools.get(id(tool))
+    if pooled is None:
+        func = tool.func
+
+        async def coroutine(*args: Any, **kwargs: Any) -> Any:
+            return await run_in_tool_pool(func, *args, **kwargs)
+
+        pooled = _pooled_tools[id(tool)] = tool.model_copy(update={"coroutine": coroutine})
+    return pooled
+
+
+class _StepSlots:
+    """thread별 동시 실행 슬롯 (실행 중인 호출이 없으면 정리)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots: dict[str, tuple[asyncio.Semaphore, int]] = {}
+
+    def acquire(self, key: str) -> asyncio.Semaphore:
+        semaphore, users = self._slots.get(key) or (asyncio.Semaphore(self.limit), 0)
+        self._slots[key] = (semaphore, users + 1)
+        return semaphore
+
+    def release(self, key: str) -> None:
+        semaphore, users = self._slots[key]
+        if users <= 1:
+            del self._slots[key]
+        else:
+            self._slots[key] = (semaphore, users - 1)
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """한 스텝의 독립 도구 호출을 bounded 풀에서 병렬 실행하고 동시 실행 수를 제한하는 미들웨어"""
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        super().__init__()
+        self.max_concurrency = max(1, max_concurrency or config.agent.tool_max_concurrency)
+        self._slots = _StepSlots(self.max_concurrency)
+
+    def wrap_tool_call(self, request, handler):
+        # 동기 실행 경로는 ToolNode의 executor(max_concurrency 설정)를 그대로 사용합니다.
+        return handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        run_config = getattr(request.runtime, "config", None) or {}
+        key = run_config.get("configurable", {}).get("thread_id") or request.tool_call["id"]
+        request = request.override(tool=pooled_tool(request.tool))
+        semaphore = self._slots.acquire(key)
+        try:
+            if semaphore.locked():
+                metrics.incr("tool.concurrency_waits")
+            async with semaphore:
+                return await handler(request)
+        finally:
+            self._slots.release(key)
+
+
+def _run_deadline(request: Any) -> Optional[float]:
+    run_config = getattr(request.runtime, "config", None) or {}
+    return run_config.get("configurable", {}).get("run_deadline")
+
+
+def _timeout_message(request: Any, budget: float) -> ToolMessage:
+    name = request.tool_call["name"]
+    payload = {
+        "status": "timeout",
+        "tool": name,
+        "timeout": round(max(budget, 0.0), 1),
+        "message": "도구 응답 시간이 초과되었습니다. 같은 호출을 반복하지 말고 다른 방법을 시도하거나 사용자에게 알려주세요.",
+    }
+    return ToolMessage(content=dumps(payload), tool_call_id=request.tool_call["id"], name=name, status="error")
+
+
+class ToolDeadlineMiddleware(AgentMiddleware):
+    """도구별 마감 시간을 남은 실행 예산 안으로 걸고, 넘기면 timeout 결과를 반환하는 미들웨어"""
+
+    def __init__(self, timeouts: Optional[dict[str, float]] = None, max_timeout: Optional[float] = None):
+        super().__init__()
+        self.timeouts = dict(DEFAULT_TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self.max_timeout = config.agent.tool_timeout_max if max_timeout is None else max_timeout
+
+    def _budget(self, request: Any) -> Optional[float]:
+        name = request.tool_call["name"]
+        if name not in self.timeouts:
+            return None
+        budget = self.timeouts[name]
+        # 도구 자체 대기 시간 인자(ucp_wait_for_checkout_status의 timeout 등)는 존중하되,
+        # 모델이 정한 값이므로 설정된 상한을 넘기지 않습니다.
+        requested = (request.tool_call.get("args") or {}).get("timeout")
+        if isinstance(requested, (int, float)) and not isinstance(requested, bool):
+            budget = max(budget, min(float(requested) + 5.0, self.max_timeout))
+        run_deadline = _run_deadline(request)
+        if run_deadline is not None:
+            budget = min(budget, run_deadline - time.time())
+        return budget
+
+    def wrap_tool_call(self, request, handler):
+        budget = self._budget(request)
+        if budget is None:
+            return handler(request)
+        if budget <= 0:
+            metrics.incr("tool.timeouts")
+            return _timeout_message(request, 0.0)
+        # 동기 경로는 중단할 수 없으므로 http 요청 타임아웃만 마감 시각에 맞춥니다.
+        with deadline.within(budget):
+            return handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        budget = self._budget(request)
+        if budget is None:
+            return await handler(request)
+        name = request.tool_call["name"]
+        if budget <= 0:
+            metrics.incr("tool.timeouts")
+            logger.warning(f"[ToolDeadline] {name} skipped: run budget exhausted")
+            return _timeout_message(request, 0.0)
+        try:
+            with deadline.within(budget):
+                return await asyncio.wait_for(handler(request), timeout=budget)
+        except asyncio.TimeoutError:
+            # 풀 스레드의 http 요청도 같은 마감 시각으로 타임아웃이 줄어 있어 곧 정리됩니다.
+            metrics.incr("tool.timeouts")
+            metrics.incr(f"tool.timeouts.{name}")
+            logger.warning(f"[ToolDeadline] {name} timed out after {budget:.1f}s")
+            return _timeout_message(request, budget)
@@ -4,25 +4,66 @@
 에이전트 이벤트를 실시간 스트리밍
 """
 
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from ag_ui_langgraph import add_langgraph_fastapi_endpoint
-from langgraph.checkpoint.memory import MemorySaver
 
+from shopping_agent import http
+from shopping_agent.admission import AdmissionMiddleware, get_admission_controller
 from shopping_agent.api.langgraph_agent import SafeLangGraphAgent
+from shopping_agent.cache import cache_stats, get_cache
+from shopping_agent.checkpoint import get_checkpointer
+from shopping_agent.config import config
+from shopping_agent.metrics import metrics
+from shopping_agent.warmup import warm_up_all, warmup_state
 from shopping_agent.patches.google_genai import patch_google_genai_response_json, patch_langchain_google_genai_input
 from shopping_agent.agents import (
     STORE_URLS,
+    StoreGraphRegistry,
     create_store_agent,
     create_store_router_graph,
+    routing_stats,
+    tool_cache_stats,
 )
 
+logger = logging.getLogger(__name__)
+
 patch_google_genai_response_json()
 patch_langchain_google_genai_input()
 
-app = FastAPI(title="직구 에이전트 서버")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 이전 실행의 캐시 스냅샷을 먼저 올려 워밍업과 첫 요청이 캐시를 타게 합니다.
+    await asyncio.to_thread(get_cache().load_snapshot)
+    # 워밍업은 백그라운드로 돌리고, 완료 여부는 /ready로 노출합니다.
+    warmup_task = None
+    if config.warmup_on_startup:
+        warmup_task = asyncio.create_task(warm_up_all(STORE_URLS, graphs=store_graphs))
+    else:
+        warmup_state.finish()
+    try:
+        yield
+    finally:
+        if warmup_task and not warmup_task.done():
+            warmup_task.cancel()
+        # 스냅샷 저장(SQLite 쓰기)과 동기 클라이언트 정리는 이벤트 루프 밖에서 합니다.
+        await asyncio.to_thread(get_cache().save_snapshot)
+        await asyncio.to_thread(http.close)
+        await http.aclose()
+
+
+app = FastAPI(title="직구 에이전트 서버", lifespan=lifespan)
 AGENT_CONFIG = {"recursion_limit": 200}
 
+# /agent 스트리밍 실행 수 제한 (CORS보다 안쪽에 두어 429 응답에도 CORS 헤더가 붙도록 먼저 등록)
+app.add_middleware(AdmissionMiddleware, prefix="/agent")
+
 # CORS 설정 (프론트엔드 연동용)
 app.add_middleware(
     CORSMiddleware,
@@ -32,22 +73,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-store_graphs = {
-    name: create_store_agent(name).with_config(AGENT_CONFIG)
-    for name in STORE_URLS.keys()
-}
+# 상점 그래프는 import 시점에 만들지 않고 워밍업(스레드)에서 컴파일합니다.
+# 워밍업을 끄면 처음 요청될 때 스레드에서 컴파일합니다 (routing._store_node, SafeLangGraphAgent.run).
+store_graphs = StoreGraphRegistry(
+    STORE_URLS.keys(),
+    lambda name: create_store_agent(name).with_config(AGENT_CONFIG),
+)
 store_agents = {
     name: SafeLangGraphAgent(
         name=name,
         description=f"{name} 스토어 에이전트",
-        graph=graph,
+        graph_factory=lambda name=name: store_graphs[name],
         config=AGENT_CONFIG,
     )
-    for name, graph in store_graphs.items()
+    for name in store_graphs
 }
 
 # 자동 라우팅 엔드포인트
-router_graph = create_store_router_graph(store_graphs, checkpointer=MemorySaver()).with_config(AGENT_CONFIG)
+router_graph = create_store_router_graph(
+    store_graphs,
+    checkpointer=get_checkpointer(),
+    speculative=config.agent.router_speculative,
+).with_config(AGENT_CONFIG)
 router_agent = SafeLangGraphAgent(
     name="router",
     description="상점 자동 라우팅",
@@ -75,38 +122,92 @@ async def list_stores():
     return {"stores": list(STORE_URLS.keys())}
 
 
+@app.get("/ready")
+async def readiness():
+    """로드밸런서용 readiness: 워밍업이 끝나기 전에는 503을 반환합니다."""
+    snapshot = warmup_state.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    checkpointer = get_checkpointer()
+    checkpoint_stats = await asyncio.to_thread(checkpointer.stats) if hasattr(checkpointer, "stats") else None
+    return {
+        **metrics.snapshot(),
+        "routing": routing_stats(),
+        "tool_cache": tool_cache_stats(),
+        "checkpoint": checkpoint_stats,
+        "admission": get_admission_controller().snapshot(),
+        "upstreams": http.upstream_stats(),
+        "cache": cache_stats(),
+    }
+
+
 # --- Wallet Payment API ---
 from pydantic import BaseModel
-from typing import Dict, Any
-import json
-from shopping_agent.tools.ucp import _ucp_complete_checkout
+from typing import Dict, Any, Optional
+import uuid
+from fastapi import Header
+from shopping_agent.tools.ucp import PaymentInProgress, acomplete_checkout_once, await_checkout_status
 
 class PaymentRequest(BaseModel):
     store_url: str
     checkout_id: str
     payment_token: Dict[str, Any]
+    # 클라이언트가 결제 시도마다 한 번 만들어 재시도에도 그대로 보내는 키 (Idempotency-Key 헤더도 허용)
+    idempotency_key: Optional[str] = None
 
 @app.post("/api/pay")
-async def process_payment(request: PaymentRequest):
+async def process_payment(request: PaymentRequest, idempotency_key: Optional[str] = Header(default=None)):
     """
     Zero-Click Payment Endpoint:
     프론트엔드에서 결제 토큰을 받아 UCP complete_checkout을 직접 호출합니다.
+    엔드포인트 조회부터 JSON-RPC 호출까지 비동기로 처리해 결제 중에도 다른 스트리밍 세션을 막지 않습니다.
     """
-    # 1. Pydantic 모델에서 dict 및 JSON 변환
-    payment_json_str = json.dumps(request.payment_token)
-    
-    # 2. 내부 로직 함수 직접 호출 (도구 우회)
-    result_json = _ucp_complete_checkout(
-        store_url=request.store_url,
-        checkout_id=request.checkout_id,
-        payment_json=payment_json_str
-    )
-    
-    # 3. 결과 반환
+    key = request.idempotency_key or idempotency_key
+    if not key:
+        key = str(uuid.uuid4())
+        logger.warning(f"[Pay] No idempotency key from client for {request.checkout_id}; retries will not be deduplicated")
+
     try:
-        return json.loads(result_json)
-    except Exception:
-        return {"raw_result": result_json}
+        result, replayed = await acomplete_checkout_once(
+            store_url=request.store_url,
+            checkout_id=request.checkout_id,
+            payment=request.payment_token,
+            idempotency_key=key,
+        )
+    except PaymentInProgress:
+        return JSONResponse({"error": "payment in progress", "idempotency_key": key}, status_code=409)
+    except Exception as exc:
+        # 결과를 알 수 없으므로 같은 키로 다시 시도하도록 안내합니다.
+        return JSONResponse({"error": f"UCP 호출 실패: {exc}", "idempotency_key": key}, status_code=502)
+
+    metrics.incr("pay.replayed" if replayed else "pay.completed")
+    return JSONResponse(result, headers={"Idempotency-Key": key, "Idempotent-Replayed": str(replayed).lower()})
+
+
+@app.get("/api/checkout/status")
+async def checkout_status(
+    store_url: str,
+    checkout_id: str,
+    status: str = "completed",
+    timeout: float = 30.0,
+):
+    """
+    Long-poll Endpoint:
+    체크아웃이 원하는 상태가 될 때까지 대기합니다.
+    같은 체크아웃을 기다리는 에이전트/프론트엔드 요청은 하나의 폴링을 공유합니다.
+    대기는 전용 스레드 풀에서 하므로 기본 executor(체크포인터 I/O)를 붙잡지 않습니다.
+    """
+    statuses = tuple(s.strip() for s in status.split(",") if s.strip()) or ("completed",)
+    payload, matched = await await_checkout_status(
+        store_url,
+        checkout_id,
+        statuses,
+        min(max(timeout, 0.0), float(config.ucp.status_wait_max)),
+    )
+    return {"checkout": payload, "matched": matched}
 
 
 __all__ = ["app"]
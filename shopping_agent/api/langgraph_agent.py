@@ -11,6 +11,11 @@ logging.basicConfig(
 )
 
 import asyncio
+import time
+from typing import Any, Callable, Optional
+
+import httpx
+from google.genai import errors as genai_errors
 
 from ag_ui.core import CustomEvent, EventType, RunAgentInput, RunErrorEvent, RunFinishedEvent, RunStartedEvent
 from ag_ui_langgraph.agent import LangGraphAgent, dump_json_safe
@@ -19,47 +24,117 @@ from ag_ui_langgraph.utils import agui_messages_to_langchain, get_stream_payload
 from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 
+from shopping_agent.config import config as app_config
+from shopping_agent.rate_limit import parse_retry_after
+
 # Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2.0  # seconds, will exponentially back off
+RETRY_DELAY_MAX = 30.0
+
+# 재시도 시 처음부터 다시 실행하지 않고 마지막 체크포인트에서 이어서 실행하라는 내부 표시
+RESUME_FROM_CHECKPOINT = "resume_from_checkpoint"
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)
+
+
+def _error_chain(exc: BaseException):
+    seen: set[int] = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    headers = getattr(response, "headers", None)
+    return parse_retry_after(headers.get("retry-after")) if headers is not None else None
+
+
+def _retry_delay(exc: BaseException, attempt: int) -> Optional[float]:
+    """재시도할 에러면 대기 시간(초), 아니면 None
+
+    예외 체인(__cause__/__context__)에서 상태 코드가 있는 API 에러(Gemini, httpx)와
+    네트워크/타임아웃 에러를 찾아 판단합니다. Retry-After가 있으면 그 값을 우선합니다.
+    """
+    backoff = min(RETRY_DELAY_BASE * (2 ** attempt), RETRY_DELAY_MAX)
+    for error in _error_chain(exc):
+        if isinstance(error, genai_errors.APIError):
+            status, response = error.code, error.response
+        elif isinstance(error, httpx.HTTPStatusError):
+            status, response = error.response.status_code, error.response
+        elif isinstance(error, _TRANSIENT_ERRORS):
+            return backoff
+        else:
+            continue
+        if status in _RETRYABLE_STATUS:
+            retry_after = _retry_after(response)
+            return min(max(backoff, retry_after or 0.0), RETRY_DELAY_MAX)
+        return None
+    return None
 
 
 def _is_retryable_error(exc: Exception) -> bool:
-    """Check if the exception is a retryable server error (5xx)."""
-    error_str = str(exc).lower()
-    if "500" in error_str or "internal" in error_str:
-        return True
-    if "502" in error_str or "503" in error_str or "504" in error_str:
-        return True
-    if "server" in error_str and "error" in error_str:
-        return True
-    if "timeout" in error_str or "timed out" in error_str:
-        return True
-    return False
+    """Check if the exception is a transient upstream error (429/5xx, network, timeout)."""
+    return _retry_delay(exc, 0) is not None
 
 
 class SafeLangGraphAgent(LangGraphAgent):
-    """Disable regenerate logic to avoid missing message-id failures. Includes retry logic for 5xx errors."""
+    """Disable regenerate logic to avoid missing message-id failures. Includes retry logic for 5xx errors.
+
+    Accepts either a compiled `graph` or a `graph_factory` that is called on first use,
+    so endpoints can be registered without compiling their graphs up front.
+    """
+
+    def __init__(self, *, graph: Any = None, graph_factory: Optional[Callable[[], Any]] = None, **kwargs):
+        if graph is None and graph_factory is None:
+            raise ValueError("graph or graph_factory is required")
+        self._graph_factory = graph_factory
+        super().__init__(graph=graph, **kwargs)
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            return self._graph_factory()
+        return self._graph
+
+    @graph.setter
+    def graph(self, value):
+        self._graph = value
 
     async def run(self, input: RunAgentInput):
         logger.info(f"[{self.name}] Starting run - thread_id: {input.thread_id}, run_id: {input.run_id}")
+        if self._graph is None:
+            # 첫 실행의 그래프 컴파일(수백 ms)이 이벤트 루프를 막지 않도록 스레드에서 합니다.
+            await asyncio.to_thread(self._graph_factory)
         forwarded_props = {}
         if hasattr(input, "forwarded_props") and input.forwarded_props:
             forwarded_props = {camel_to_snake(k): v for k, v in input.forwarded_props.items()}
 
         last_exc = None
+        resume = False
         for attempt in range(MAX_RETRIES):
+            props = {**forwarded_props, RESUME_FROM_CHECKPOINT: True} if resume else forwarded_props
             try:
-                async for event in self._handle_stream_events(input.copy(update={"forwarded_props": forwarded_props})):
+                async for event in self._handle_stream_events(input.copy(update={"forwarded_props": props})):
                     yield event
                 logger.info(f"[{self.name}] Run completed successfully - thread_id: {input.thread_id}")
                 return  # Success, exit
             except Exception as exc:
                 last_exc = exc
-                if _is_retryable_error(exc) and attempt < MAX_RETRIES - 1:
-                    delay = RETRY_DELAY_BASE * (2 ** attempt)
-                    logger.warning(f"[{self.name}] Retryable error (attempt {attempt + 1}/{MAX_RETRIES}): {exc}")
-                    logger.info(f"[{self.name}] Retrying in {delay:.1f}s...")
+                delay = _retry_delay(exc, attempt)
+                if delay is not None and attempt < MAX_RETRIES - 1:
+                    # 이미 커밋된 스텝(LLM/도구 호출, 체크아웃 생성 등)은 다시 실행하지 않고 실패한 노드부터 이어갑니다.
+                    resume = await self._has_pending_checkpoint(input.thread_id)
+                    logger.warning(
+                        f"[{self.name}] Retryable {type(exc).__name__} (attempt {attempt + 1}/{MAX_RETRIES}): {exc}"
+                    )
+                    logger.info(
+                        f"[{self.name}] Retrying in {delay:.1f}s "
+                        f"({'resume from checkpoint' if resume else 'full replay'})..."
+                    )
                     await asyncio.sleep(delay)
                     continue
                 else:
@@ -81,10 +156,22 @@ class SafeLangGraphAgent(LangGraphAgent):
         )
         return
 
+    async def _has_pending_checkpoint(self, thread_id: Optional[str]) -> bool:
+        """실패한 실행이 남긴 체크포인트에 아직 실행할 노드가 있는지 확인합니다."""
+        if not thread_id:
+            return False
+        try:
+            snapshot = await self.graph.aget_state({"configurable": {"thread_id": thread_id}})
+        except Exception as exc:
+            logger.warning(f"[{self.name}] Could not load checkpoint for resume: {exc}")
+            return False
+        return bool(snapshot.next)
+
     async def prepare_stream(self, input: RunAgentInput, agent_state: State, config: RunnableConfig):
         state_input = input.state or {}
         messages = input.messages or []
-        forwarded_props = input.forwarded_props or {}
+        forwarded_props = dict(input.forwarded_props or {})
+        resume_from_checkpoint = bool(forwarded_props.pop(RESUME_FROM_CHECKPOINT, False)) and bool(agent_state.next)
         thread_id = input.thread_id
 
         state_input["messages"] = agent_state.values.get("messages", [])
@@ -93,6 +180,8 @@ class SafeLangGraphAgent(LangGraphAgent):
         state = self.langgraph_default_merge_state(state_input, langchain_messages, input)
         self.active_run["current_graph_state"].update(state)
         config["configurable"]["thread_id"] = thread_id
+        # 도구 마감 시간이 이 실행의 남은 예산을 넘지 않도록 마감 시각(epoch)을 함께 전달합니다.
+        config["configurable"]["run_deadline"] = time.time() + app_config.agent.run_timeout
         interrupts = agent_state.tasks[0].interrupts if agent_state.tasks and len(agent_state.tasks) > 0 else []
         has_active_interrupts = len(interrupts) > 0
         resume_input = forwarded_props.get("command", {}).get("resume", None)
@@ -125,10 +214,15 @@ class SafeLangGraphAgent(LangGraphAgent):
                 "events_to_dispatch": events_to_dispatch,
             }
 
-        if self.active_run["mode"] == "continue":
+        if self.active_run["mode"] == "continue" and not resume_from_checkpoint:
             await self.graph.aupdate_state(config, state, as_node=self.active_run.get("node_name"))
 
-        if resume_input:
+        if resume_from_checkpoint:
+            # 입력 None으로 실행하면 마지막 체크포인트의 남은 노드만 실행됩니다.
+            # (하위 상점 그래프도 자기 체크포인트에서 이어서 실행)
+            logger.info(f"[{self.name}] Resuming thread {thread_id} from checkpoint at {agent_state.next}")
+            stream_input = None
+        elif resume_input:
             if isinstance(resume_input, str):
                 try:
                     resume_input = json.loads(resume_input)
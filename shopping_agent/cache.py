@@ -0,0 +1,498 @@
+"""
+Cache
+
+모듈마다 따로 쓰던 .cache JSON 파일(UCP 매니페스트/스키마, 환율)과 상점 응답 보관본을 대신하는 공용 캐시입니다.
+
+- namespace별 기본 TTL. 만료된 값도 lookup()으로 꺼낼 수 있어 외부 호출 실패 시 stale 대체값으로 씁니다.
+- L1: 프로세스 내 LRU (항목 수 상한)
+- L2: SQLite 파일 (워커 간 공유, 쓰기는 트랜잭션 단위로 원자적, 용량 상한을 넘으면 오래 안 쓴 항목부터 삭제)
+- 저장 계층은 CacheTier 인터페이스로 분리되어 있습니다.
+- namespace/계층별 hit/miss 수와 조회 지연은 cache_stats()와 /metrics로 확인합니다.
+
+재시작 후에도 캐시가 따뜻하도록:
+- L2 파일과 L1 스냅샷에는 버전 스탬프(저장 형식 버전 + CACHE_VERSION)를 기록하고, 스탬프가 다르면
+  디렉터리를 지우는 대신 그 내용을 버립니다.
+- namespace에도 version이 있어 값 형식이 바뀐 namespace의 항목만 무효화할 수 있습니다 (조회 시 항목별 확인).
+- 종료 시와 snapshot_interval마다 L1 항목을 스냅샷 파일로 남기고, 시작 시 아직 유효한 항목만 L1에 다시 올립니다.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from shopping_agent import codec
+from shopping_agent.config import CacheConfig, config
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# L2 테이블/스냅샷 형식이 바뀌면 올립니다. CACHE_VERSION과 합쳐 버전 스탬프가 됩니다.
+_FORMAT_VERSION = 2
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    expires_at: Optional[float] = None
+    # 용량 정리(eviction) 대상에서 제외 (다시 받아올 수 없는 값)
+    persistent: bool = False
+    # 저장 당시 namespace version (다르면 조회 시 miss로 처리)
+    version: int = 1
+
+    def fresh(self, now: float) -> bool:
+        return self.expires_at is None or self.expires_at > now
+
+
+class CacheTier(ABC):
+    """캐시 저장 계층 인터페이스"""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]: ...
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, entry: CacheEntry) -> None: ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None: ...
+
+    @abstractmethod
+    def clear(self, namespace: Optional[str] = None) -> None: ...
+
+
+class MemoryTier(CacheTier):
+    """프로세스 내 LRU"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], CacheEntry] = OrderedDict()
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                self._entries.move_to_end((namespace, key))
+            return entry
+
+    def put(self, namespace: str, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = entry
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for item in [item for item in self._entries if item[0] == namespace]:
+                del self._entries[item]
+
+    def items(self) -> list[tuple[tuple[str, str], CacheEntry]]:
+        """오래 안 쓴 항목부터 (스냅샷용)"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    persistent INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (persistent, accessed_at);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 이 횟수만큼 쓸 때마다 용량 상한/오래 만료된 항목을 정리합니다.
+_MAINTENANCE_EVERY = 64
+
+
+class SqliteTier(CacheTier):
+    """워커 간 공유되는 SQLite 계층 (용량 상한 + LRU 삭제)"""
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int,
+        stale_grace: float,
+        stamp: str = str(_FORMAT_VERSION),
+        busy_timeout: float = 30.0,
+    ):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.stale_grace = stale_grace
+        self.stamp = stamp
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._check_stamp()
+
+    def _check_stamp(self) -> None:
+        """기록된 버전 스탬프가 다르면 (이전 형식/버전의) 항목을 모두 버립니다."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            try:
+                row = self._conn.execute("SELECT value FROM cache_meta WHERE name = 'stamp'").fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            if row is None or row[0] != self.stamp:
+                if row is not None:
+                    logger.info(f"[Cache] stamp changed ({row[0]} -> {self.stamp}), dropping {self.path}")
+                self._conn.execute("DROP TABLE IF EXISTS cache_entries")
+                self._conn.execute("DROP TABLE IF EXISTS cache_meta")
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        self._conn.execute(statement)
+                self._conn.execute("INSERT INTO cache_meta VALUES ('stamp', ?)", (self.stamp,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, expires_at, persistent, version FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), namespace, key),
+            )
+        value, stored_at, expires_at, persistent, version = row
+        return CacheEntry(codec.loads(value), stored_at, expires_at, bool(persistent), version)
+
+    def put(self, namespace: str, key: str, entry: CacheEntry) -> None:
+        value = codec.dumps(entry.value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    namespace, key, value, len(value), entry.stored_at, entry.expires_at,
+                    time.time(), int(entry.persistent), entry.version,
+                ),
+            )
+            self._writes += 1
+            due = self._writes % _MAINTENANCE_EVERY == 0
+        if due:
+            self.maintain()
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM cache_entries")
+            else:
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+    def maintain(self) -> int:
+        """오래 만료된 항목과 용량 상한을 넘는 항목(오래 안 쓴 순)을 삭제합니다."""
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM cache_entries WHERE persistent = 0 AND expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time() - self.stale_grace,),
+            ).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE persistent = 0").fetchone()[0]
+            if total > self.max_bytes:
+                # 다시 바로 넘지 않도록 상한의 90%까지 줄입니다.
+                excess = total - int(self.max_bytes * 0.9)
+                rows = self._conn.execute(
+                    "SELECT namespace, key, size FROM cache_entries WHERE persistent = 0 ORDER BY accessed_at",
+                ).fetchall()
+                victims = []
+                for namespace, key, size in rows:
+                    if excess <= 0:
+                        break
+                    victims.append((namespace, key))
+                    excess -= size
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                removed += len(victims)
+        if removed:
+            metrics.incr("cache.evicted", removed)
+        return removed
+
+    def size(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        return {"entries": count, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CacheNamespace:
+    """namespace 하나에 대한 조회/저장 (기본 TTL, L1 사용 여부, 값 형식 version)"""
+
+    def __init__(
+        self,
+        cache: "Cache",
+        name: str,
+        ttl: Optional[float],
+        memory: bool,
+        persistent: bool,
+        version: int,
+    ):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.memory = memory
+        self.persistent = persistent
+        self.version = version
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """만료 여부와 관계없이 저장된 항목 (만료된 항목은 stale 대체값으로 사용)"""
+        return self.cache._lookup(self, key)
+
+    def fresh(self, entry: CacheEntry) -> bool:
+        return entry.fresh(self.cache.clock())
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.lookup(key)
+        if entry is None or not self.fresh(entry):
+            return None
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.cache._store(self, key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.memory.delete(self.name, key)
+        if self.cache.disk is not None:
+            self.cache.disk.delete(self.name, key)
+
+    def clear(self) -> None:
+        self.cache.memory.clear(self.name)
+        if self.cache.disk is not None:
+            self.cache.disk.clear(self.name)
+
+
+class Cache:
+    """L1(메모리) + L2(디스크) 캐시"""
+
+    def __init__(
+        self,
+        memory: CacheTier,
+        disk: Optional[CacheTier],
+        clock: Callable[[], float] = time.time,
+        stamp: str = str(_FORMAT_VERSION),
+        snapshot_path: Optional[str | Path] = None,
+        snapshot_interval: float = 0,
+    ):
+        self.memory = memory
+        self.disk = disk
+        self.clock = clock
+        self.stamp = stamp
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_at = clock()
+        self._namespaces: dict[str, CacheNamespace] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def namespace(
+        self,
+        name: str,
+        ttl: Optional[float] = None,
+        memory: bool = True,
+        persistent: bool = False,
+        version: int = 1,
+    ) -> CacheNamespace:
+        """namespace를 등록합니다.
+
+        memory=False면 매번 L2를 읽어 다른 워커의 변경을 바로 봅니다.
+        저장하는 값의 형식이 바뀌면 version을 올려 이전 항목을 무효화합니다.
+        """
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is None:
+                namespace = self._namespaces[name] = CacheNamespace(self, name, ttl, memory, persistent, version)
+                self._stats[name] = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "stale": 0, "sets": 0}
+            return namespace
+
+    def _count(self, name: str, field: str) -> None:
+        with self._lock:
+            self._stats[name][field] += 1
+
+    def _lookup(self, namespace: CacheNamespace, key: str) -> Optional[CacheEntry]:
+        started = time.perf_counter()
+        now = self.clock()
+        entry = self.memory.get(namespace.name, key) if namespace.memory else None
+        if entry is not None and entry.version != namespace.version:
+            entry = None
+        tier = "l1_hits"
+        # L1 항목이 만료됐으면 다른 워커가 L2를 갱신했을 수 있으므로 L2를 다시 봅니다.
+        if (entry is None or not entry.fresh(now)) and self.disk is not None:
+            try:
+                stored = self.disk.get(namespace.name, key)
+            except sqlite3.Error as exc:
+                logger.warning(f"[Cache] L2 read failed ({namespace.name}): {exc}")
+                stored = None
+            if stored is not None and stored.version == namespace.version:
+                entry, tier = stored, "l2_hits"
+                if namespace.memory:
+                    self.memory.put(namespace.name, key, entry)
+        metrics.observe("cache.get_seconds", time.perf_counter() - started)
+        if entry is None:
+            self._count(namespace.name, "misses")
+        else:
+            self._count(namespace.name, tier if entry.fresh(now) else "stale")
+        return entry
+
+    def _store(self, namespace: CacheNamespace, key: str, value: Any, ttl: Optional[float]) -> None:
+        now = self.clock()
+        entry = CacheEntry(value, now, now + ttl if ttl is not None else None, namespace.persistent, namespace.version)
+        if namespace.memory:
+            self.memory.put(namespace.name, key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.put(namespace.name, key, entry)
+            except sqlite3.Error as exc:
+                logger.warning(f"[Cache] L2 write failed ({namespace.name}): {exc}")
+        self._count(namespace.name, "sets")
+        if self.snapshot_interval and now - self._snapshot_at >= self.snapshot_interval:
+            self.save_snapshot()
+
+    def save_snapshot(self) -> int:
+        """L1 항목(만료 전)을 스냅샷 파일로 남깁니다. 저장한 항목 수를 반환합니다."""
+        if self.snapshot_path is None or not isinstance(self.memory, MemoryTier):
+            return 0
+        # 다른 스레드가 이미 저장 중이면 건너뜁니다.
+        if not self._snapshot_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = self.clock()
+            self._snapshot_at = now
+            entries = [
+                [namespace, key, entry.version, entry.stored_at, entry.expires_at, entry.persistent, entry.value]
+                for (namespace, key), entry in self.memory.items()
+                if entry.fresh(now)
+            ]
+            payload = {"stamp": self.stamp, "saved_at": now, "entries": entries}
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            # 워커마다 임시 파일을 따로 써서 동시에 저장해도 깨진 파일이 남지 않게 합니다.
+            tmp_path = self.snapshot_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(codec.dumpb(payload))
+            tmp_path.replace(self.snapshot_path)
+            metrics.incr("cache.snapshot_saved")
+            return len(entries)
+        except (OSError, TypeError, ValueError) as exc:
+            logger.warning(f"[Cache] snapshot save failed: {exc}")
+            return 0
+        finally:
+            self._snapshot_lock.release()
+
+    def load_snapshot(self) -> int:
+        """스냅샷에서 아직 유효한 항목을 L1에 올립니다. 올린 항목 수를 반환합니다.
+
+        스탬프가 다른 스냅샷은 통째로, 만료됐거나 형식이 맞지 않는 항목은 하나씩 건너뜁니다.
+        namespace version은 조회 시점에 확인합니다.
+        """
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return 0
+        try:
+            payload = codec.loads(self.snapshot_path.read_bytes())
+        except (OSError, ValueError) as exc:
+            logger.warning(f"[Cache] snapshot load failed: {exc}")
+            return 0
+        if not isinstance(payload, dict) or payload.get("stamp") != self.stamp:
+            logger.info(f"[Cache] snapshot stamp mismatch, ignoring {self.snapshot_path}")
+            return 0
+        now = self.clock()
+        loaded = 0
+        for item in payload.get("entries") or []:
+            try:
+                namespace, key, version, stored_at, expires_at, persistent, value = item
+                entry = CacheEntry(value, float(stored_at), expires_at, bool(persistent), int(version))
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(namespace, str) or not isinstance(key, str) or not entry.fresh(now):
+                continue
+            self.memory.put(namespace, key, entry)
+            loaded += 1
+        metrics.incr("cache.snapshot_loaded", loaded)
+        return loaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {name: dict(counts) for name, counts in self._stats.items()}
+        for counts in namespaces.values():
+            hits = counts["l1_hits"] + counts["l2_hits"]
+            total = hits + counts["misses"] + counts["stale"]
+            counts["hit_ratio"] = round(hits / total, 3) if total else None
+        result: dict[str, Any] = {"namespaces": namespaces}
+        if isinstance(self.memory, MemoryTier):
+            result["l1_entries"] = len(self.memory)
+        if isinstance(self.disk, SqliteTier):
+            result["l2"] = self.disk.size()
+        return result
+
+
+def create_cache(settings: CacheConfig) -> Cache:
+    stamp = f"{_FORMAT_VERSION}:{settings.version}"
+    disk = None
+    if settings.backend == "sqlite":
+        disk = SqliteTier(settings.path, settings.max_bytes, settings.stale_grace, stamp=stamp)
+    return Cache(
+        MemoryTier(settings.memory_entries),
+        disk,
+        stamp=stamp,
+        snapshot_path=settings.snapshot_path or None,
+        snapshot_interval=settings.snapshot_interval,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_cache() -> Cache:
+    return create_cache(config.cache)
+
+
+def cache_stats() -> dict:
+    return get_cache().stats()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlparse
+import threading
+import time
+
+from shopping_agent import deadline
+from shopping_agent.config import config
+from shopping_agent.shared_store import SharedStore, get_shared_store
+
+# 더 이상 상태가 바뀌지 않는 체크아웃 상태
+TERMINAL_STATUSES = frozenset({"completed", "canceled", "cancelled", "expired", "fallback"})
+
+_SHARED_NAMESPACE = "checkout_session"
+
+
+@dataclass
+class CheckoutSession:
+    store_key: str
+    checkout_id: str
+    payload: dict
+    expires_at: float
+
+    @property
+    def status(self) -> str:
+        return str(self.payload.get("status") or "").lower()
+
+
+def _store_key(store_url: str) -> str:
+    return (urlparse(store_url).netloc or store_url).lower().rstrip("/")
+
+
+class CheckoutSessionCache:
+    """(상점, checkout_id) 단위 체크아웃 세션 캐시
+
+    서버가 만든 체크아웃을 session_timeout 동안 보관하고,
+    상태 대기(wait_for_status)는 키마다 하나의 폴러만 상점에 요청하도록 합칩니다.
+    shared_store를 주면 다른 워커가 갱신/무효화한 세션도 함께 봅니다.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        shared_store: Optional[Callable[[], SharedStore]] = None,
+    ) -> None:
+        self._ttl = ttl
+        self._clock = clock
+        self._shared_store = shared_store
+        self._entries: dict[tuple[str, str], CheckoutSession] = {}
+        self._changed = threading.Condition(threading.Lock())
+        self._pollers: set[tuple[str, str]] = set()
+        # put/invalidate 때마다 증가. 잠금 밖에서 읽는 동안 놓친 갱신 알림을 알아챕니다.
+        self._generation = 0
+
+    @property
+    def ttl(self) -> float:
+        return float(self._ttl if self._ttl is not None else config.ucp.session_timeout)
+
+    @staticmethod
+    def _shared_key(key: tuple[str, str]) -> str:
+        return f"{key[0]}|{key[1]}"
+
+    def _get(self, key: tuple[str, str]) -> Optional[CheckoutSession]:
+        if self._shared_store is None:
+            with self._changed:
+                session = self._entries.get(key)
+                if session and session.expires_at <= self._clock():
+                    del self._entries[key]
+                    return None
+                return session
+
+        # 공유 저장소가 기준입니다 (다른 워커의 갱신/무효화 반영).
+        # SQLite 읽기는 잠금 밖에서 하고, 로컬 항목 동기화만 잠금 안에서 합니다.
+        payload = self._shared_store().get(_SHARED_NAMESPACE, self._shared_key(key))
+        with self._changed:
+            if payload is None:
+                self._entries.pop(key, None)
+                return None
+            session = self._entries.get(key)
+            if session is None or session.payload != payload:
+                session = CheckoutSession(key[0], key[1], payload, self._clock() + self.ttl)
+                self._entries[key] = session
+            return session
+
+    def _notify_locked(self) -> None:
+        self._generation += 1
+        self._changed.notify_all()
+
+    def get(self, store_url: str, checkout_id: str) -> Optional[dict]:
+        session = self._get((_store_key(store_url), str(checkout_id)))
+        return session.payload if session else None
+
+    def put(self, store_url: str, payload: dict, checkout_id: Optional[str] = None) -> Optional[CheckoutSession]:
+        checkout_id = checkout_id or payload.get("id")
+        if not checkout_id:
+            return None
+        key = (_store_key(store_url), str(checkout_id))
+        session = CheckoutSession(
+            store_key=key[0],
+            checkout_id=key[1],
+            payload=payload,
+            expires_at=self._clock() + self.ttl,
+        )
+        if self._shared_store is not None:
+            self._shared_store().put(_SHARED_NAMESPACE, self._shared_key(key), payload, ttl=self.ttl)
+        with self._changed:
+            self._entries[key] = session
+            self._notify_locked()
+        return session
+
+    def invalidate(self, store_url: str, checkout_id: str) -> None:
+        key = (_store_key(store_url), str(checkout_id))
+        if self._shared_store is not None:
+            self._shared_store().delete(_SHARED_NAMESPACE, self._shared_key(key))
+        with self._changed:
+            self._entries.pop(key, None)
+            self._notify_locked()
+
+    def clear(self) -> None:
+        if self._shared_store is not None:
+            self._shared_store().clear(_SHARED_NAMESPACE)
+        with self._changed:
+            self._entries.clear()
+            self._notify_locked()
+
+    def wait_for_status(
+        self,
+        store_url: str,
+        checkout_id: str,
+        statuses: Iterable[str],
+        fetch: Callable[[], Optional[dict]],
+        timeout: float = 30.0,
+        initial_delay: float = 0.5,
+        max_delay: float = 5.0,
+    ) -> tuple[Optional[dict], bool]:
+        """체크아웃이 원하는 상태가 될 때까지 지수 백오프로 폴링합니다.
+
+        같은 키를 기다리는 호출이 여럿이면 하나만 fetch를 수행하고
+        나머지는 캐시 갱신 알림을 공유합니다.
+
+        timeout은 status_wait_max와 현재 도구 마감 시각(deadline.remaining()) 이내로 줄입니다.
+        ToolDeadlineMiddleware가 먼저 포기해도 풀 스레드가 Condition에 계속 묶여 있지 않게 하기 위함입니다.
+
+        Returns:
+            (마지막으로 본 체크아웃 payload, 원하는 상태 도달 여부)
+        """
+        key = (_store_key(store_url), str(checkout_id))
+        targets = {status.lower() for status in statuses}
+        timeout = min(max(timeout, 0.0), float(config.ucp.status_wait_max))
+        left = deadline.remaining()
+        if left is not None:
+            timeout = min(timeout, max(left, 0.0))
+        until = self._clock() + timeout
+        delay = initial_delay
+
+        def _settled(session: Optional[CheckoutSession]) -> bool:
+            return bool(session) and (session.status in targets or session.status in TERMINAL_STATUSES)
+
+        # 다른 대기자가 이미 폴링 중이면 그 결과를 기다립니다.
+        while True:
+            with self._changed:
+                seen = self._generation
+            session = self._get(key)
+            if _settled(session):
+                return session.payload, session.status in targets
+            remaining = until - self._clock()
+            if remaining <= 0:
+                return (session.payload if session else None), False
+            with self._changed:
+                if key not in self._pollers:
+                    self._pollers.add(key)
+                    break
+                if self._generation == seen:
+                    self._changed.wait(remaining)
+
+        try:
+            while True:
+                try:
+                    payload = fetch()
+                except Exception:
+                    payload = None
+                if payload:
+                    self.put(store_url, payload, checkout_id=checkout_id)
+
+                with self._changed:
+                    seen = self._generation
+                session = self._get(key)
+                if _settled(session):
+                    return session.payload, session.status in targets
+                remaining = until - self._clock()
+                if remaining <= 0:
+                    return (session.payload if session else None), False
+                # 백오프 중에도 put()으로 상태가 바뀌면 바로 깨어납니다.
+                with self._changed:
+                    changed = self._generation != seen or self._changed.wait(min(delay, remaining))
+                if changed:
+                    session = self._get(key)
+                    if _settled(session):
+                        return session.payload, session.status in targets
+                delay = min(delay * 2, max_delay)
+        finally:
+            with self._changed:
+                self._pollers.discard(key)
+                self._notify_locked()
+
+
+session_cache = CheckoutSessionCache(shared_store=get_shared_store)
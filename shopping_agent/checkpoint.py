@@ -0,0 +1,622 @@
+"""
+Bounded Checkpointer
+
+라우터/상점 그래프가 공유하는 대화 체크포인트 저장소입니다.
+
+- 저장은 CheckpointDriver 인터페이스로 분리되어 있고, 기본 구현은 SQLite입니다.
+- 새 체크포인트를 저장할 때 thread/namespace별 최신 N개만 남기고 정리(compaction)합니다.
+- 주기적으로 오래된 thread와 thread 수/용량 상한을 넘는 thread를 삭제(eviction)합니다.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from shopping_agent.config import CheckpointConfig, config
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CheckpointRow:
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint_id: str
+    parent_id: Optional[str]
+    checkpoint: tuple[str, bytes]
+    metadata: tuple[str, bytes]
+
+
+@dataclass
+class WriteRow:
+    task_id: str
+    idx: int
+    channel: str
+    value: tuple[str, bytes]
+    task_path: str
+
+
+class CheckpointDriver(ABC):
+    """체크포인트 저장소 드라이버 (직렬화된 바이트만 다루며 LangGraph 타입을 몰라도 됩니다)"""
+
+    @abstractmethod
+    def put_checkpoint(self, row: CheckpointRow) -> None: ...
+
+    @abstractmethod
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[CheckpointRow]:
+        """checkpoint_id가 없으면 최신 체크포인트를 반환합니다."""
+
+    @abstractmethod
+    def list_checkpoints(
+        self,
+        thread_id: Optional[str],
+        checkpoint_ns: Optional[str],
+        before_id: Optional[str] = None,
+    ) -> Iterator[CheckpointRow]:
+        """최신순으로 반환합니다."""
+
+    @abstractmethod
+    def put_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, rows: list[WriteRow]) -> None:
+        """idx >= 0인 write는 이미 있으면 무시하고, 특수 채널(idx < 0)은 덮어씁니다."""
+
+    @abstractmethod
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list[WriteRow]: ...
+
+    @abstractmethod
+    def delete_thread(self, thread_id: str) -> None: ...
+
+    @abstractmethod
+    def compact(self, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+        """최신 keep개를 제외한 체크포인트와 write를 삭제하고 삭제 수를 반환합니다."""
+
+    @abstractmethod
+    def delete_namespaces(self, thread_id: str, exclude: str = "") -> int:
+        """thread에서 exclude를 제외한 namespace(서브그래프) 체크포인트를 삭제합니다."""
+
+    @abstractmethod
+    def evict(self, max_age: Optional[float], max_threads: Optional[int], max_bytes: Optional[int]) -> int:
+        """만료/상한 초과 thread를 오래된 순으로 삭제하고 삭제한 thread 수를 반환합니다."""
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+    def close(self) -> None:
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SQLiteCheckpointDriver(CheckpointDriver):
+    """SQLite 드라이버 (WAL 모드, 여러 프로세스가 같은 파일을 공유할 수 있음)"""
+
+    def __init__(self, path: str | Path = ":memory:", busy_timeout: float = 30.0):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            # auto_vacuum은 테이블 생성 전에 설정해야 삭제한 페이지를 파일에서 돌려받을 수 있습니다.
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _transaction(self, statements: list[tuple[str, Sequence[Any]]]) -> list[int]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                counts = [self._conn.execute(sql, params).rowcount for sql, params in statements]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return counts
+
+    @staticmethod
+    def _row(values: tuple) -> CheckpointRow:
+        thread_id, ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = values
+        return CheckpointRow(thread_id, ns, checkpoint_id, parent_id, (type_, checkpoint), (metadata_type, metadata))
+
+    def put_checkpoint(self, row: CheckpointRow) -> None:
+        self._transaction([
+            (
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    row.thread_id, row.checkpoint_ns, row.checkpoint_id, row.parent_id,
+                    row.checkpoint[0], row.checkpoint[1], row.metadata[0], row.metadata[1],
+                ),
+            ),
+            ("INSERT OR REPLACE INTO threads VALUES (?, ?)", (row.thread_id, time.time())),
+        ])
+
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[CheckpointRow]:
+        if checkpoint_id:
+            rows = self._execute(
+                "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._execute(
+                "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        return self._row(rows[0]) if rows else None
+
+    def list_checkpoints(
+        self,
+        thread_id: Optional[str],
+        checkpoint_ns: Optional[str],
+        before_id: Optional[str] = None,
+    ) -> Iterator[CheckpointRow]:
+        clauses, params = [], []
+        if thread_id is not None:
+            clauses.append("thread_id = ?")
+            params.append(thread_id)
+        if checkpoint_ns is not None:
+            clauses.append("checkpoint_ns = ?")
+            params.append(checkpoint_ns)
+        if before_id is not None:
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._execute(
+            f"SELECT * FROM checkpoints {where} ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+            params,
+        )
+        return (self._row(values) for values in rows)
+
+    def put_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, rows: list[WriteRow]) -> None:
+        self._transaction([
+            (
+                f"INSERT OR {'REPLACE' if row.idx < 0 else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint_id, row.task_id, row.idx,
+                    row.channel, row.value[0], row.value[1], row.task_path,
+                ),
+            )
+            for row in rows
+        ])
+
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list[WriteRow]:
+        rows = self._execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return [
+            WriteRow(task_id, idx, channel, (type_, value), task_path)
+            for task_id, idx, channel, type_, value, task_path in rows
+        ]
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._transaction([
+            ("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)),
+            ("DELETE FROM writes WHERE thread_id = ?", (thread_id,)),
+            ("DELETE FROM threads WHERE thread_id = ?", (thread_id,)),
+        ])
+
+    def compact(self, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+        where = "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = [
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                    for (checkpoint_id,) in self._conn.execute(
+                        "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                        "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                        (thread_id, checkpoint_ns, keep),
+                    ).fetchall()
+                ]
+                self._conn.executemany(f"DELETE FROM checkpoints {where}", stale)
+                self._conn.executemany(f"DELETE FROM writes {where}", stale)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(stale)
+
+    def delete_namespaces(self, thread_id: str, exclude: str = "") -> int:
+        deleted, _ = self._transaction([
+            ("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns != ?", (thread_id, exclude)),
+            ("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns != ?", (thread_id, exclude)),
+        ])
+        return deleted
+
+    def evict(self, max_age: Optional[float], max_threads: Optional[int], max_bytes: Optional[int]) -> int:
+        doomed: list[str] = []
+        if max_age is not None:
+            cutoff = time.time() - max_age
+            doomed += [row[0] for row in self._execute("SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff,))]
+        if max_threads is not None or max_bytes is not None:
+            # 용량은 thread별 체크포인트/write 크기 합으로 계산합니다 (최근 thread부터 누적).
+            rows = self._execute(
+                "SELECT t.thread_id, "
+                "COALESCE((SELECT SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints c "
+                "WHERE c.thread_id = t.thread_id), 0) + "
+                "COALESCE((SELECT SUM(LENGTH(value)) FROM writes w WHERE w.thread_id = t.thread_id), 0) "
+                "FROM threads t ORDER BY t.updated_at DESC"
+            )
+            total = 0
+            for position, (thread_id, size) in enumerate(rows):
+                total += size
+                if (max_threads is not None and position >= max_threads) or (max_bytes is not None and total > max_bytes):
+                    doomed.append(thread_id)
+        doomed = list(dict.fromkeys(doomed))
+        for thread_id in doomed:
+            self.delete_thread(thread_id)
+        if doomed:
+            self._execute("PRAGMA incremental_vacuum")
+        return len(doomed)
+
+    def stats(self) -> dict:
+        (threads,), = self._execute("SELECT COUNT(*) FROM threads")
+        (checkpoints,), = self._execute("SELECT COUNT(*) FROM checkpoints")
+        (writes,), = self._execute("SELECT COUNT(*) FROM writes")
+        (page_count,), = self._execute("PRAGMA page_count")
+        (page_size,), = self._execute("PRAGMA page_size")
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "writes": writes,
+            "bytes": page_count * page_size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class BoundedCheckpointSaver(BaseCheckpointSaver[str]):
+    """CheckpointDriver 위에 compaction/eviction을 얹은 LangGraph 체크포인터
+
+    Args:
+        driver: 저장소 드라이버
+        keep_latest: thread/namespace별로 유지할 최신 체크포인트 수
+        max_age: 마지막 갱신 후 이 시간(초)이 지난 thread 삭제
+        max_threads: 저장 thread 수 상한
+        max_bytes: 저장 용량 상한
+        maintenance_interval: eviction 실행 주기(초)
+        scope: 같은 드라이버를 쓰는 다른 그래프와 thread_id가 겹치지 않도록 붙이는 접두어
+    """
+
+    def __init__(
+        self,
+        driver: CheckpointDriver,
+        *,
+        keep_latest: int = 5,
+        max_age: Optional[float] = None,
+        max_threads: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        maintenance_interval: float = 60.0,
+        scope: Optional[str] = None,
+        serde: Any = None,
+    ):
+        super().__init__(serde=serde)
+        self.driver = driver
+        self.keep_latest = max(keep_latest, 1)
+        self.max_age = max_age
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.maintenance_interval = maintenance_interval
+        self.scope = scope
+        self._prefix = f"{scope}/" if scope else ""
+        self._last_maintenance = time.monotonic()
+        self._maintenance_lock = threading.Lock()
+
+    def scoped(self, scope: str) -> "BoundedCheckpointSaver":
+        """같은 드라이버/정리 정책을 공유하되 thread_id 공간이 분리된 체크포인터를 반환합니다."""
+        return BoundedCheckpointSaver(
+            self.driver,
+            keep_latest=self.keep_latest,
+            max_age=self.max_age,
+            max_threads=self.max_threads,
+            max_bytes=self.max_bytes,
+            maintenance_interval=self.maintenance_interval,
+            scope=f"{self._prefix}{scope}",
+            serde=self.serde,
+        )
+
+    # ---- 변환 ----
+
+    def _key(self, thread_id: str) -> str:
+        return f"{self._prefix}{thread_id}"
+
+    def _tuple(self, row: CheckpointRow, config: Optional[RunnableConfig] = None) -> CheckpointTuple:
+        writes = self.driver.get_writes(row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+        thread_id = row.thread_id[len(self._prefix):]
+        return CheckpointTuple(
+            config=config or {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed(row.checkpoint),
+            metadata=self.serde.loads_typed(row.metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_id,
+                    }
+                }
+                if row.parent_id
+                else None
+            ),
+            pending_writes=[(w.task_id, w.channel, self.serde.loads_typed(w.value)) for w in writes],
+        )
+
+    # ---- BaseCheckpointSaver ----
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        checkpoint_id = get_checkpoint_id(config)
+        row = self.driver.get_checkpoint(
+            self._key(configurable["thread_id"]),
+            configurable.get("checkpoint_ns", ""),
+            checkpoint_id,
+        )
+        if row is None:
+            return None
+        return self._tuple(row, config if checkpoint_id else None)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        configurable = config["configurable"] if config else {}
+        thread_id = configurable.get("thread_id")
+        checkpoint_id = get_checkpoint_id(config) if config else None
+        rows = self.driver.list_checkpoints(
+            self._key(thread_id) if thread_id is not None else None,
+            configurable.get("checkpoint_ns"),
+            get_checkpoint_id(before) if before else None,
+        )
+        for row in rows:
+            if not row.thread_id.startswith(self._prefix):
+                continue
+            if checkpoint_id and row.checkpoint_id != checkpoint_id:
+                continue
+            if filter:
+                metadata = self.serde.loads_typed(row.metadata)
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield self._tuple(row)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        thread_key = self._key(thread_id)
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        metadata = get_checkpoint_metadata(config, metadata)
+        self.driver.put_checkpoint(CheckpointRow(
+            thread_id=thread_key,
+            checkpoint_ns=checkpoint_ns,
+            checkpoint_id=checkpoint["id"],
+            parent_id=config["configurable"].get("checkpoint_id"),
+            checkpoint=self.serde.dumps_typed(checkpoint),
+            metadata=self.serde.dumps_typed(metadata),
+        ))
+
+        compacted = self.driver.compact(thread_key, checkpoint_ns, self.keep_latest)
+        if not checkpoint_ns and metadata.get("source") == "input":
+            # 새 턴이 시작되면 이전 턴의 서브그래프(상점 에이전트) 체크포인트는 다시 읽히지 않습니다.
+            compacted += self.driver.delete_namespaces(thread_key)
+        if compacted:
+            metrics.incr("checkpoint.compacted", compacted)
+        self._maybe_maintain()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        rows = [
+            WriteRow(task_id, WRITES_IDX_MAP.get(channel, idx), channel, self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self.driver.put_writes(
+            self._key(configurable["thread_id"]),
+            configurable.get("checkpoint_ns", ""),
+            configurable["checkpoint_id"],
+            rows,
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.driver.delete_thread(self._key(thread_id))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---- 정리 ----
+
+    def _maybe_maintain(self) -> None:
+        if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_maintenance = time.monotonic()
+            self.evict()
+        finally:
+            self._maintenance_lock.release()
+
+    def evict(self) -> int:
+        """만료/상한 초과 thread를 삭제합니다 (드라이버 전체 대상)."""
+        try:
+            evicted = self.driver.evict(self.max_age, self.max_threads, self.max_bytes)
+        except Exception as exc:
+            logger.warning(f"[Checkpoint] Eviction failed: {exc}")
+            return 0
+        if evicted:
+            metrics.incr("checkpoint.evicted_threads", evicted)
+            logger.info(f"[Checkpoint] Evicted {evicted} threads")
+        return evicted
+
+    def stats(self) -> dict:
+        return {**self.driver.stats(), "keep_latest": self.keep_latest}
+
+    def close(self) -> None:
+        self.driver.close()
+
+
+def create_checkpointer(settings: CheckpointConfig) -> BaseCheckpointSaver:
+    """설정에 맞는 체크포인터를 만듭니다. 다른 백엔드는 CheckpointDriver를 구현해 연결합니다."""
+    if settings.backend == "memory":
+        return MemorySaver()
+    if settings.backend != "sqlite":
+        raise ValueError(f"Unknown checkpoint backend: {settings.backend}")
+    return BoundedCheckpointSaver(
+        SQLiteCheckpointDriver(settings.path),
+        keep_latest=settings.keep_latest,
+        max_age=settings.max_age,
+        max_threads=settings.max_threads,
+        max_bytes=settings.max_bytes,
+        maintenance_interval=settings.maintenance_interval,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer(scope: Optional[str] = None) -> BaseCheckpointSaver:
+    """라우터/상점 그래프가 공유하는 체크포인터
+
+    scope를 주면 같은 저장소를 쓰되 thread_id 공간이 분리된 체크포인터를 반환합니다.
+    (상점 그래프를 /agent/{store}로 단독 실행할 때 라우터 thread와 섞이지 않도록 사용)
+    """
+    if scope is None:
+        return create_checkpointer(config.checkpoint)
+    base = get_checkpointer()
+    if isinstance(base, BoundedCheckpointSaver):
+        return base.scoped(scope)
+    return MemorySaver()
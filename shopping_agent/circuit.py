@@ -0,0 +1,118 @@
+"""
+Circuit Breaker
+
+상점 스토어프론트, UCP 엔드포인트, EXIM 등 외부 호스트별 회로 차단기입니다.
+
+- closed: 평소 상태. 연속 실패(연결/타임아웃 에러, 5xx)가 threshold에 닿으면 open
+- open: open_seconds 동안 그 호스트로 요청을 보내지 않고 즉시 CircuitOpen을 발생
+- half-open: open_seconds가 지나면 요청 하나만 시험 삼아 보내 성공하면 closed, 실패하면 다시 open
+
+죽은 상점 때문에 도구 호출마다 10~15초 타임아웃을 기다리지 않고, 도구는 보관해 둔
+결과(http.get_json_cached)를 stale 표시와 함께 바로 돌려줍니다.
+"""
+
+from __future__ import annotations
+
+from typing import Callable
+import logging
+import threading
+import time
+
+from shopping_agent.config import UpstreamConfig, config
+from shopping_agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(ConnectionError):
+    """회로가 열려 있어 요청을 보내지 않음"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host}, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probing", "opened")
+
+    def __init__(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+
+
+class CircuitBreaker:
+    """호스트별 회로 차단기 (도구 풀 스레드와 이벤트 루프가 함께 사용)"""
+
+    def __init__(self, settings: UpstreamConfig, clock: Callable[[], float] = time.monotonic):
+        self.settings = settings
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._circuits: dict[str, _Circuit] = {}
+
+    def before(self, host: str) -> None:
+        """요청을 보내도 되는지 확인합니다. 안 되면 CircuitOpen을 발생시킵니다."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.state == CLOSED:
+                return
+            now = self._clock()
+            retry_in = circuit.opened_at + self.settings.circuit_open_seconds - now
+            if circuit.state == OPEN and retry_in <= 0:
+                circuit.state = HALF_OPEN
+            if circuit.state == HALF_OPEN and not circuit.probing:
+                circuit.probing = True
+                return
+        metrics.incr("circuit.rejected")
+        raise CircuitOpen(host, max(retry_in, 0.0))
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return
+            if circuit.state != CLOSED:
+                logger.info(f"[Circuit] {host} closed")
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.probing = False
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = _Circuit()
+            circuit.failures += 1
+            reopen = circuit.state == HALF_OPEN
+            circuit.probing = False
+            if not reopen and (circuit.state == OPEN or circuit.failures < self.settings.circuit_failure_threshold):
+                return
+            circuit.state = OPEN
+            circuit.opened_at = self._clock()
+            circuit.opened += 1
+        metrics.incr("circuit.opened")
+        logger.warning(f"[Circuit] {host} open for {self.settings.circuit_open_seconds:.0f}s ({circuit.failures} failures)")
+
+    def release(self, host: str) -> None:
+        """성공/실패로 볼 수 없게 끝난 요청(로컬 마감 시간 초과 등)의 half-open 시험 자리를 돌려줍니다."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                circuit.probing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                host: {"state": circuit.state, "failures": circuit.failures, "opened": circuit.opened}
+                for host, circuit in self._circuits.items()
+            }
+
+
+circuit_breaker = CircuitBreaker(config.upstream)
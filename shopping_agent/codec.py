@@ -0,0 +1,124 @@
+"""
+JSON Codec
+
+도구 결과, JSON-RPC 본문, 캐시 값, 상품 .js 응답의 JSON 인코딩/디코딩을 한곳에서 처리합니다.
+
+- orjson이 설치되어 있으면 사용하고(langsmith 의존성으로 보통 함께 설치됨), 없으면 표준 json으로 동작합니다.
+- 출력 형식은 두 백엔드가 같습니다: 공백 없는 구분자, 비ASCII 문자는 이스케이프하지 않음.
+- Shopify 상품(.js)과 UCP 체크아웃은 decode_product / decode_checkout으로 읽어
+  이후 코드가 기대하는 모양(dict, variants/line_items 리스트)을 디코딩 시점에 한 번 확인합니다.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, TypedDict
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 없는 환경
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+Default = Optional[Callable[[Any], Any]]
+
+
+def dumpb(obj: Any, sort_keys: bool = False, default: Default = None) -> bytes:
+    """공백 없는 UTF-8 JSON 바이트"""
+    if orjson is not None:
+        # orjson은 문자열이 아닌 키를 문자열로 바꾼 뒤 정렬해 표준 json(원래 값으로 정렬)과 순서가 달라지므로,
+        # sort_keys일 때는 문자열 키만 orjson으로 처리하고 나머지는 아래 표준 json 경로로 넘깁니다.
+        option = orjson.OPT_SORT_KEYS if sort_keys else orjson.OPT_NON_STR_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # 64비트를 넘는 정수 등 orjson이 거부하는 값은 표준 json으로 처리합니다.
+            pass
+    return _stdlib_dumps(obj, sort_keys, default).encode("utf-8")
+
+
+def dumps(obj: Any, sort_keys: bool = False, default: Default = None) -> str:
+    """공백 없는 JSON 문자열 (비ASCII 문자 그대로)"""
+    if orjson is not None:
+        return dumpb(obj, sort_keys=sort_keys, default=default).decode("utf-8")
+    return _stdlib_dumps(obj, sort_keys, default)
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool, default: Default) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """JSON 디코딩. 잘못된 JSON이면 ValueError(json.JSONDecodeError)를 발생시킵니다.
+
+    orjson은 64비트 범위를 넘는 정수를 float로 읽습니다 (상점/UCP 응답의 ID는 이 범위 안).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class ShopifyVariant(TypedDict, total=False):
+    id: int
+    title: str
+    price: int
+    available: bool
+
+
+class ShopifyProduct(TypedDict, total=False):
+    id: int
+    title: str
+    handle: str
+    featured_image: Optional[str]
+    images: list[str]
+    variants: list[ShopifyVariant]
+
+
+class UcpLineItem(TypedDict, total=False):
+    id: str
+    item: dict[str, Any]
+    quantity: int
+    totals: list[dict[str, Any]]
+
+
+class UcpCheckout(TypedDict, total=False):
+    id: str
+    status: str
+    currency: str
+    line_items: list[UcpLineItem]
+    totals: list[dict[str, Any]]
+    continue_url: Optional[str]
+    messages: list[dict[str, Any]]
+
+
+def _decoded(data: Any) -> Any:
+    return loads(data) if isinstance(data, (str, bytes, bytearray, memoryview)) else data
+
+
+def _dict_items(value: Any) -> list[dict]:
+    return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+
+
+def decode_product(data: Any) -> ShopifyProduct:
+    """Shopify /products/<handle>.js 응답 (바이트/문자열 또는 이미 디코딩된 값)
+
+    상품 객체가 아니면 ValueError. variants는 dict만 남긴 리스트로 맞춥니다.
+    """
+    product = _decoded(data)
+    if not isinstance(product, dict):
+        raise ValueError("Unexpected product format")
+    product["variants"] = _dict_items(product.get("variants"))
+    return product
+
+
+def decode_checkout(data: Any) -> UcpCheckout:
+    """UCP 체크아웃 객체. 객체가 아니면 ValueError. line_items는 dict만 남긴 리스트로 맞춥니다."""
+    checkout = _decoded(data)
+    if not isinstance(checkout, dict):
+        raise ValueError("Unexpected checkout format")
+    if "line_items" in checkout:
+        checkout["line_items"] = _dict_items(checkout.get("line_items"))
+    return checkout
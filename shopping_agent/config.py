@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import Optional
 from pydantic import BaseModel, Field
 import os
@@ -5,6 +6,11 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# 워커/프로세스가 공유하는 상태(체크포인트, 공유 캐시) 기본 위치
+DEFAULT_STATE_DIR = Path(__file__).resolve().parent / ".state"
+# 외부 호출 결과 캐시(매니페스트, 스키마, 환율, 상품 응답) 기본 위치
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+
 
 class ShippingAddress(BaseModel):
     """배대지 주소 (미국 면세주)"""
@@ -41,6 +47,9 @@ class UCPConfig(BaseModel):
     # 타임아웃 설정
     request_timeout: int = 30
     session_timeout: int = 3600  # 1시간
+    # 체크아웃 상태 대기(long-poll, ucp_wait_for_checkout_status) 최대 시간과 /api/checkout/status 전용 스레드 수
+    status_wait_max: int = 60
+    status_wait_workers: int = 16
 
     @property
     def manifest_url(self) -> str:
@@ -61,6 +70,38 @@ class AgentConfig(BaseModel):
         description="LLM 요청 타임아웃(초)"
     )
 
+    # 라우터 LLM 설정 - 상점 선택만 하므로 짧은 타임아웃/출력 예산 사용
+    router_request_timeout: int = Field(
+        default=15,
+        description="라우터 LLM 요청 타임아웃(초)"
+    )
+    # 사고(thinking) 토큰도 출력 예산에 포함되므로 JSON 답이 잘리지 않게 여유를 두고, 사고는 최소로 둡니다.
+    router_max_tokens: int = 1024
+    router_max_retries: int = 1
+    router_thinking_level: Optional[str] = "minimal"
+    # 로컬 분류기 신뢰도가 이 값 이상이면 라우터 LLM 호출을 생략
+    router_local_threshold: float = 0.8
+    # 이전 상점이 있는 대화에서 다른 상점 신호가 이 값 이상이면 LLM으로 재라우팅
+    router_reroute_threshold: float = 0.5
+    # 라우터 LLM 호출과 동시에 유력 상점 에이전트의 첫 모델 호출을 미리 실행 (opt-in)
+    router_speculative: bool = False
+
+    # 모델 호출당 메시지 기록 토큰 예산 (초과 시 이전 도구 결과를 접고 오래된 턴부터 축약)
+    history_token_budget: int = 12000
+    # 이전 턴의 일반 도구 결과를 남길 최대 글자 수
+    history_tool_summary_chars: int = 400
+    # 도구 결과를 최소 JSON으로 반환하고 화면용 데이터(상품 카드)는 커스텀 이벤트로 전달
+    compact_tool_output: bool = True
+    # 같은 thread 안에서 반복되는 멱등 도구 호출 결과 재사용
+    tool_cache_enabled: bool = True
+    # 한 스텝(thread)에서 동시에 실행할 도구 호출 수 / 동기 도구 전용 스레드 풀 크기
+    tool_max_concurrency: int = 4
+    tool_pool_size: int = 16
+    # 한 실행(run)의 전체 예산(초). 도구 마감 시간은 남은 예산을 넘지 않습니다.
+    run_timeout: float = 120.0
+    # 도구 인자(timeout)로 늘릴 수 있는 도구 마감 시간의 상한(초)
+    tool_timeout_max: float = 65.0
+
     # 재시도 설정
     max_retries: int = 3
     retry_delay: float = 1.0
@@ -69,10 +110,92 @@ class AgentConfig(BaseModel):
     approval_threshold: float = 100.0
 
 
+class CheckpointConfig(BaseModel):
+    """대화 체크포인트 저장소 설정"""
+    # "sqlite" (기본, 재시작 후에도 유지) 또는 "memory" (프로세스 내, 테스트용)
+    backend: str = "sqlite"
+    path: str = str(DEFAULT_STATE_DIR / "checkpoints.sqlite")
+
+    # thread/namespace별로 유지할 최신 체크포인트 수
+    keep_latest: int = 5
+    # 마지막 갱신 후 이 시간(초)이 지난 thread 삭제
+    max_age: int = 7 * 24 * 3600
+    # 저장 thread 수/용량 상한 (초과 시 오래된 thread부터 삭제)
+    max_threads: int = 10000
+    max_bytes: int = 512 * 1024 * 1024
+    # 만료/용량 정리 주기(초)
+    maintenance_interval: int = 60
+
+
+class CacheConfig(BaseModel):
+    """공용 캐시(shopping_agent.cache) 설정"""
+    # "sqlite" (L1 메모리 + L2 SQLite, 기본) 또는 "memory" (L1만, 테스트용)
+    backend: str = "sqlite"
+    path: str = str(DEFAULT_CACHE_DIR / "cache.sqlite")
+    # L1 항목 수 상한 / L2 용량 상한(바이트, persistent namespace 제외)
+    memory_entries: int = 512
+    max_bytes: int = 64 * 1024 * 1024
+    # 만료 후에도 stale 대체값으로 남겨 두는 시간(초)
+    stale_grace: int = 7 * 24 * 3600
+    # 버전 스탬프: 바꾸면 재시작 시 L2/스냅샷을 버립니다 (디렉터리를 지우지 않고 무효화)
+    version: str = "1"
+    # L1 스냅샷 파일과 저장 주기(초, 0이면 종료 시에만)
+    snapshot_path: str = str(DEFAULT_CACHE_DIR / "snapshot.json")
+    snapshot_interval: int = 300
+
+
+class UpstreamConfig(BaseModel):
+    """상점/UCP/EXIM 등 외부 호출(shopping_agent.http) 설정"""
+    # 호스트별 토큰 버킷: 초당 요청 수 상한, 순간 허용량, 429 후 최저 속도
+    rate_limit_enabled: bool = True
+    rate_limit_rps: float = 5.0
+    rate_limit_burst: int = 10
+    rate_limit_min_rps: float = 0.5
+    # 429의 Retry-After가 이 시간(초) 이하면 기다렸다가 한 번 다시 보냄
+    rate_limit_max_retry_wait: float = 5.0
+    # 호스트별 회로 차단기: 연속 실패 수, 열린 뒤 다시 시험하기까지의 시간(초)
+    circuit_enabled: bool = True
+    circuit_failure_threshold: int = 5
+    circuit_open_seconds: float = 30.0
+    # 회로가 열렸을 때 대신 쓰는 마지막 정상 응답(상품/검색 결과) 보관 시간(초)
+    stale_ttl: int = 24 * 3600
+    # 멱등 GET hedging: 호스트 p90(최소 hedge_min_delay초)까지 응답이 없으면 한 번 더 보냄
+    # 추가 요청은 대상 요청의 hedge_budget_ratio 비율 이내, 표본이 hedge_min_samples개 이상일 때만
+    hedge_enabled: bool = True
+    hedge_budget_ratio: float = 0.1
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = 0.05
+    # 호스트별 적응형 타임아웃: read = p99 × multiplier, connect = p90 × multiplier (floor~ceiling)
+    # 표본이 timeout_min_samples개 미만이거나 꺼져 있으면 timeout_default 사용
+    adaptive_timeouts: bool = True
+    timeout_default: float = 15.0
+    timeout_floor: float = 1.0
+    timeout_ceiling: float = 30.0
+    connect_timeout_ceiling: float = 5.0
+    timeout_multiplier: float = 3.0
+    timeout_min_samples: int = 20
+
+
+class AdmissionConfig(BaseModel):
+    """/agent 스트리밍 실행 admission control 설정"""
+    # 워커당 동시에 실행되는 run 수 (전체 / 상점별)
+    max_concurrent_runs: int = 32
+    max_concurrent_per_store: int = 8
+    # 상한에 걸린 요청이 기다릴 수 있는 대기열 길이와 최대 대기 시간(초)
+    max_queue: int = 64
+    queue_timeout: float = 10.0
+    # 실행 시간 통계가 없을 때 429 응답의 Retry-After(초)
+    retry_after: int = 5
+
+
 class Config(BaseModel):
     """전체 설정"""
     ucp: UCPConfig = Field(default_factory=UCPConfig)
     agent: AgentConfig = Field(default_factory=AgentConfig)
+    checkpoint: CheckpointConfig = Field(default_factory=CheckpointConfig)
+    admission: AdmissionConfig = Field(default_factory=AdmissionConfig)
+    upstream: UpstreamConfig = Field(default_factory=UpstreamConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
     shipping: ShippingAddress = Field(default_factory=lambda: DEFAULT_SHIPPING_ADDRESS)
 
     # API 키들 (환경 변수에서 로드)
@@ -82,15 +205,76 @@ class Config(BaseModel):
     ucp_auth_header: str = "Authorization"
     ucp_auth_scheme: str = "Bearer"
 
+    # 서버 시작 시 상점 매니페스트/스키마/커넥션 워밍업 여부
+    warmup_on_startup: bool = True
+
+    # 공유 상태 디렉터리 (여러 워커/Pod가 같은 경로를 보도록 설정)
+    state_dir: str = str(DEFAULT_STATE_DIR)
+
     @classmethod
     def from_env(cls) -> "Config":
         """환경 변수에서 설정 로드"""
+        state_dir = os.getenv("STATE_DIR") or str(DEFAULT_STATE_DIR)
         return cls(
             google_api_key=os.getenv("GOOGLE_API_KEY"),
             exim_auth_key=os.getenv("EXIM_AUTH_KEY") or os.getenv("KOREAEXIM_AUTH_KEY") or os.getenv("EXCHANGE_RATE_API_KEY"),
             ucp_auth_token=os.getenv("UCP_AUTH_TOKEN"),
             ucp_auth_header=os.getenv("UCP_AUTH_HEADER", "Authorization"),
             ucp_auth_scheme=os.getenv("UCP_AUTH_SCHEME", "Bearer"),
+            warmup_on_startup=os.getenv("WARMUP_ON_STARTUP", "1").lower() not in ("0", "false", "no"),
+            state_dir=state_dir,
+            agent=AgentConfig(
+                router_speculative=os.getenv("ROUTER_SPECULATIVE", "0").lower() in ("1", "true", "yes"),
+                history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "12000")),
+                compact_tool_output=os.getenv("COMPACT_TOOL_OUTPUT", "1").lower() not in ("0", "false", "no"),
+                tool_cache_enabled=os.getenv("TOOL_CACHE", "1").lower() not in ("0", "false", "no"),
+                tool_max_concurrency=int(os.getenv("TOOL_MAX_CONCURRENCY", "4")),
+                tool_pool_size=int(os.getenv("TOOL_POOL_SIZE", "16")),
+                run_timeout=float(os.getenv("RUN_TIMEOUT", "120")),
+                tool_timeout_max=float(os.getenv("TOOL_TIMEOUT_MAX", "65")),
+            ),
+            checkpoint=CheckpointConfig(
+                backend=os.getenv("CHECKPOINT_BACKEND", "sqlite"),
+                path=os.getenv("CHECKPOINT_PATH") or str(Path(state_dir) / "checkpoints.sqlite"),
+                keep_latest=int(os.getenv("CHECKPOINT_KEEP_LATEST", "5")),
+                max_age=int(os.getenv("CHECKPOINT_MAX_AGE", str(7 * 24 * 3600))),
+                max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "10000")),
+                max_bytes=int(os.getenv("CHECKPOINT_MAX_BYTES", str(512 * 1024 * 1024))),
+            ),
+            admission=AdmissionConfig(
+                max_concurrent_runs=int(os.getenv("ADMISSION_MAX_RUNS", "32")),
+                max_concurrent_per_store=int(os.getenv("ADMISSION_MAX_RUNS_PER_STORE", "8")),
+                max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+                queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+                retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "5")),
+            ),
+            upstream=UpstreamConfig(
+                rate_limit_enabled=os.getenv("RATE_LIMIT", "1").lower() not in ("0", "false", "no"),
+                rate_limit_rps=float(os.getenv("RATE_LIMIT_RPS", "5")),
+                rate_limit_burst=int(os.getenv("RATE_LIMIT_BURST", "10")),
+                rate_limit_min_rps=float(os.getenv("RATE_LIMIT_MIN_RPS", "0.5")),
+                rate_limit_max_retry_wait=float(os.getenv("RATE_LIMIT_MAX_RETRY_WAIT", "5")),
+                circuit_enabled=os.getenv("CIRCUIT_BREAKER", "1").lower() not in ("0", "false", "no"),
+                circuit_failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                circuit_open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+                stale_ttl=int(os.getenv("STALE_CACHE_TTL", str(24 * 3600))),
+                hedge_enabled=os.getenv("HEDGE_REQUESTS", "1").lower() not in ("0", "false", "no"),
+                hedge_budget_ratio=float(os.getenv("HEDGE_BUDGET_RATIO", "0.1")),
+                hedge_min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+                adaptive_timeouts=os.getenv("ADAPTIVE_TIMEOUTS", "1").lower() not in ("0", "false", "no"),
+                timeout_default=float(os.getenv("UPSTREAM_TIMEOUT", "15")),
+                timeout_floor=float(os.getenv("UPSTREAM_TIMEOUT_FLOOR", "1")),
+                timeout_ceiling=float(os.getenv("UPSTREAM_TIMEOUT_CEILING", "30")),
+            ),
+            cache=CacheConfig(
+                backend=os.getenv("CACHE_BACKEND", "sqlite"),
+                path=os.getenv("CACHE_PATH") or str(DEFAULT_CACHE_DIR / "cache.sqlite"),
+                memory_entries=int(os.getenv("CACHE_MEMORY_ENTRIES", "512")),
+                max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                version=os.getenv("CACHE_VERSION", "1"),
+                snapshot_path=os.getenv("CACHE_SNAPSHOT_PATH") or str(DEFAULT_CACHE_DIR / "snapshot.json"),
+                snapshot_interval=int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300")),
+            ),
         )
 
     model_config = {"extra": "allow"}
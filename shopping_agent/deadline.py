@@ -0,0 +1,56 @@
+"""
+Deadline
+
+현재 실행 흐름(도구 호출 등)의 마감 시각을 contextvar로 전달합니다.
+http.request가 남은 시간으로 요청 타임아웃을 줄이므로, 재시도를 여러 번 하는 도구도
+마감 시각을 넘겨 스텝을 붙잡지 않습니다. 도구 풀 스레드로도 context가 복사되어 전달됩니다.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+import time
+
+_deadline: ContextVar[Optional[float]] = ContextVar("shopping_agent_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """마감 시각이 지나 더 이상 외부 호출을 시작할 수 없음"""
+
+
+def remaining() -> Optional[float]:
+    """남은 시간(초). 마감 시각이 없으면 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def clamp(timeout: object) -> object:
+    """요청 타임아웃을 남은 시간 이하로 줄입니다. (httpx.Timeout 객체는 그대로 둡니다)"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    if timeout is None:
+        return left
+    if isinstance(timeout, (int, float)):
+        return min(float(timeout), left)
+    return timeout
+
+
+@contextmanager
+def within(seconds: float) -> Iterator[float]:
+    """지금부터 seconds 뒤를 마감 시각으로 설정합니다. 바깥 마감 시각이 더 이르면 그쪽을 유지합니다."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline - time.monotonic()
+    finally:
+        _deadline.reset(token)
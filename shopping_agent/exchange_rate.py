@@ -1,14 +1,14 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
 from typing import Any, Optional
-import json
 
-import httpx
+from shopping_agent import http
+from shopping_agent.cache import CacheNamespace, get_cache
 
 EXIM_API_URL = "https://oapi.koreaexim.go.kr/site/program/financial/exchangeJSON"
-_CACHE_FILENAME = "exchange_rates.json"
+# 날짜가 바뀌면 다시 받아오므로 TTL 없이 최근 고시 환율 하나만 보관합니다.
+_CACHE_KEY = "latest"
 
 
 def _korea_today_str() -> str:
@@ -16,31 +16,23 @@ def _korea_today_str() -> str:
     return datetime.now(timezone.utc).astimezone(kst).strftime("%Y%m%d")
 
 
-def _default_cache_path(cache_dir: Optional[Path] = None) -> Path:
-    base_dir = cache_dir or (Path(__file__).resolve().parent / ".cache")
-    return base_dir / _CACHE_FILENAME
+def _rates_cache() -> CacheNamespace:
+    return get_cache().namespace("exchange_rates")
 
 
-def _read_cache(cache_path: Path) -> Optional[dict]:
-    if not cache_path.exists():
-        return None
-    try:
-        return json.loads(cache_path.read_text(encoding="utf-8"))
-    except Exception:
-        return None
+def _read_cache() -> Optional[dict]:
+    cached = _rates_cache().get(_CACHE_KEY)
+    return cached if isinstance(cached, dict) else None
 
 
-def _write_cache(cache_path: Path, date_str: str, rates: dict[str, float]) -> None:
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
+def _write_cache(date_str: str, rates: dict[str, float]) -> None:
     payload = {
         "date": date_str,
         "rates": rates,
         "source": "koreaexim",
         "fetched_at": datetime.now(timezone.utc).isoformat(),
     }
-    tmp_path = cache_path.with_suffix(".tmp")
-    tmp_path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
-    tmp_path.replace(cache_path)
+    _rates_cache().set(_CACHE_KEY, payload)
 
 
 def _parse_rate_value(value: Any) -> Optional[float]:
@@ -71,8 +63,8 @@ def _normalize_currency_unit(cur_unit: str) -> tuple[str, float]:
     return base.upper(), unit
 
 
-def _fetch_rates_for_date(date_str: str, auth_key: str, timeout: float) -> dict[str, float]:
-    response = httpx.get(
+def _fetch_rates_for_date(date_str: str, auth_key: str, timeout: Optional[float]) -> dict[str, float]:
+    response = http.get(
         EXIM_API_URL,
         params={"authkey": auth_key, "searchdate": date_str, "data": "AP01"},
         timeout=timeout,
@@ -111,8 +103,7 @@ def _fetch_rates_for_date(date_str: str, auth_key: str, timeout: float) -> dict[
 def get_daily_rates(
     auth_key: str,
     date_str: Optional[str] = None,
-    cache_dir: Optional[Path] = None,
-    timeout: float = 10.0,
+    timeout: Optional[float] = None,
     lookback_days: int = 7,
 ) -> tuple[Optional[dict[str, float]], dict]:
     requested_date = date_str or _korea_today_str()
@@ -123,8 +114,7 @@ def get_daily_rates(
         "stale": False,
         "source": "koreaexim",
     }
-    cache_path = _default_cache_path(cache_dir)
-    cached = _read_cache(cache_path)
+    cached = _read_cache()
 
     if cached and cached.get("date") == requested_date and isinstance(cached.get("rates"), dict):
         meta["cached"] = True
@@ -147,7 +137,7 @@ def get_daily_rates(
 
         try:
             rates = _fetch_rates_for_date(candidate_date, auth_key, timeout)
-            _write_cache(cache_path, candidate_date, rates)
+            _write_cache(candidate_date, rates)
             meta["date"] = candidate_date
             if candidate_date != requested_date:
                 meta["lookback_days"] = idx
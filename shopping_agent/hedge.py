@@ -0,0 +1,135 @@
+"""
+Hedged Requests
+
+멱등 GET(상품 .js, suggest.json)의 꼬리 지연을 줄이기 위한 hedging입니다.
+첫 요청이 그 호스트의 관측 p90 안에 끝나지 않으면 같은 요청을 하나 더 보내고,
+먼저 끝난 응답을 사용합니다. 늦은 쪽은 취소합니다(동기 요청은 끝나는 대로 닫음).
+
+추가 요청은 전역 예산(hedge_budget_ratio, 대상 요청 대비 비율) 안에서만 보내
+상점 부하가 크게 늘지 않게 합니다.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import contextvars
+import threading
+
+import httpx
+
+from shopping_agent.config import UpstreamConfig, config
+from shopping_agent.latency import LatencyTracker, latency_tracker
+from shopping_agent.metrics import metrics
+
+# 예산 토큰 상한 (한동안 hedge가 없었어도 한꺼번에 몰아 보내지 않도록)
+_BUDGET_CAP = 10.0
+
+
+class HedgePolicy:
+    """호스트 p90 기반 hedge 지연 시간과 전역 hedge 예산"""
+
+    def __init__(self, settings: UpstreamConfig, tracker: LatencyTracker):
+        self.settings = settings
+        self.tracker = tracker
+        self._lock = threading.Lock()
+        self._budget = 1.0
+
+    def delay(self, host: str) -> Optional[float]:
+        """hedge를 보내기 전 기다릴 시간(초). 표본이 부족하면 None (hedge 안 함)"""
+        if not self.settings.hedge_enabled:
+            return None
+        with self._lock:
+            self._budget = min(self._budget + self.settings.hedge_budget_ratio, _BUDGET_CAP)
+        if self.tracker.count(host) < self.settings.hedge_min_samples:
+            return None
+        p90 = self.tracker.percentile(host, 0.9)
+        return max(p90, self.settings.hedge_min_delay) if p90 is not None else None
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._budget < 1.0:
+                metrics.incr("hedge.budget_exhausted")
+                return False
+            self._budget -= 1.0
+        metrics.incr("hedge.sent")
+        return True
+
+
+hedge_policy = HedgePolicy(config.upstream, latency_tracker)
+
+
+@lru_cache(maxsize=1)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def _submit(call: Callable[[], httpx.Response]) -> Future:
+    # 도구 마감 시각(contextvar)이 hedge 스레드에도 적용되도록 context를 복사합니다.
+    return _executor().submit(contextvars.copy_context().run, call)
+
+
+def _pick(done: set) -> Any:
+    """동시에 끝난 요청 중 성공한 쪽을 우선합니다."""
+    return next((item for item in done if item.exception() is None), next(iter(done)))
+
+
+def _close_when_done(future: Future) -> None:
+    def close(done: Future) -> None:
+        if done.exception() is None:
+            done.result().close()
+
+    future.add_done_callback(close)
+
+
+def hedged(host: str, call: Callable[[], httpx.Response]) -> httpx.Response:
+    """call을 보내고 p90이 지나도 응답이 없으면 한 번 더 보내 먼저 끝난 응답을 반환합니다."""
+    delay = hedge_policy.delay(host)
+    if delay is None:
+        return call()
+    primary = _submit(call)
+    done, _ = wait([primary], timeout=delay)
+    if done or not hedge_policy.try_spend():
+        return primary.result()
+
+    secondary = _submit(call)
+    pending = {primary, secondary}
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = _pick(done)
+        # 먼저 끝난 쪽이 실패했으면 남은 요청을 기다립니다.
+        if winner.exception() is None or not pending:
+            break
+    for loser in pending:
+        _close_when_done(loser)
+    if winner is secondary and winner.exception() is None:
+        metrics.incr("hedge.won")
+    return winner.result()
+
+
+async def ahedged(host: str, call: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    delay = hedge_policy.delay(host)
+    if delay is None:
+        return await call()
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not hedge_policy.try_spend():
+            return await tasks[0]
+
+        tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = _pick(done)
+            if winner.exception() is None or not pending:
+                break
+        if winner is tasks[1] and winner.exception() is None:
+            metrics.incr("hedge.won")
+        return winner.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
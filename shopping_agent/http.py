@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+import asyncio
+import threading
+import time
+
+import httpx
+
+from shopping_agent import codec, deadline
+from shopping_agent.cache import CacheNamespace, get_cache
+from shopping_agent.circuit import CircuitOpen, circuit_breaker
+from shopping_agent.config import config
+from shopping_agent.hedge import ahedged, hedged
+from shopping_agent.latency import latency_tracker
+from shopping_agent.metrics import metrics
+from shopping_agent.rate_limit import rate_limiter
+
+# 상점/UCP/EXIM 호출이 공유하는 커넥션 풀 (DNS/TLS 재사용)
+_POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=120.0,
+)
+
+
+# 회로가 열렸을 때 대신 돌려줄 마지막 정상 GET 응답 (get_json_cached)
+# 상점 응답은 수가 많고 평소엔 읽지 않으므로 L1에 올리지 않습니다.
+# version 2: 상품/검색 응답을 decode 훅이 줄인 형태로 보관
+def _stale_cache() -> CacheNamespace:
+    return get_cache().namespace("upstream_json", ttl=config.upstream.stale_ttl, memory=False, version=2)
+
+
+# 호스트를 알 수 없는 요청의 기본 타임아웃 (httpx 기본값)
+_DEFAULT_TIMEOUT = 5.0
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+# 비동기 클라이언트는 이벤트 루프에 묶이므로 루프가 바뀌면 새로 만듭니다.
+_async_client: Optional[httpx.AsyncClient] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.Client:
+    global _client
+    if _client is None or _client.is_closed:
+        with _client_lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(limits=_POOL_LIMITS)
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_loop is not loop:
+        _async_client = httpx.AsyncClient(limits=_POOL_LIMITS)
+        _async_loop = loop
+    return _async_client
+
+
+def _clamp_timeout(timeout: Any) -> Any:
+    if not isinstance(timeout, httpx.Timeout):
+        return deadline.clamp(timeout)
+    left = deadline.clamp(None)
+    parts = {name: getattr(timeout, name) for name in ("connect", "read", "write", "pool")}
+    return httpx.Timeout(**{name: left if value is None else min(value, left) for name, value in parts.items()})
+
+
+def _apply_deadline(kwargs: dict[str, Any], host: Optional[str] = None) -> dict[str, Any]:
+    # timeout을 주지 않은(None) 요청은 호스트의 관측 응답 시간으로 정한 타임아웃을 씁니다.
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = latency_tracker.timeout(host) if host else _DEFAULT_TIMEOUT
+    # 도구 마감 시각이 걸려 있으면 남은 시간보다 오래 기다리지 않습니다.
+    if deadline.remaining() is not None:
+        kwargs["timeout"] = _clamp_timeout(kwargs["timeout"])
+    return kwargs
+
+
+def _host(url: str) -> Optional[str]:
+    return httpx.URL(url).host or None
+
+
+def _retry_throttled(response: httpx.Response, host: str, retried: bool) -> bool:
+    """응답을 버킷에 반영하고, 짧은 Retry-After의 429면 한 번 다시 보낼지 결정합니다.
+
+    429는 상점이 요청을 처리하기 전에 거절한 것이므로 POST(JSON-RPC)도 다시 보냅니다.
+    """
+    backoff = rate_limiter.record(host, response.status_code, response.headers.get("retry-after"))
+    if backoff is None or retried or backoff > config.upstream.rate_limit_max_retry_wait:
+        return False
+    left = deadline.remaining()
+    return left is None or backoff < left
+
+
+def _timed(host: str, method: str, url: str, kwargs: dict[str, Any]) -> httpx.Response:
+    started = time.monotonic()
+    try:
+        response = get_client().request(method, url, **_apply_deadline(kwargs, host))
+    except httpx.TimeoutException:
+        # 타임아웃도 표본으로 남겨 느린 호스트의 타임아웃이 늘어나게 합니다.
+        latency_tracker.observe(host, time.monotonic() - started)
+        raise
+    latency_tracker.observe(host, time.monotonic() - started)
+    return response
+
+
+async def _atimed(host: str, method: str, url: str, kwargs: dict[str, Any]) -> httpx.Response:
+    started = time.monotonic()
+    try:
+        response = await get_async_client().request(method, url, **_apply_deadline(kwargs, host))
+    except httpx.TimeoutException:
+        latency_tracker.observe(host, time.monotonic() - started)
+        raise
+    latency_tracker.observe(host, time.monotonic() - started)
+    return response
+
+
+def _send(method: str, url: str, host: str, kwargs: dict[str, Any]) -> httpx.Response:
+    if not config.upstream.rate_limit_enabled:
+        return _timed(host, method, url, kwargs)
+    retried = False
+    while True:
+        rate_limiter.acquire(host)
+        response = _timed(host, method, url, dict(kwargs))
+        if not _retry_throttled(response, host, retried):
+            return response
+        response.close()
+        retried = True
+
+
+async def _asend(method: str, url: str, host: str, kwargs: dict[str, Any]) -> httpx.Response:
+    if not config.upstream.rate_limit_enabled:
+        return await _atimed(host, method, url, kwargs)
+    retried = False
+    while True:
+        await rate_limiter.aacquire(host)
+        response = await _atimed(host, method, url, dict(kwargs))
+        if not _retry_throttled(response, host, retried):
+            return response
+        await response.aclose()
+        retried = True
+
+
+def _record(host: str, response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 500:
+        circuit_breaker.failure(host)
+    else:
+        circuit_breaker.success(host)
+    return response
+
+
+def request(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    host = _host(url)
+    if host is None:
+        return get_client().request(method, url, **_apply_deadline(kwargs))
+    if not config.upstream.circuit_enabled:
+        return _send(method, url, host, kwargs)
+    circuit_breaker.before(host)
+    try:
+        response = _send(method, url, host, kwargs)
+    except httpx.TransportError:
+        circuit_breaker.failure(host)
+        raise
+    except BaseException:
+        circuit_breaker.release(host)
+        raise
+    return _record(host, response)
+
+
+async def arequest(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    host = _host(url)
+    if host is None:
+        return await get_async_client().request(method, url, **_apply_deadline(kwargs))
+    if not config.upstream.circuit_enabled:
+        return await _asend(method, url, host, kwargs)
+    circuit_breaker.before(host)
+    try:
+        response = await _asend(method, url, host, kwargs)
+    except httpx.TransportError:
+        circuit_breaker.failure(host)
+        raise
+    except BaseException:
+        circuit_breaker.release(host)
+        raise
+    return _record(host, response)
+
+
+def get(url: str, hedge: bool = False, **kwargs: Any) -> httpx.Response:
+    """GET 요청. hedge=True면 호스트 p90이 지나도 응답이 없을 때 같은 요청을 한 번 더 보냅니다(멱등 요청만)."""
+    host = _host(url) if hedge else None
+    if host is None:
+        return request("GET", url, **kwargs)
+    return hedged(host, lambda: request("GET", url, **kwargs))
+
+
+def post(url: str, **kwargs: Any) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+async def aget(url: str, hedge: bool = False, **kwargs: Any) -> httpx.Response:
+    host = _host(url) if hedge else None
+    if host is None:
+        return await arequest("GET", url, **kwargs)
+    return await ahedged(host, lambda: arequest("GET", url, **kwargs))
+
+
+async def apost(url: str, **kwargs: Any) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+def get_json_cached(
+    url: str,
+    params: Optional[dict[str, Any]] = None,
+    hedge: bool = False,
+    decode: Callable[[bytes], Any] = codec.loads,
+    **kwargs: Any,
+) -> tuple[Optional[Any], dict]:
+    """GET 응답 JSON(decode로 디코딩)과 meta를 반환합니다.
+
+    200 응답은 공용 캐시(L2)에 보관해 두고, 회로가 열려 있거나 상점이 응답하지 않으면(연결/타임아웃 에러, 5xx)
+    보관본을 meta["stale"]=True로 돌려줍니다. 보관본도 없으면 (None, meta)입니다.
+    """
+    key = str(httpx.URL(url, params=params))
+    meta: dict[str, Any] = {"status": None, "stale": False}
+    try:
+        response = get(url, params=params, hedge=hedge, **kwargs)
+        meta["status"] = response.status_code
+        if response.status_code == 200:
+            data = decode(response.content)
+            _stale_cache().set(key, data)
+            return data, meta
+        if response.status_code < 500:
+            return None, meta
+    except CircuitOpen as exc:
+        meta["circuit_open"] = True
+        meta["error"] = str(exc)
+    except (httpx.TransportError, deadline.DeadlineExceeded, ValueError) as exc:
+        meta["error"] = str(exc)
+
+    cached = _stale_cache().get(key)
+    if cached is None:
+        return None, meta
+    metrics.incr("upstream.stale_served")
+    meta["stale"] = True
+    return cached, meta
+
+
+def upstream_stats() -> dict:
+    """호스트별 외부 호출 상태 (/metrics 응답용)"""
+    return {
+        "rate_limit": rate_limiter.snapshot(),
+        "circuits": circuit_breaker.snapshot(),
+        "latency": latency_tracker.snapshot(),
+    }
+
+
+def preconnect(url: str, timeout: float = 5.0) -> bool:
+    """HEAD 요청으로 DNS 조회와 TLS 핸드셰이크를 미리 끝내 풀에 연결을 남겨 둡니다."""
+    try:
+        request("HEAD", url, timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+
+def close() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose() -> None:
+    global _async_client, _async_loop
+    client, _async_client, _async_loop = _async_client, None, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,132 @@
+"""
+Upstream Latency Tracker
+
+외부 호스트별 응답 시간 분포를 스트리밍으로 추정하고, 그 분포에서 요청 타임아웃을 정합니다.
+
+- 호스트마다 로그 간격(10%) 버킷 히스토그램에 응답 시간을 누적합니다. 관측은 O(1)이고,
+  누적 가중치가 window에 닿으면 전체를 절반으로 줄여 최근 응답에 더 큰 비중을 둡니다.
+- 백분위수는 버킷 경계로 계산하므로 오차는 10% 이내입니다.
+- 타임아웃: read = p99 × multiplier, connect = p90 × multiplier (각각 floor~ceiling 범위)
+  표본이 부족한 호스트는 기본 타임아웃을 씁니다.
+
+hedged GET의 대기 시간(p90)도 이 추정치를 사용합니다.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+import math
+import threading
+
+import httpx
+
+from shopping_agent.config import UpstreamConfig, config
+
+_MIN_SECONDS = 0.001
+_GROWTH = 1.1
+_BUCKETS = math.ceil(math.log(300.0 / _MIN_SECONDS) / math.log(_GROWTH)) + 1
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _MIN_SECONDS:
+        return 0
+    return min(int(math.log(seconds / _MIN_SECONDS) / math.log(_GROWTH)) + 1, _BUCKETS - 1)
+
+
+def _upper_bound(index: int) -> float:
+    return _MIN_SECONDS * _GROWTH ** index
+
+
+class _Histogram:
+    __slots__ = ("counts", "weight", "observed")
+
+    def __init__(self) -> None:
+        self.counts = [0.0] * _BUCKETS
+        self.weight = 0.0
+        self.observed = 0
+
+    def observe(self, seconds: float, window: int) -> None:
+        self.counts[_bucket(seconds)] += 1
+        self.weight += 1
+        self.observed += 1
+        if self.weight >= window:
+            self.counts = [count / 2 for count in self.counts]
+            self.weight /= 2
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self.weight <= 0:
+            return None
+        target = q * self.weight
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count > 0:
+                return _upper_bound(index)
+        return _upper_bound(_BUCKETS - 1)
+
+
+class LatencyTracker:
+    """호스트별 응답 시간(초) 스트리밍 추정기"""
+
+    def __init__(self, settings: UpstreamConfig, window: int = 512):
+        self.settings = settings
+        self._window = window
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _Histogram] = {}
+
+    def observe(self, host: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._hosts.get(host)
+            if histogram is None:
+                histogram = self._hosts[host] = _Histogram()
+            histogram.observe(seconds, self._window)
+
+    def count(self, host: str) -> int:
+        with self._lock:
+            histogram = self._hosts.get(host)
+            return histogram.observed if histogram else 0
+
+    def percentile(self, host: str, q: float) -> Optional[float]:
+        with self._lock:
+            histogram = self._hosts.get(host)
+            return histogram.percentile(q) if histogram else None
+
+    def _bounded(self, seconds: float, ceiling: float) -> float:
+        return min(max(seconds * self.settings.timeout_multiplier, self.settings.timeout_floor), ceiling)
+
+    def timeout(self, host: str) -> httpx.Timeout:
+        """관측된 응답 시간으로 정한 요청 타임아웃 (표본이 부족하면 기본값)"""
+        settings = self.settings
+        default = httpx.Timeout(settings.timeout_default)
+        if not settings.adaptive_timeouts:
+            return default
+        with self._lock:
+            histogram = self._hosts.get(host)
+            if histogram is None or histogram.observed < settings.timeout_min_samples:
+                return default
+            p90, p99 = histogram.percentile(0.9), histogram.percentile(0.99)
+        read = self._bounded(p99, settings.timeout_ceiling)
+        connect = self._bounded(p90, min(read, settings.connect_timeout_ceiling))
+        return httpx.Timeout(read, connect=connect)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hosts = list(self._hosts)
+        result = {}
+        for host in hosts:
+            timeout = self.timeout(host)
+            result[host] = {
+                "count": self.count(host),
+                "p50": _round(self.percentile(host, 0.5)),
+                "p90": _round(self.percentile(host, 0.9)),
+                "p99": _round(self.percentile(host, 0.99)),
+                "timeout": {"connect": _round(timeout.connect), "read": _round(timeout.read)},
+            }
+        return result
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+latency_tracker = LatencyTracker(config.upstream)
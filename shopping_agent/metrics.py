@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Optional
+import threading
+
+
+class _Summary:
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self, window: int) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """프로세스 내 카운터/요약 지표 (/metrics 응답용)"""
+
+    def __init__(self, window: int = 512) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters: dict[str, float] = {}
+        self._summaries: dict[str, _Summary] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary(self._window)
+            summary.observe(value)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        with self._lock:
+            summary = self._summaries.get(name)
+            return summary.percentile(q) if summary else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {name: summary.to_dict() for name, summary in self._summaries.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
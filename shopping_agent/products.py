@@ -0,0 +1,149 @@
+"""
+Product Model
+
+Shopify 상품/옵션과 UCP 라인 아이템의 작은 타입 모델입니다.
+
+상점 응답(.js, suggest.json)은 받을 때 한 번만 디코딩해 필요한 필드만 남긴 dict로 줄이고
+(http.get_json_cached의 decode 훅, 캐시에도 이 형태로 보관), 도구는 그 dict에서
+slots dataclass를 만들어 씁니다. 큰 원본 dict를 도구마다 다시 훑지 않습니다.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from shopping_agent import codec
+
+
+def normalize_image_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    if url.startswith("//"):
+        return f"https:{url}"
+    return url
+
+
+def decode_product(data: Any) -> dict:
+    """/products/<handle>.js 응답 → 필요한 필드만 남긴 dict (Product.from_dict 입력)"""
+    product = codec.decode_product(data)
+    images = product.get("images") or []
+    return {
+        "id": product.get("id"),
+        "title": product.get("title"),
+        "handle": product.get("handle"),
+        "image": normalize_image_url(product.get("featured_image") or (images[0] if images else None)),
+        "variants": [
+            {
+                "id": variant.get("id"),
+                "title": variant.get("title") or "",
+                "price": int(variant.get("price") or 0),
+                "available": bool(variant.get("available")),
+            }
+            for variant in product["variants"]
+        ],
+    }
+
+
+def decode_search(data: Any) -> list[dict]:
+    """/search/suggest.json 응답 → 상품 결과 목록 (Product.from_dict 입력)"""
+    payload = codec.loads(data)
+    if not isinstance(payload, dict):
+        raise ValueError("Unexpected search format")
+    results = (payload.get("resources") or {}).get("results") or {}
+    return [
+        {
+            "id": item.get("id"),
+            "title": item.get("title"),
+            "handle": item.get("handle"),
+            "url": item.get("url"),
+            "price": item.get("price"),
+            "image": normalize_image_url(item.get("image") or item.get("featured_image")),
+        }
+        for item in results.get("products") or []
+        if isinstance(item, dict)
+    ]
+
+
+@dataclass(slots=True)
+class Variant:
+    id: Any
+    title: str
+    # 센트 단위 (Shopify .js)
+    price: int
+    available: bool
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Variant":
+        # decode_product가 이미 필드를 맞춰 두었으므로 다시 검사하지 않습니다.
+        return cls(data["id"], data["title"], data["price"], data["available"])
+
+    def matches(self, size: str) -> bool:
+        return size.lower() in self.title.lower()
+
+
+@dataclass(slots=True)
+class Product:
+    id: Any
+    title: Optional[str]
+    handle: Optional[str]
+    image: Optional[str] = None
+    variants: tuple[Variant, ...] = ()
+    # 검색 결과에만 있는 필드 (표시용 가격 문자열, 상점 내 경로)
+    price: Optional[str] = None
+    url: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Product":
+        return cls(
+            id=data.get("id"),
+            title=data.get("title"),
+            handle=data.get("handle"),
+            image=data.get("image"),
+            variants=tuple(Variant.from_dict(variant) for variant in data.get("variants") or ()),
+            price=data.get("price"),
+            url=data.get("url"),
+        )
+
+    @property
+    def available_variants(self) -> list[Variant]:
+        return [variant for variant in self.variants if variant.available]
+
+    def select_variant(self, variant_id: Optional[str] = None) -> Optional[Variant]:
+        """variant_id가 맞는 옵션, 없으면 첫 구매 가능 옵션, 그것도 없으면 첫 옵션"""
+        if variant_id:
+            for variant in self.variants:
+                if str(variant.id) == str(variant_id):
+                    return variant
+        for variant in self.variants:
+            if variant.available:
+                return variant
+        return self.variants[0] if self.variants else None
+
+
+@dataclass(slots=True)
+class LineItem:
+    variant_id: str
+    title: str
+    # 센트 단위
+    price: int
+    quantity: int = 1
+    image_url: Optional[str] = None
+
+    @classmethod
+    def from_product(cls, product: Product, variant: Variant, quantity: int) -> "LineItem":
+        title = f"{product.title or 'Item'} - {variant.title}".strip(" -")
+        return cls(str(variant.id), title, variant.price, max(quantity, 1), product.image)
+
+    def to_ucp(self) -> dict:
+        return {
+            "id": f"li-{self.variant_id}",
+            "item": {
+                "id": self.variant_id,
+                "title": self.title,
+                "price": self.price,
+                "image_url": self.image_url,
+            },
+            "quantity": self.quantity,
+            "totals": [{"type": "subtotal", "amount": max(self.price * self.quantity, 0)}],
+        }
@@ -0,0 +1,149 @@
+"""
+Outbound Rate Limiter
+
+상점/UCP 호스트별 토큰 버킷으로 나가는 요청 속도를 맞춥니다.
+
+- 호스트마다 초당 rps개 토큰(최대 burst개)이 채워지고, 요청 하나가 토큰 하나를 씁니다.
+- 429를 받으면 속도를 절반으로 줄이고 Retry-After 동안 그 호스트로 요청을 보내지 않습니다.
+- 이후 성공 응답마다 조금씩 속도를 올려 상점이 버티는 최대 처리량 근처를 유지합니다(AIMD).
+
+동기 도구(풀 스레드)와 비동기 호출이 같은 버킷을 나눠 쓰므로 threading.Lock으로 보호하고,
+대기는 토큰을 먼저 예약한 뒤 락 밖에서 합니다.
+"""
+
+from __future__ import annotations
+
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+import asyncio
+import threading
+import time
+
+from shopping_agent import deadline
+from shopping_agent.config import UpstreamConfig, config
+from shopping_agent.metrics import metrics
+
+# Retry-After 헤더가 없는 429에 적용할 차단 시간(초)
+_DEFAULT_BACKOFF = 1.0
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Retry-After 헤더(초 또는 HTTP 날짜)를 대기 시간(초)으로 변환합니다."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(moment - (time.time() if now is None else now), 0.0)
+
+
+class _Bucket:
+    __slots__ = ("rate", "tokens", "updated", "blocked_until", "throttled")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+
+class HostRateLimiter:
+    """호스트별 적응형 토큰 버킷"""
+
+    def __init__(self, settings: UpstreamConfig, clock: Callable[[], float] = time.monotonic):
+        self.settings = settings
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _Bucket] = {}
+
+    def _bucket(self, host: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.settings.rate_limit_rps, self.settings.rate_limit_burst, now)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """토큰 하나를 예약하고 보내기 전에 기다려야 할 시간(초)을 반환합니다."""
+        with self._lock:
+            now = self._clock()
+            bucket = self._bucket(host, now)
+            bucket.tokens = min(
+                bucket.tokens + (now - bucket.updated) * bucket.rate,
+                float(self.settings.rate_limit_burst),
+            )
+            bucket.updated = now
+            bucket.tokens -= 1
+            wait = max(-bucket.tokens / bucket.rate, bucket.blocked_until - now, 0.0)
+        left = deadline.remaining()
+        if left is not None and wait > left:
+            self.refund(host)
+            metrics.incr("rate_limit.deadline_exceeded")
+            raise deadline.DeadlineExceeded(f"rate limit wait for {host} exceeds deadline ({wait:.1f}s)")
+        if wait > 0:
+            metrics.observe("rate_limit.wait_seconds", wait)
+        return wait
+
+    def _blocked_for(self, host: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            return max(bucket.blocked_until - self._clock(), 0.0) if bucket else 0.0
+
+    def acquire(self, host: str) -> None:
+        """토큰을 받을 때까지 기다립니다. 기다리는 동안 429로 차단되면 차단이 풀릴 때까지 더 기다립니다."""
+        wait = self.reserve(host)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self._blocked_for(host)
+
+    async def aacquire(self, host: str) -> None:
+        wait = self.reserve(host)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self._blocked_for(host)
+
+    def refund(self, host: str) -> None:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is not None:
+                bucket.tokens += 1
+
+    def record(self, host: str, status: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """응답 상태로 속도를 조정합니다. 429면 Retry-After 대기 시간(초)을 반환합니다."""
+        with self._lock:
+            now = self._clock()
+            bucket = self._bucket(host, now)
+            if status != 429:
+                bucket.rate = min(bucket.rate + self.settings.rate_limit_rps / 20, self.settings.rate_limit_rps)
+                return None
+            backoff = parse_retry_after(retry_after)
+            backoff = _DEFAULT_BACKOFF if backoff is None else backoff
+            # 같은 차단 구간 안에서 이미 보낸 요청들의 429는 한 번만 반영합니다.
+            if now >= bucket.blocked_until:
+                bucket.rate = max(bucket.rate / 2, self.settings.rate_limit_min_rps)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.blocked_until = max(bucket.blocked_until, now + backoff)
+            bucket.throttled += 1
+        metrics.incr("rate_limit.throttled")
+        metrics.incr(f"rate_limit.throttled.{host}")
+        return backoff
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            return {
+                host: {
+                    "rps": round(bucket.rate, 2),
+                    "throttled": bucket.throttled,
+                    "blocked_for": round(max(bucket.blocked_until - now, 0.0), 1),
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+rate_limiter = HostRateLimiter(config.upstream)
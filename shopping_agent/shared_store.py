@@ -0,0 +1,130 @@
+"""
+Shared State Store
+
+여러 uvicorn 워커/프로세스가 함께 쓰는 SQLite 기반 키-값 저장소입니다.
+워커마다 따로 들고 있던 캐시(체크아웃 세션, 배송지 등)를 이 저장소로 공유해
+같은 thread의 다음 턴이 다른 워커로 가도 같은 상태를 보게 합니다.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+import sqlite3
+import threading
+import time
+
+from shopping_agent import codec
+from shopping_agent.config import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+class SharedStore:
+    """(namespace, key) → JSON 값 저장소 (TTL 지원, 프로세스 간 공유)"""
+
+    def __init__(self, path: str | Path, busy_timeout: float = 30.0):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(namespace, key)
+            return None
+        return codec.loads(value)
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, codec.dumps(value), now + ttl if ttl is not None else None, now),
+            )
+
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """키가 없을 때만 저장합니다 (만료된 값은 없는 것으로 봄). 저장했으면 True"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (namespace, key, now),
+            )
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, codec.dumps(value), now + ttl if ttl is not None else None, now),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """정수 값을 원자적으로 더하고 결과를 반환합니다 (없거나 만료된 값은 0에서 시작)."""
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            # UPSERT 한 문장이라 다른 워커의 incr과 섞이지 않습니다.
+            row = self._conn.execute(
+                """
+                INSERT INTO entries VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = CAST(
+                        CASE WHEN expires_at IS NOT NULL AND expires_at <= ? THEN 0 ELSE CAST(value AS INTEGER) END + ?
+                        AS TEXT
+                    ),
+                    expires_at = excluded.expires_at,
+                    updated_at = excluded.updated_at
+                RETURNING value
+                """,
+                (namespace, key, str(amount), expires_at, now, now, amount),
+            ).fetchone()
+        return int(row[0])
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            ).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=1)
+def get_shared_store() -> SharedStore:
+    return SharedStore(Path(config.state_dir) / "shared.sqlite")
@@ -1,17 +1,10 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Optional
-import json
-
 from shopping_agent.config import ShippingAddress, config
+from shopping_agent.shared_store import get_shared_store
 
-_CACHE_FILENAME = "shipping_address.json"
-
-
-def _default_address_path(cache_dir: Optional[Path] = None) -> Path:
-    base_dir = cache_dir or (Path(__file__).resolve().parent / ".cache")
-    return base_dir / _CACHE_FILENAME
+_SHARED_NAMESPACE = "shipping"
+_SHARED_KEY = "address"
 
 
 def _deserialize_address(data: dict) -> ShippingAddress:
@@ -21,26 +14,19 @@ def _deserialize_address(data: dict) -> ShippingAddress:
     return ShippingAddress(**normalized)
 
 
-def load_shipping_address(cache_dir: Optional[Path] = None) -> ShippingAddress:
-    path = _default_address_path(cache_dir)
-    if path.exists():
-        try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
+def load_shipping_address() -> ShippingAddress:
+    # 배송지는 캐시가 아닌 상태 값이라 공유 저장소에만 둡니다 (다른 워커가 바꾼 값도 보임).
+    try:
+        payload = get_shared_store().get(_SHARED_NAMESPACE, _SHARED_KEY)
+        if payload:
             address = _deserialize_address(payload)
             config.shipping = address
             return address
-        except Exception:
-            pass
+    except Exception:
+        pass
     return config.shipping
 
 
-def save_shipping_address(
-    address: ShippingAddress,
-    cache_dir: Optional[Path] = None,
-) -> Path:
-    path = _default_address_path(cache_dir)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    payload = address.model_dump()
-    path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
+def save_shipping_address(address: ShippingAddress) -> None:
+    get_shared_store().put(_SHARED_NAMESPACE, _SHARED_KEY, address.model_dump())
     config.shipping = address
-    return path
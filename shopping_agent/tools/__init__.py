@@ -16,6 +16,7 @@ from shopping_agent.tools.ucp import (
     ucp_create_checkout_from_handle,
     ucp_get_checkout,
     ucp_update_checkout,
+    ucp_wait_for_checkout_status,
 )
 
 __all__ = [
@@ -32,6 +33,7 @@ __all__ = [
     "ucp_create_checkout_from_handle",
     "ucp_get_checkout",
     "ucp_update_checkout",
+    "ucp_wait_for_checkout_status",
     "set_shipping_address",
     "search_product",
 ]
@@ -0,0 +1,82 @@
+"""
+Tool Output
+
+도구 결과를 모델 컨텍스트용 페이로드와 화면용 데이터로 나눕니다.
+compact 모드(config.agent.compact_tool_output)에서는 도구가 최소 JSON 하나만 반환하고,
+상품 카드처럼 화면에만 필요한 데이터는 AG-UI 커스텀 이벤트로 프론트엔드에 보냅니다.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+import json
+import logging
+
+from langchain_core.callbacks import dispatch_custom_event
+
+from shopping_agent import codec
+from shopping_agent.config import config
+
+logger = logging.getLogger(__name__)
+
+# 체크아웃 JSON에서 모델이 다음 단계를 진행하고 화면이 결제 카드를 그리는 데 필요한 필드
+CHECKOUT_FIELDS = ("id", "status", "currency", "totals", "url", "continue_url", "fallback", "messages")
+
+# 상점이 응답하지 않아 보관된 결과를 돌려줄 때 산문 출력 앞에 붙이는 안내
+STALE_NOTE = "⚠️ 상점이 응답하지 않아 이전에 저장된 정보(stale)입니다. 가격/재고가 바뀌었을 수 있습니다.\n"
+
+
+# emit() 기록 (도구 결과 캐시가 화면용 이벤트도 함께 저장해 적중 시 다시 보내도록)
+_recorded_events: ContextVar[Optional[list]] = ContextVar("tool_output_events", default=None)
+
+
+def compact_enabled() -> bool:
+    return config.agent.compact_tool_output
+
+
+def dumps(payload: Any) -> str:
+    """모델 컨텍스트용 JSON (공백/ASCII 이스케이프 없이 직렬화)"""
+    return codec.dumps(payload)
+
+
+def emit(name: str, value: Any) -> None:
+    """화면용 데이터를 AG-UI CUSTOM 이벤트로 보냅니다. 실행 컨텍스트 밖(직접 호출)이면 무시합니다."""
+    events = _recorded_events.get()
+    if events is not None:
+        events.append([name, value])
+    try:
+        dispatch_custom_event(name, value)
+    except RuntimeError as exc:
+        logger.debug(f"[ToolOutput] custom event '{name}' skipped: {exc}")
+
+
+@contextmanager
+def record_events() -> Iterator[list]:
+    """블록 안에서 emit()된 [name, value] 목록 (도구 풀 스레드로 복사된 context에서도 같은 리스트)"""
+    events: list = []
+    token = _recorded_events.set(events)
+    try:
+        yield events
+    finally:
+        _recorded_events.reset(token)
+
+
+def compact_checkout(payload: dict) -> dict:
+    compact = {key: payload[key] for key in CHECKOUT_FIELDS if key in payload}
+    line_items = []
+    for line in payload.get("line_items") or []:
+        item = line.get("item") or {}
+        line_items.append({
+            "id": line.get("id"),
+            "item": {key: item.get(key) for key in ("id", "title", "price") if key in item},
+            "quantity": line.get("quantity"),
+        })
+    if line_items:
+        compact["line_items"] = line_items
+    return compact
+
+
+def checkout_output(payload: Any) -> str:
+    if compact_enabled() and isinstance(payload, dict):
+        return dumps(compact_checkout(payload))
+    return json.dumps(payload, ensure_ascii=True)
@@ -1,13 +1,15 @@
 from typing import Optional
 import json
 
-import httpx
 from deepagents.graph import AgentMiddleware
 from langchain_core.tools import tool
 
+from shopping_agent import http
 from shopping_agent.config import ShippingAddress, config
 from shopping_agent.exchange_rate import compute_exchange_rate, get_daily_rates
+from shopping_agent.products import Product, decode_product, decode_search
 from shopping_agent.shipping import load_shipping_address, save_shipping_address
+from shopping_agent.tools.output import STALE_NOTE, compact_enabled, dumps, emit
 from shopping_agent.tools.ucp import (
     build_line_item_from_handle,
     get_ucp_capabilities,
@@ -17,33 +19,19 @@ from shopping_agent.tools.ucp import (
     ucp_create_checkout_from_handle,
     ucp_get_checkout,
     ucp_update_checkout,
+    ucp_wait_for_checkout_status,
 )
 
 
-def _normalize_image_url(url: Optional[str]) -> Optional[str]:
-    if not url:
-        return None
-    if url.startswith("//"):
-        return f"https:{url}"
-    return url
-
-
 def _fetch_product_image(product_handle: str, store_url: str) -> Optional[str]:
     product_url = f"{store_url.rstrip('/')}/products/{product_handle}.js"
     try:
-        response = httpx.get(product_url, timeout=10.0)
-        if response.status_code != 200:
+        data, _ = http.get_json_cached(product_url, hedge=True, decode=decode_product)
+        if not isinstance(data, dict):
             return None
-        data = response.json()
-        featured = data.get("featured_image")
-        if featured:
-            return _normalize_image_url(featured)
-        images = data.get("images") or []
-        if images:
-            return _normalize_image_url(images[0])
+        return Product.from_dict(data).image
     except Exception:
         return None
-    return None
 
 
 def _search_product_logic(query: str, store_url: str, limit: int = 5) -> str:
@@ -57,39 +45,37 @@ def _search_product_logic(query: str, store_url: str, limit: int = 5) -> str:
     }
 
     try:
-        response = httpx.get(search_url, params=params, timeout=10.0)
-        if response.status_code == 200:
-            data = response.json()
-            products = data.get("resources", {}).get("results", {}).get("products", [])
+        data, meta = http.get_json_cached(search_url, params=params, hedge=True, decode=decode_search)
+        if isinstance(data, list):
+            products = [Product.from_dict(item) for item in data]
 
             if not products:
                 return f"🌐 '{query}'에 대한 실시간 검색 결과가 해당 상점에 없습니다."
 
             display_count = min(limit, len(products))
-            output = f"🌐 **실시간 검색 결과 ({len(products)}개 중 {display_count}개 표시):**\n\n"
+            output = STALE_NOTE if meta["stale"] else ""
+            output += f"🌐 **실시간 검색 결과 ({len(products)}개 중 {display_count}개 표시):**\n\n"
             product_cards = []
             for p in products[:limit]:
-                title = p.get("title", "Unknown")
-                handle = p.get("handle")
-                url_path = p.get("url") or ""
-                absolute_url = f"{store_url.rstrip('/')}{url_path}" if url_path else store_url
-                raw_image = p.get("image") or p.get("featured_image")
-                image_url = _normalize_image_url(raw_image)
+                title = p.title or "Unknown"
+                handle = p.handle
+                absolute_url = f"{store_url.rstrip('/')}{p.url}" if p.url else store_url
+                image_url = p.image
                 if not image_url and handle:
                     image_url = _fetch_product_image(handle, store_url)
-                price = p.get("price", "N/A")
+                price = p.price if p.price is not None else "N/A"
 
                 output += f"- **{title}**\n"
                 output += f"  - 가격: ${price}\n"
                 output += f"  - URL: {absolute_url}\n"
-                if p.get("id"):
-                    output += f"  - ID: `{p.get('id')}`\n"
+                if p.id:
+                    output += f"  - ID: `{p.id}`\n"
                 if handle:
                     output += f"  - Handle: `{handle}`\n"
                 output += "\n"
 
                 product_cards.append({
-                    "id": p.get("id"),
+                    "id": p.id,
                     "title": title,
                     "handle": handle,
                     "url": absolute_url,
@@ -98,6 +84,18 @@ def _search_product_logic(query: str, store_url: str, limit: int = 5) -> str:
                     "store_url": store_url,
                 })
 
+            if compact_enabled():
+                # 카드(이미지/URL)는 화면으로만 보내고, 모델에는 다음 도구 호출에 필요한 필드만 남깁니다.
+                emit("products", {"products": product_cards})
+                compact = [
+                    {key: card[key] for key in ("id", "title", "handle", "price") if card.get(key) is not None}
+                    for card in product_cards
+                ]
+                result = {"total": len(products), "products": compact}
+                if meta["stale"]:
+                    result["stale"] = True
+                return f"<products>{dumps(result)}</products>"
+
             output += "<products>\n"
             output += json.dumps({"products": product_cards}, ensure_ascii=True)
             output += "\n</products>"
@@ -145,35 +143,44 @@ def check_product_stock(product_handle: str, store_url: str, size: Optional[str]
     """
     product_url = f"{store_url.rstrip('/')}/products/{product_handle}.js"
     try:
-        response = httpx.get(product_url, timeout=10.0)
-        if response.status_code == 200:
-            data = response.json()
-            title = data.get("title", product_handle)
-            variants = data.get("variants", [])
+        data, meta = http.get_json_cached(product_url, hedge=True, decode=decode_product)
+        if isinstance(data, dict):
+            product = Product.from_dict(data)
+            title = product.title if product.title is not None else product_handle
 
-            if not variants:
+            if not product.variants:
                 return f"⚠️ **{title}**의 상세 정보를 가져올 수 없습니다."
 
-            options = []
-            available_variants = []
-            for v in variants:
-                if v.get("available"):
-                    options.append(v.get("title"))
-                    available_variants.append(v)
+            available_variants = product.available_variants
+            options = [v.title for v in available_variants]
 
             if not available_variants:
                 return f"❌ **{title}**은(는) 현재 모든 옵션이 품절입니다."
 
+            if compact_enabled():
+                matched = None
+                if size:
+                    matched = next((v for v in available_variants if v.matches(size)), None)
+                if matched:
+                    variant = {"id": matched.id, "title": matched.title, "price": matched.price / 100.0}
+                    result = {"title": title, "available": True, "variant": variant}
+                else:
+                    result = {"title": title, "available": not size, "options": options[:10]}
+                if meta["stale"]:
+                    result["stale"] = True
+                return dumps(result)
+
+            prefix = STALE_NOTE if meta["stale"] else ""
             if size:
-                matched = [v for v in available_variants if size.lower() in v["title"].lower()]
+                matched = [v for v in available_variants if v.matches(size)]
                 if matched:
                     v = matched[0]
-                    price = v.get("price", 0) / 100.0
-                    return f"✅ **{title}**의 '{v['title']}' 옵션은 구매 가능합니다. (가격: ${price:.2f})"
+                    price = v.price / 100.0
+                    return f"{prefix}✅ **{title}**의 '{v.title}' 옵션은 구매 가능합니다. (가격: ${price:.2f})"
                 else:
-                    return f"⚠️ '{size}' 사이즈는 현재 품절이거나 없습니다. 가능한 옵션: {', '.join(options[:10])}"
+                    return f"{prefix}⚠️ '{size}' 사이즈는 현재 품절이거나 없습니다. 가능한 옵션: {', '.join(options[:10])}"
 
-            return f"✅ **{title}**은(는) 구매 가능합니다. 가능한 옵션: {', '.join(options[:10])}"
+            return f"{prefix}✅ **{title}**은(는) 구매 가능합니다. 가능한 옵션: {', '.join(options[:10])}"
 
     except Exception as e:
         print(f"Stock Check Error: {e}")
@@ -215,7 +222,6 @@ def get_exchange_rate(from_currency: str = "USD", to_currency: str = "KRW") -> s
     elif meta.get("cached"):
         label = "일환율(캐시)"
 
-    formatted = _format_exchange_rate(rate, to_currency)
     payload = {
         "rate": rate,
         "from": from_currency.upper(),
@@ -223,6 +229,12 @@ def get_exchange_rate(from_currency: str = "USD", to_currency: str = "KRW") -> s
         "label": label,
         "date": data_date,
     }
+    if meta.get("stale"):
+        payload["stale"] = True
+    if compact_enabled():
+        return f"<exchange_rate>{dumps(payload)}</exchange_rate>"
+
+    formatted = _format_exchange_rate(rate, to_currency)
     return (
         f"💱 현재 환율({label}): 1 {from_currency.upper()} = {formatted} {to_currency.upper()}\n"
         f"<exchange_rate>{json.dumps(payload, ensure_ascii=True)}</exchange_rate>"
@@ -323,4 +335,5 @@ class ShoppingToolsMiddleware(AgentMiddleware):
         ucp_update_checkout,
         ucp_complete_checkout,
         ucp_cancel_checkout,
+        ucp_wait_for_checkout_status,
     ]
@@ -1,11 +1,19 @@
 from langchain_core.tools import tool
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import Optional
-import json
+import asyncio
 import uuid
-import httpx
 
+from shopping_agent import codec, http
+from shopping_agent.checkout_sessions import session_cache
+from shopping_agent.config import config
+from shopping_agent.products import LineItem, Product, decode_product
+from shopping_agent.shared_store import get_shared_store
 from shopping_agent.ucp import (
+    aresolve_ucp_endpoint,
+    aucp_jsonrpc_call,
     build_checkout_payload,
     build_ucp_auth_headers,
     extract_ucp_shopping_mcp,
@@ -16,6 +24,7 @@ from shopping_agent.ucp import (
     ucp_jsonrpc_call,
     ucp_supports_product_listing,
 )
+from shopping_agent.tools.output import checkout_output, dumps
 
 
 @tool
@@ -45,85 +54,33 @@ def get_ucp_capabilities(store_url: str) -> str:
     return "\n".join(summary)
 
 
-def _normalize_image_url(url: Optional[str]) -> Optional[str]:
-    if not url:
-        return None
-    if url.startswith("//"):
-        return f"https:{url}"
-    return url
-
-
-def _fetch_product_data(product_handle: str, store_url: str) -> Optional[dict]:
+def _fetch_product_data(product_handle: str, store_url: str) -> Optional[Product]:
     product_url = f"{store_url.rstrip('/')}/products/{product_handle}.js"
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
     
     # Attempt 1: With Headers (Robust)
-    try:
-        response = httpx.get(product_url, headers=headers, timeout=10.0, follow_redirects=True)
-        if response.status_code == 200:
-            return response.json()
-        print(f"⚠️ [UCP] Fetch Attempt 1 failed: {response.status_code}")
-    except Exception as e:
-        print(f"⚠️ [UCP] Fetch Attempt 1 error: {e}")
+    data, meta = http.get_json_cached(
+        product_url, headers=headers, hedge=True, decode=decode_product, follow_redirects=True
+    )
+    if isinstance(data, dict):
+        return Product.from_dict(data)
+    print(f"⚠️ [UCP] Fetch Attempt 1 failed: {meta.get('error') or meta.get('status')}")
+    if meta.get("circuit_open"):
+        # 회로가 열려 있으면 두 번째 시도도 즉시 실패하므로 생략합니다.
+        return None
 
     # Attempt 2: Simple (No Headers, mimic shopping.py)
-    import time
-    time.sleep(1.0)
-    try:
-        print(f"🔄 [UCP] Retrying fetch without headers for {product_url}...")
-        response = httpx.get(product_url, timeout=10.0) # Default httpx behavior
-        if response.status_code == 200:
-            return response.json()
-        print(f"❌ [UCP] Fetch Attempt 2 failed: {response.status_code}")
-    except Exception as e:
-        print(f"❌ [UCP] Fetch Attempt 2 error: {e}")
-        
+    # 고정 sleep 없이 바로 재시도합니다. (남은 도구 마감 시간은 http 요청 타임아웃에 반영됨)
+    print(f"🔄 [UCP] Retrying fetch without headers for {product_url}...")
+    data, meta = http.get_json_cached(product_url, hedge=True, decode=decode_product) # Default httpx behavior
+    if isinstance(data, dict):
+        return Product.from_dict(data)
+    print(f"❌ [UCP] Fetch Attempt 2 failed: {meta.get('error') or meta.get('status')}")
     return None
 
 
-def _select_variant(product: dict, variant_id: Optional[str]) -> Optional[dict]:
-    variants = product.get("variants", []) if product else []
-    if variant_id:
-        for variant in variants:
-            if str(variant.get("id")) == str(variant_id):
-                return variant
-    for variant in variants:
-        if variant.get("available"):
-            return variant
-    return variants[0] if variants else None
-
-
-def _build_line_item_from_product(
-    product: dict,
-    variant: dict,
-    quantity: int,
-) -> dict:
-    title = product.get("title", "Item")
-    variant_title = variant.get("title", "")
-    combined_title = f"{title} - {variant_title}".strip(" -")
-    variant_id = str(variant.get("id"))
-    price = int(variant.get("price", 0))
-    image_url = _normalize_image_url(product.get("featured_image"))
-    if not image_url:
-        images = product.get("images") or []
-        if images:
-            image_url = _normalize_image_url(images[0])
-    subtotal = max(price * max(quantity, 1), 0)
-    return {
-        "id": f"li-{variant_id}",
-        "item": {
-            "id": variant_id,
-            "title": combined_title,
-            "price": price,
-            "image_url": image_url,
-        },
-        "quantity": max(quantity, 1),
-        "totals": [{"type": "subtotal", "amount": subtotal}],
-    }
-
-
 def _build_line_item_from_handle(
     product_handle: str,
     store_url: str,
@@ -138,27 +95,22 @@ def _build_line_item_from_handle(
     if not product:
         if variant_id:
             print(f"⚠️ [UCP] Product fetch failed for {product_handle}, using dummy data for fallback flow.")
-            dummy_line_item = {
-                "id": f"li-{variant_id}",
-                "item": {
-                    "id": variant_id,
-                    "title": f"Item ({product_handle})", # Fallback title
-                    "price": 0, # Price will be zero, but Checkout Fallback will generate link anyway
-                    "image_url": "",
-                },
-                "quantity": max(quantity, 1),
-                "totals": [{"type": "subtotal", "amount": 0}],
-            }
-            return json.dumps(dummy_line_item, ensure_ascii=True)
+            dummy_line_item = LineItem(
+                variant_id=str(variant_id),
+                title=f"Item ({product_handle})", # Fallback title
+                price=0, # Price will be zero, but Checkout Fallback will generate link anyway
+                quantity=max(quantity, 1),
+                image_url="",
+            )
+            return dumps(dummy_line_item.to_ucp())
             
         return f"상품 정보를 가져올 수 없습니다 (URL: {store_url}/products/{product_handle}.js). 잠시 후 다시 시도하거나, 핸들을 확인해주세요. (파일 시스템 검색 금지)"
 
-    variant = _select_variant(product, variant_id)
+    variant = product.select_variant(variant_id)
     if not variant:
         return f"사용 가능한 옵션을 찾지 못했습니다: {product_handle}"
 
-    line_item = _build_line_item_from_product(product, variant, quantity)
-    return json.dumps(line_item, ensure_ascii=True)
+    return dumps(LineItem.from_product(product, variant, quantity).to_ucp())
 
 
 @tool
@@ -174,6 +126,13 @@ def build_line_item_from_handle(
     return _build_line_item_from_handle(product_handle, store_url, quantity, variant_id)
 
 
+def _remember_checkout(store_url: str, payload: Optional[dict], checkout_id: Optional[str] = None) -> str:
+    if isinstance(payload, dict):
+        payload = codec.decode_checkout(payload)
+        session_cache.put(store_url, payload, checkout_id=checkout_id)
+    return checkout_output(payload)
+
+
 def _ucp_create_checkout(
     store_url: str,
     line_items_json: str,
@@ -185,14 +144,14 @@ def _ucp_create_checkout(
         return f"UCP MCP endpoint를 찾을 수 없습니다: {meta.get('error', 'unknown')}"
 
     try:
-        parsed = json.loads(line_items_json)
+        parsed = codec.loads(line_items_json)
         if isinstance(parsed, dict):
             line_items = [parsed]
         elif isinstance(parsed, list):
             line_items = parsed
         else:
             return "line_items_json은 객체 또는 배열 JSON이어야 합니다."
-    except json.JSONDecodeError:
+    except ValueError:
         return "line_items_json 파싱에 실패했습니다."
 
     checkout = build_checkout_payload(
@@ -252,13 +211,14 @@ def _ucp_create_checkout(
                         "status": "fallback",
                         "line_items": line_items
                     }
-                    return json.dumps(fallback_result)
+                    session_cache.put(store_url, fallback_result)
+                    return checkout_output(fallback_result)
             except Exception:
                 pass # Return original error if fallback fails
 
         return f"UCP 에러: {result['error']}"
 
-    return json.dumps(result.get("result") or result.get("raw"), ensure_ascii=True)
+    return _remember_checkout(store_url, result.get("result") or result.get("raw"))
 
 
 @tool
@@ -293,8 +253,8 @@ def ucp_create_checkout_from_handle(
         variant_id=variant_id,
     )
     try:
-        json.loads(line_item_json)
-    except json.JSONDecodeError:
+        codec.loads(line_item_json)
+    except ValueError:
         return line_item_json
     return _ucp_create_checkout(
         store_url=store_url,
@@ -304,29 +264,116 @@ def ucp_create_checkout_from_handle(
     )
 
 
-@tool
-def ucp_get_checkout(
+def _fetch_checkout(
     store_url: str,
     checkout_id: str,
     auth_token: Optional[str] = None,
-) -> str:
-    """
-    UCP MCP get_checkout 호출을 수행합니다.
-    """
+) -> tuple[Optional[dict], Optional[str]]:
     endpoint, meta = resolve_ucp_endpoint(store_url)
     if not endpoint:
-        return f"UCP MCP endpoint를 찾을 수 없습니다: {meta.get('error', 'unknown')}"
+        return None, f"UCP MCP endpoint를 찾을 수 없습니다: {meta.get('error', 'unknown')}"
 
     headers = build_ucp_auth_headers(auth_token=auth_token)
     try:
         result = ucp_jsonrpc_call(endpoint, "get_checkout", {"id": checkout_id}, headers=headers)
     except Exception as exc:
-        return f"UCP 호출 실패: {exc}"
+        return None, f"UCP 호출 실패: {exc}"
 
     if result.get("error"):
-        return f"UCP 에러: {result['error']}"
+        return None, f"UCP 에러: {result['error']}"
+
+    payload = result.get("result") or result.get("raw")
+    if isinstance(payload, dict):
+        payload = codec.decode_checkout(payload)
+        session_cache.put(store_url, payload, checkout_id=checkout_id)
+    return payload, None
+
+
+def _ucp_get_checkout(
+    store_url: str,
+    checkout_id: str,
+    auth_token: Optional[str] = None,
+    refresh: bool = False,
+) -> str:
+    if not refresh:
+        cached = session_cache.get(store_url, checkout_id)
+        if cached is not None:
+            return checkout_output(cached)
+
+    payload, error = _fetch_checkout(store_url, checkout_id, auth_token)
+    if error:
+        return error
+    return checkout_output(payload)
+
+
+@tool
+def ucp_get_checkout(
+    store_url: str,
+    checkout_id: str,
+    auth_token: Optional[str] = None,
+    refresh: bool = False,
+) -> str:
+    """
+    UCP MCP get_checkout 호출을 수행합니다.
+    세션 캐시에 있으면 캐시된 체크아웃을 반환하며, refresh=True면 상점에서 다시 조회합니다.
+    """
+    return _ucp_get_checkout(store_url, checkout_id, auth_token, refresh)
+
+
+def wait_for_checkout_status(
+    store_url: str,
+    checkout_id: str,
+    statuses: tuple[str, ...] = ("completed",),
+    timeout: float = 30.0,
+    auth_token: Optional[str] = None,
+) -> tuple[Optional[dict], bool]:
+    return session_cache.wait_for_status(
+        store_url,
+        checkout_id,
+        statuses,
+        fetch=lambda: _fetch_checkout(store_url, checkout_id, auth_token)[0],
+        timeout=timeout,
+    )
+
+
+@lru_cache(maxsize=1)
+def _status_wait_executor() -> ThreadPoolExecutor:
+    """/api/checkout/status long-poll 전용 풀 (기본 executor를 쓰는 체크포인터 I/O를 붙잡지 않도록)"""
+    return ThreadPoolExecutor(max_workers=config.ucp.status_wait_workers, thread_name_prefix="checkout-wait")
 
-    return json.dumps(result.get("result") or result.get("raw"), ensure_ascii=True)
+
+async def await_checkout_status(
+    store_url: str,
+    checkout_id: str,
+    statuses: tuple[str, ...] = ("completed",),
+    timeout: float = 30.0,
+) -> tuple[Optional[dict], bool]:
+    """wait_for_checkout_status를 전용 풀에서 실행합니다."""
+    loop = asyncio.get_running_loop()
+    call = partial(wait_for_checkout_status, store_url, checkout_id, statuses, timeout)
+    return await loop.run_in_executor(_status_wait_executor(), call)
+
+
+@tool
+def ucp_wait_for_checkout_status(
+    store_url: str,
+    checkout_id: str,
+    status: str = "completed",
+    timeout: float = 30.0,
+    auth_token: Optional[str] = None,
+) -> str:
+    """
+    체크아웃이 지정한 상태(예: completed)가 될 때까지 기다린 뒤 결과를 반환합니다.
+    """
+    statuses = tuple(s.strip() for s in status.split(",") if s.strip()) or ("completed",)
+    # 모델이 준 timeout은 /api/checkout/status와 같은 상한으로 줄입니다.
+    timeout = min(max(timeout, 0.0), float(config.ucp.status_wait_max))
+    payload, matched = wait_for_checkout_status(store_url, checkout_id, statuses, timeout, auth_token)
+    if payload is None:
+        return f"체크아웃 상태를 확인할 수 없습니다: {checkout_id}"
+    if not matched:
+        return f"체크아웃 상태 대기 시간 초과 (현재 상태: {payload.get('status', 'unknown')})\n{checkout_output(payload)}"
+    return checkout_output(payload)
 
 
 @tool
@@ -344,22 +391,25 @@ def ucp_update_checkout(
         return f"UCP MCP endpoint를 찾을 수 없습니다: {meta.get('error', 'unknown')}"
 
     try:
-        checkout = json.loads(checkout_json)
+        checkout = codec.loads(checkout_json)
         if not isinstance(checkout, dict):
             return "checkout_json은 객체 JSON이어야 합니다."
-    except json.JSONDecodeError:
+        checkout = codec.decode_checkout(checkout)
+    except ValueError:
         return "checkout_json 파싱에 실패했습니다."
 
     headers = build_ucp_auth_headers(auth_token=auth_token)
     try:
         result = ucp_jsonrpc_call(endpoint, "update_checkout", {"id": checkout_id, "checkout": checkout}, headers=headers)
     except Exception as exc:
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 호출 실패: {exc}"
 
     if result.get("error"):
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 에러: {result['error']}"
 
-    return json.dumps(result.get("result") or result.get("raw"), ensure_ascii=True)
+    return _remember_checkout(store_url, result.get("result") or result.get("raw"), checkout_id)
 
 
 @tool
@@ -383,12 +433,28 @@ def ucp_cancel_checkout(
     try:
         result = ucp_jsonrpc_call(endpoint, "cancel_checkout", params, headers=headers)
     except Exception as exc:
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 호출 실패: {exc}"
 
     if result.get("error"):
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 에러: {result['error']}"
 
-    return json.dumps(result.get("result") or result.get("raw"), ensure_ascii=True)
+    return _remember_checkout(store_url, result.get("result") or result.get("raw"), checkout_id)
+
+
+def _complete_checkout_params(
+    checkout_id: str,
+    payment: Optional[dict] = None,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    params = {
+        "id": checkout_id,
+        "idempotency_key": idempotency_key or str(uuid.uuid4()),
+    }
+    if payment is not None:
+        params["payment"] = payment
+    return params
 
 
 def _ucp_complete_checkout(
@@ -404,29 +470,26 @@ def _ucp_complete_checkout(
     payment_payload: Optional[dict] = None
     if payment_json:
         try:
-            parsed = json.loads(payment_json)
+            parsed = codec.loads(payment_json)
             if isinstance(parsed, dict):
                 payment_payload = parsed
-        except json.JSONDecodeError:
+        except ValueError:
             return "payment_json 파싱에 실패했습니다."
 
     headers = build_ucp_auth_headers(auth_token=auth_token)
-    params = {
-        "id": checkout_id,
-        "idempotency_key": str(uuid.uuid4()),
-    }
-    if payment_payload is not None:
-        params["payment"] = payment_payload
+    params = _complete_checkout_params(checkout_id, payment_payload)
 
     try:
         result = ucp_jsonrpc_call(endpoint, "complete_checkout", params, headers=headers)
     except Exception as exc:
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 호출 실패: {exc}"
 
     if result.get("error"):
+        session_cache.invalidate(store_url, checkout_id)
         return f"UCP 에러: {result['error']}"
 
-    return json.dumps(result.get("result") or result.get("raw"), ensure_ascii=True)
+    return _remember_checkout(store_url, result.get("result") or result.get("raw"), checkout_id)
 
 
 @tool
@@ -440,3 +503,83 @@ def ucp_complete_checkout(
     UCP MCP complete_checkout 호출을 수행합니다.
     """
     return _ucp_complete_checkout(store_url, checkout_id, payment_json, auth_token)
+
+
+_PAYMENT_NAMESPACE = "payment_idempotency"
+_PAYMENT_RESULT_TTL = 24 * 3600
+# 처리 중 표시가 남는 최대 시간 (워커가 중간에 죽어도 이 시간이 지나면 다시 시도 가능)
+_PAYMENT_PENDING_TTL = 120
+
+
+class PaymentInProgress(Exception):
+    """같은 idempotency key의 결제가 다른 요청에서 처리 중"""
+
+
+async def _aucp_complete_checkout(
+    store_url: str,
+    checkout_id: str,
+    payment: Optional[dict] = None,
+    idempotency_key: Optional[str] = None,
+    auth_token: Optional[str] = None,
+) -> tuple[Optional[dict], Optional[str]]:
+    """_ucp_complete_checkout의 비동기 버전. (체크아웃, 에러 메시지)를 반환하고 네트워크 예외는 그대로 올립니다."""
+    endpoint, meta = await aresolve_ucp_endpoint(store_url)
+    if not endpoint:
+        return None, f"UCP MCP endpoint를 찾을 수 없습니다: {meta.get('error', 'unknown')}"
+
+    headers = build_ucp_auth_headers(auth_token=auth_token)
+    params = _complete_checkout_params(checkout_id, payment, idempotency_key)
+    try:
+        result = await aucp_jsonrpc_call(endpoint, "complete_checkout", params, headers=headers)
+    except Exception:
+        await asyncio.to_thread(session_cache.invalidate, store_url, checkout_id)
+        raise
+
+    if result.get("error"):
+        await asyncio.to_thread(session_cache.invalidate, store_url, checkout_id)
+        return None, f"UCP 에러: {result['error']}"
+
+    payload = result.get("result") or result.get("raw")
+    if isinstance(payload, dict):
+        payload = codec.decode_checkout(payload)
+        await asyncio.to_thread(session_cache.put, store_url, payload, checkout_id)
+    return payload, None
+
+
+async def acomplete_checkout_once(
+    store_url: str,
+    checkout_id: str,
+    payment: Optional[dict],
+    idempotency_key: str,
+    auth_token: Optional[str] = None,
+) -> tuple[dict, bool]:
+    """
+    idempotency key당 한 번만 complete_checkout을 호출합니다.
+
+    결과는 SharedStore에 저장되어 같은 key로 다시 요청하면(다른 워커 포함) 상점을 다시 호출하지 않고
+    저장된 응답을 돌려줍니다. 네트워크 오류로 결과를 모르면 기록을 지워 같은 key로 재시도할 수 있게 합니다.
+    (상점에도 같은 idempotency_key가 전달되므로 재시도가 중복 결제가 되지 않습니다)
+
+    Returns:
+        (응답, 저장된 응답 재사용 여부)
+    """
+    store = get_shared_store()
+    key = f"{store_url.rstrip('/')}|{checkout_id}|{idempotency_key}"
+    claimed = await asyncio.to_thread(store.add, _PAYMENT_NAMESPACE, key, {"state": "pending"}, _PAYMENT_PENDING_TTL)
+    if not claimed:
+        record = await asyncio.to_thread(store.get, _PAYMENT_NAMESPACE, key)
+        if record and record.get("state") == "done":
+            return record["response"], True
+        raise PaymentInProgress(idempotency_key)
+
+    try:
+        payload, error = await _aucp_complete_checkout(store_url, checkout_id, payment, idempotency_key, auth_token)
+    except BaseException:
+        await asyncio.to_thread(store.delete, _PAYMENT_NAMESPACE, key)
+        raise
+
+    response = payload if error is None and isinstance(payload, dict) else {"error": error or "empty result"}
+    await asyncio.to_thread(
+        store.put, _PAYMENT_NAMESPACE, key, {"state": "done", "response": response}, _PAYMENT_RESULT_TTL
+    )
+    return response, False
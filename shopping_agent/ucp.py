@@ -1,42 +1,29 @@
 from __future__ import annotations
 
-from pathlib import Path
 from typing import Any, Optional
 import uuid
 from urllib.parse import urlparse
-import json
-
-import httpx
+import asyncio
 
+from shopping_agent import codec, http
+from shopping_agent.cache import CacheNamespace, get_cache
 from shopping_agent.config import config
 
-_MANIFEST_CACHE_PREFIX = "ucp_manifest_"
-_SCHEMA_CACHE_PREFIX = "ucp_schema_"
-
+# 매니페스트/스키마는 하루 동안 재사용하고, 만료 후 조회에 실패하면 이전 값을 stale로 사용합니다.
+_MANIFEST_TTL = 24 * 3600
+_SCHEMA_TTL = 24 * 3600
 
-def _cache_dir(base: Optional[Path] = None) -> Path:
-    return base or (Path(__file__).resolve().parent / ".cache")
+# 호스트별 적응형 타임아웃은 짧은 조회 응답으로 학습되므로 멱등 조회에만 씁니다.
+# 결제/생성 같은 변경 호출은 느려도 끝까지 기다려야 하므로 ucp.request_timeout을 줍니다.
+_IDEMPOTENT_METHODS = frozenset({"get_checkout"})
 
 
-def _cache_path(prefix: str, key: str, base: Optional[Path] = None) -> Path:
-    safe_key = key.replace(":", "_").replace("/", "_")
-    return _cache_dir(base) / f"{prefix}{safe_key}.json"
+def _manifests() -> CacheNamespace:
+    return get_cache().namespace("ucp_manifest", ttl=_MANIFEST_TTL)
 
 
-def _read_cache(path: Path) -> Optional[dict]:
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-
-
-def _write_cache(path: Path, payload: dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = path.with_suffix(".tmp")
-    tmp_path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
-    tmp_path.replace(path)
+def _schemas() -> CacheNamespace:
+    return get_cache().namespace("ucp_schema", ttl=_SCHEMA_TTL)
 
 
 def _manifest_url_for_store(store_url: str) -> str:
@@ -46,30 +33,67 @@ def _manifest_url_for_store(store_url: str) -> str:
 
 def fetch_ucp_manifest(
     store_url: str,
-    cache_dir: Optional[Path] = None,
-    timeout: float = 10.0,
+    timeout: Optional[float] = None,
 ) -> tuple[Optional[dict], dict]:
     manifest_url = _manifest_url_for_store(store_url)
     host = urlparse(store_url).netloc or store_url
-    cache_path = _cache_path(_MANIFEST_CACHE_PREFIX, host, cache_dir)
     meta = {
         "url": manifest_url,
         "cached": False,
         "stale": False,
     }
 
-    cached = _read_cache(cache_path)
+    cached = _manifests().lookup(host)
+    if cached and _manifests().fresh(cached):
+        meta["cached"] = True
+        return cached.value, meta
+
+    try:
+        response = http.get(manifest_url, timeout=timeout)
+        payload = _manifest_from_response(response)
+        _manifests().set(host, payload)
+        return payload, meta
+    except Exception as exc:
+        meta["error"] = str(exc)
+
     if cached:
+        meta["stale"] = True
+        meta["cached"] = True
+        return cached.value, meta
+
+    return None, meta
+
+
+def _manifest_from_response(response: Any) -> dict:
+    response.raise_for_status()
+    payload = codec.loads(response.content)
+    if not isinstance(payload, dict):
+        raise ValueError("Unexpected manifest format")
+    return payload
+
+
+async def afetch_ucp_manifest(
+    store_url: str,
+    timeout: Optional[float] = None,
+) -> tuple[Optional[dict], dict]:
+    """fetch_ucp_manifest의 비동기 버전 (캐시 L2 조회는 스레드에서, 네트워크는 비동기 풀로)"""
+    manifest_url = _manifest_url_for_store(store_url)
+    host = urlparse(store_url).netloc or store_url
+    meta = {
+        "url": manifest_url,
+        "cached": False,
+        "stale": False,
+    }
+
+    cached = await asyncio.to_thread(_manifests().lookup, host)
+    if cached and _manifests().fresh(cached):
         meta["cached"] = True
-        return cached, meta
+        return cached.value, meta
 
     try:
-        response = httpx.get(manifest_url, timeout=timeout)
-        response.raise_for_status()
-        payload = response.json()
-        if not isinstance(payload, dict):
-            raise ValueError("Unexpected manifest format")
-        _write_cache(cache_path, payload)
+        response = await http.aget(manifest_url, timeout=timeout)
+        payload = _manifest_from_response(response)
+        await asyncio.to_thread(_manifests().set, host, payload)
         return payload, meta
     except Exception as exc:
         meta["error"] = str(exc)
@@ -77,7 +101,7 @@ def fetch_ucp_manifest(
     if cached:
         meta["stale"] = True
         meta["cached"] = True
-        return cached, meta
+        return cached.value, meta
 
     return None, meta
 
@@ -94,8 +118,17 @@ def extract_ucp_shopping_mcp(manifest: dict) -> tuple[Optional[str], Optional[st
     return mcp.get("endpoint"), mcp.get("schema")
 
 
-def resolve_ucp_endpoint(store_url: str, cache_dir: Optional[Path] = None) -> tuple[Optional[str], dict]:
-    manifest, meta = fetch_ucp_manifest(store_url, cache_dir=cache_dir)
+def resolve_ucp_endpoint(store_url: str) -> tuple[Optional[str], dict]:
+    manifest, meta = fetch_ucp_manifest(store_url)
+    return _endpoint_from_manifest(manifest, meta)
+
+
+async def aresolve_ucp_endpoint(store_url: str) -> tuple[Optional[str], dict]:
+    manifest, meta = await afetch_ucp_manifest(store_url)
+    return _endpoint_from_manifest(manifest, meta)
+
+
+def _endpoint_from_manifest(manifest: Optional[dict], meta: dict) -> tuple[Optional[str], dict]:
     if not manifest:
         return None, meta
 
@@ -135,17 +168,56 @@ def ucp_jsonrpc_call(
     method: str,
     params: dict,
     headers: Optional[dict[str, str]] = None,
-    timeout: float = 15.0,
+    timeout: Optional[float] = None,
 ) -> dict:
-    payload = {
+    response = http.post(
+        endpoint,
+        content=_jsonrpc_request(method, params),
+        headers=_jsonrpc_headers(headers),
+        timeout=_jsonrpc_timeout(method, timeout),
+    )
+    return _jsonrpc_response(response)
+
+
+async def aucp_jsonrpc_call(
+    endpoint: str,
+    method: str,
+    params: dict,
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> dict:
+    """ucp_jsonrpc_call의 비동기 버전 (공유 AsyncClient 커넥션 풀 사용)"""
+    response = await http.apost(
+        endpoint,
+        content=_jsonrpc_request(method, params),
+        headers=_jsonrpc_headers(headers),
+        timeout=_jsonrpc_timeout(method, timeout),
+    )
+    return _jsonrpc_response(response)
+
+
+def _jsonrpc_timeout(method: str, timeout: Optional[float]) -> Optional[float]:
+    if timeout is None and method not in _IDEMPOTENT_METHODS:
+        return float(config.ucp.request_timeout)
+    return timeout
+
+
+def _jsonrpc_request(method: str, params: dict) -> bytes:
+    return codec.dumpb({
         "jsonrpc": "2.0",
         "id": str(uuid.uuid4()),
         "method": method,
         "params": params,
-    }
-    response = httpx.post(endpoint, json=payload, headers=headers, timeout=timeout)
+    })
+
+
+def _jsonrpc_headers(headers: Optional[dict[str, str]]) -> dict[str, str]:
+    return {"Content-Type": "application/json", **(headers or {})}
+
+
+def _jsonrpc_response(response: Any) -> dict:
     response.raise_for_status()
-    data = response.json()
+    data = codec.loads(response.content)
     if isinstance(data, dict) and "error" in data:
         return {"error": data.get("error"), "raw": data}
     return {"result": data.get("result"), "raw": data}
@@ -205,23 +277,21 @@ def build_checkout_payload(
 
 def fetch_ucp_schema(
     schema_url: str,
-    cache_dir: Optional[Path] = None,
-    timeout: float = 10.0,
+    timeout: Optional[float] = None,
 ) -> tuple[Optional[dict], dict]:
-    cache_path = _cache_path(_SCHEMA_CACHE_PREFIX, schema_url, cache_dir)
     meta = {"url": schema_url, "cached": False, "stale": False}
 
-    cached = _read_cache(cache_path)
-    if cached:
+    cached = _schemas().lookup(schema_url)
+    if cached and _schemas().fresh(cached):
         meta["cached"] = True
-        return cached, meta
+        return cached.value, meta
 
     def _attempt(url: str) -> tuple[Optional[dict], Optional[str]]:
-        response = httpx.get(url, timeout=timeout)
+        response = http.get(url, timeout=timeout)
         if response.status_code == 404:
             return None, "404"
         response.raise_for_status()
-        payload = response.json()
+        payload = codec.loads(response.content)
         if not isinstance(payload, dict):
             raise ValueError("Unexpected schema format")
         return payload, None
@@ -240,7 +310,7 @@ def fetch_ucp_schema(
                 meta["url"] = fallback_url
         if payload is None:
             raise ValueError("Schema not found")
-        _write_cache(cache_path, payload)
+        _schemas().set(schema_url, payload)
         return payload, meta
     except Exception as exc:
         meta["error"] = str(exc)
@@ -248,7 +318,7 @@ def fetch_ucp_schema(
     if cached:
         meta["cached"] = True
         meta["stale"] = True
-        return cached, meta
+        return cached.value, meta
 
     return None, meta
 
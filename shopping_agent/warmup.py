@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any, Optional
+import asyncio
+import threading
+import time
+
+from shopping_agent import http
+from shopping_agent.config import config
+from shopping_agent.exchange_rate import get_daily_rates
+from shopping_agent.ucp import fetch_ucp_schema, resolve_ucp_endpoint
+
+
+class WarmupState:
+    """상점별 워밍업 진행 상태 (readiness 응답용)"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._targets: dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def reset(self, names: list[str]) -> None:
+        with self._lock:
+            self._targets = {name: {"status": "pending"} for name in names}
+            self.started_at = time.time()
+            self.finished_at = None
+
+    def update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._targets.setdefault(name, {}).update(fields)
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        # 워밍업이 끝나면 일부 상점이 실패했더라도 트래픽을 받습니다 (실패 상점은 요청 시 재시도).
+        return self.finished_at is not None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.finished_at is not None,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "targets": {name: dict(fields) for name, fields in self._targets.items()},
+            }
+
+
+warmup_state = WarmupState()
+
+
+def warm_up_store(store_url: str) -> dict:
+    """매니페스트/엔드포인트/스키마를 캐시에 올리고 상점·UCP 호스트에 미리 연결합니다."""
+    started = time.perf_counter()
+    result: dict = {"connected": http.preconnect(store_url)}
+
+    endpoint, meta = resolve_ucp_endpoint(store_url)
+    result["endpoint"] = endpoint
+    if not endpoint:
+        result["error"] = meta.get("error", "unknown")
+    else:
+        result["endpoint_connected"] = http.preconnect(endpoint)
+        schema_url = meta.get("schema_url")
+        if schema_url:
+            schema, schema_meta = fetch_ucp_schema(schema_url)
+            result["schema"] = schema is not None
+            if schema is None:
+                result["error"] = schema_meta.get("error", "unknown")
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def warm_up_exchange_rates() -> dict:
+    started = time.perf_counter()
+    if not config.exim_auth_key:
+        return {"skipped": "EXIM_AUTH_KEY not set"}
+    rates, meta = get_daily_rates(config.exim_auth_key)
+    result = {"rates": bool(rates), "date": meta.get("date")}
+    if meta.get("error"):
+        result["error"] = meta["error"]
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def warm_up_graphs(graphs: Mapping[str, Any]) -> dict:
+    """상점 그래프를 미리 컴파일합니다. 첫 요청이 이벤트 루프에서 컴파일하느라 다른 스트림을 멈추지 않게 합니다."""
+    started = time.perf_counter()
+    built, errors = [], {}
+    for name in graphs:
+        try:
+            graphs[name]
+        except Exception as exc:
+            errors[name] = str(exc)
+        else:
+            built.append(name)
+    result: dict = {"built": built}
+    if errors:
+        result["error"] = "; ".join(f"{name}: {error}" for name, error in errors.items())
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def warm_up_all(
+    store_urls: dict[str, Optional[str]],
+    state: WarmupState = warmup_state,
+    graphs: Optional[Mapping[str, Any]] = None,
+) -> dict:
+    """모든 상점과 환율(그리고 graphs가 있으면 상점 그래프)을 동시에 워밍업합니다.
+
+    실패는 상태에만 기록하고 예외를 올리지 않습니다.
+    """
+    targets = {name: url for name, url in store_urls.items() if url}
+    state.reset(list(targets) + ["exchange_rate"] + (["graphs"] if graphs is not None else []))
+
+    async def _run(name: str, func, *args) -> None:
+        state.update(name, status="warming")
+        try:
+            result = await asyncio.to_thread(func, *args)
+        except Exception as exc:
+            state.update(name, status="error", error=str(exc))
+            return
+        status = "error" if result.get("error") else "ready"
+        state.update(name, status=status, **result)
+
+    jobs = [_run(name, warm_up_store, url) for name, url in targets.items()]
+    jobs.append(_run("exchange_rate", warm_up_exchange_rates))
+    if graphs is not None:
+        jobs.append(_run("graphs", warm_up_graphs, graphs))
+    await asyncio.gather(*jobs)
+    state.finish()
+    return state.snapshot()
@@ -0,0 +1,114 @@
+"""
+codec 백엔드(orjson / 표준 json) 출력 일치 테스트
+
+캐시 키(tool_cache)와 L2 캐시 값이 백엔드에 따라 달라지지 않도록
+두 백엔드 모두 표준 json의 compact 출력(ensure_ascii=False, separators=(",", ":"))과 같은 바이트를 내는지 확인합니다.
+"""
+
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+
+import pytest
+
+from shopping_agent import codec
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        if codec.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(codec, "orjson", None)
+    return request.param
+
+
+def _reference(obj, sort_keys=False, default=None) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+
+
+CASES = {
+    "non_ascii": {"title": "메리노 니트 — Merino ✓", "emoji": "🛒", "control": "\x00\x1f "},
+    "nested": {"b": [1, 2.5, None, True, False], "a": {"d": "x", "c": [{"z": 1, "y": 2}]}},
+    "int_keys": {1: "a", 2: "b", 10: "c"},
+    "mixed_keys": {"s": 1, 2: "b", True: None, None: 0, 1.5: "f"},
+    "big_int": {"id": 2 ** 70, "neg": -(2 ** 64), "nested": [{"sku": 2 ** 65 + 1}]},
+    "u64_edge": {"max": 2 ** 64 - 1, "min": -(2 ** 63)},
+    "shopify_ids": {"id": 7000000001, "variants": [{"id": 40000000000 + i, "price": 12800} for i in range(3)]},
+    "empty": {"list": [], "dict": {}, "str": ""},
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_dumps_matches_stdlib(backend, name):
+    obj = CASES[name]
+    expected = _reference(obj)
+    assert codec.dumps(obj) == expected
+    assert codec.dumpb(obj) == expected.encode("utf-8")
+
+
+@pytest.mark.parametrize("name", ["non_ascii", "nested", "int_keys", "big_int", "shopify_ids", "empty"])
+def test_sort_keys_matches_stdlib(backend, name):
+    obj = CASES[name]
+    expected = _reference(obj, sort_keys=True)
+    assert codec.dumps(obj, sort_keys=True) == expected
+    assert codec.dumpb(obj, sort_keys=True) == expected.encode("utf-8")
+
+
+def test_sort_keys_with_unorderable_keys_raises_like_stdlib(backend):
+    with pytest.raises(TypeError):
+        _reference(CASES["mixed_keys"], sort_keys=True)
+    with pytest.raises(TypeError):
+        codec.dumps(CASES["mixed_keys"], sort_keys=True)
+
+
+def test_default_hook(backend):
+    obj = {"price": Decimal("12.80"), "when": {"d": Decimal("1")}}
+    assert codec.dumps(obj, sort_keys=True, default=str) == _reference(obj, sort_keys=True, default=str)
+    with pytest.raises(TypeError):
+        codec.dumps(obj)
+
+
+# 키가 문자열로 바뀌는 경우와, orjson이 float로 읽는 64비트 밖 정수는 제외
+@pytest.mark.parametrize("name", sorted(set(CASES) - {"int_keys", "mixed_keys", "big_int"}))
+def test_round_trip(backend, name):
+    obj = CASES[name]
+    assert codec.loads(codec.dumpb(obj)) == obj
+    assert codec.loads(codec.dumps(obj)) == obj
+
+
+def test_big_int_round_trip_on_stdlib_backend(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+    obj = CASES["big_int"]
+    assert codec.loads(codec.dumpb(obj)) == obj
+
+
+def test_floats_round_trip(backend):
+    # 지수 표기(1.5e-07 / 1.5e-7)는 백엔드마다 다를 수 있으나 값은 같아야 합니다.
+    values = [0.1, -0.0, 1.5e-7, 1e16, 1e300, 123456789012345678.0]
+    assert codec.loads(codec.dumps(values)) == values
+
+
+def test_loads_accepts_bytes_and_str(backend):
+    text = _reference(CASES["non_ascii"])
+    assert codec.loads(text) == CASES["non_ascii"]
+    assert codec.loads(text.encode("utf-8")) == CASES["non_ascii"]
+    assert codec.loads(bytearray(text.encode("utf-8"))) == CASES["non_ascii"]
+    assert codec.loads(memoryview(text.encode("utf-8"))) == CASES["non_ascii"]
+
+
+def test_loads_invalid_raises_value_error(backend):
+    with pytest.raises(ValueError):
+        codec.loads(b"{not json")
+
+
+def test_decode_product_and_checkout(backend):
+    raw = _reference({"id": 1, "variants": [{"id": 2}, "junk", None]}).encode("utf-8")
+    assert codec.decode_product(raw)["variants"] == [{"id": 2}]
+    assert codec.decode_checkout({"id": "c", "line_items": "junk"})["line_items"] == []
+    with pytest.raises(ValueError):
+        codec.decode_product(b"[]")
+    with pytest.raises(ValueError):
+        codec.decode_checkout("null")
@@ -0,0 +1,194 @@
+"""
+여러 워커 프로세스가 같은 STATE_DIR을 공유할 때의 동작
+
+uvicorn --workers N처럼 프로세스마다 따로 뜬 워커가 대화 기록(체크포인트)과
+체크아웃 세션을 SQLite 공유 저장소로 이어받는지, 워커를 늘리면 처리량도 늘어나는지
+(공유 저장소가 워커 사이에서 요청을 직렬화하지 않는지) 확인합니다.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import operator
+import time
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.runnables import RunnableConfig
+
+STORE_URL = "https://example-store.test"
+
+# 처리량 테스트: 실행당 고정 지연(초)과 동시에 진행하는 대화 수
+_CALL_DELAY = 0.1
+_CONVERSATIONS = 12
+
+
+class _ChatState(TypedDict):
+    messages: Annotated[list[str], operator.add]
+
+
+def _chat_graph():
+    from langgraph.graph import END, START, StateGraph
+
+    from shopping_agent.checkpoint import get_checkpointer
+
+    def reply(state: _ChatState, config: RunnableConfig) -> dict:
+        # 모델 호출 대기를 흉내 내는 고정 지연 (처리량 테스트용)
+        time.sleep(config["configurable"].get("delay", 0.0))
+        return {"messages": [f"reply:{len(state['messages'])}"]}
+
+    builder = StateGraph(_ChatState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=get_checkpointer())
+
+
+def _worker(commands, results) -> None:
+    """명령 큐를 읽어 처리하는 워커 프로세스 (spawn으로 시작해 config를 새로 읽음)"""
+    from shopping_agent.checkout_sessions import session_cache
+
+    graph = None
+    for command, *args in iter(commands.get, None):
+        try:
+            if command == "chat":
+                thread_id, text, *rest = args
+                graph = graph or _chat_graph()
+                configurable = {"thread_id": thread_id, "delay": rest[0] if rest else 0.0}
+                state = graph.invoke({"messages": [text]}, {"configurable": configurable})
+                results.put(state["messages"])
+            elif command == "put":
+                session_cache.put(STORE_URL, args[0])
+                results.put(True)
+            elif command == "get":
+                results.put(session_cache.get(STORE_URL, args[0]))
+            elif command == "invalidate":
+                session_cache.invalidate(STORE_URL, args[0])
+                results.put(True)
+        except Exception as exc:  # 부모 쪽 assert에서 보이도록 전달
+            results.put(f"error: {exc!r}")
+
+
+class _Worker:
+    def __init__(self, ctx) -> None:
+        self._commands = ctx.Queue()
+        self._results = ctx.Queue()
+        self.process = ctx.Process(target=_worker, args=(self._commands, self._results), daemon=True)
+        self.process.start()
+
+    def call(self, *command):
+        self._commands.put(command)
+        return self._results.get(timeout=60)
+
+    def submit(self, *command) -> None:
+        self._commands.put(command)
+
+    def result(self):
+        return self._results.get(timeout=60)
+
+    def stop(self) -> None:
+        self._commands.put(None)
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.kill()
+
+
+@pytest.fixture
+def spawn_workers(tmp_path, monkeypatch):
+    # spawn된 워커는 이 환경 변수로 config를 만듭니다.
+    monkeypatch.setenv("STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("CHECKPOINT_PATH", raising=False)
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    ctx = multiprocessing.get_context("spawn")
+    started: list[_Worker] = []
+
+    def spawn(count: int) -> list[_Worker]:
+        workers = [_Worker(ctx) for _ in range(count)]
+        started.extend(workers)
+        return workers
+
+    yield spawn
+    for worker in started:
+        worker.stop()
+
+
+@pytest.fixture
+def workers(spawn_workers):
+    return spawn_workers(2)
+
+
+def test_thread_history_continues_across_workers(workers):
+    first, second = workers
+
+    assert first.call("chat", "thread-1", "hello") == ["hello", "reply:1"]
+    # 다음 턴이 다른 워커로 가도 같은 thread의 기록을 이어서 씁니다.
+    assert second.call("chat", "thread-1", "again") == ["hello", "reply:1", "again", "reply:3"]
+    assert first.call("chat", "thread-1", "third") == [
+        "hello", "reply:1", "again", "reply:3", "third", "reply:5",
+    ]
+    # 다른 thread는 섞이지 않습니다.
+    assert second.call("chat", "thread-2", "other") == ["other", "reply:1"]
+
+
+def test_checkout_session_put_and_invalidate_visible_across_workers(workers):
+    first, second = workers
+    checkout = {"id": "chk-1", "status": "ready_for_complete", "currency": "USD"}
+
+    assert second.call("get", "chk-1") is None
+    assert first.call("put", checkout) is True
+    assert second.call("get", "chk-1") == checkout
+
+    # 다른 워커의 갱신이 이미 로컬에 들고 있던 세션보다 우선합니다.
+    updated = {**checkout, "status": "completed"}
+    assert second.call("put", updated) is True
+    assert first.call("get", "chk-1") == updated
+
+    assert second.call("invalidate", "chk-1") is True
+    assert first.call("get", "chk-1") is None
+    assert second.call("get", "chk-1") is None
+
+
+def _run_turns(workers: list[_Worker], turn: int) -> dict[str, list[str]]:
+    """대화마다 한 턴씩, 워커에 돌아가며 배정해 실행합니다 (턴마다 다른 워커가 받도록 한 칸씩 밀어 배정)."""
+    assigned: dict[int, list[str]] = {index: [] for index in range(len(workers))}
+    for number in range(_CONVERSATIONS):
+        index = (number + turn) % len(workers)
+        thread_id = f"load-{number}"
+        assigned[index].append(thread_id)
+        workers[index].submit("chat", thread_id, f"turn-{turn}", _CALL_DELAY)
+    histories: dict[str, list[str]] = {}
+    for index, thread_ids in assigned.items():
+        for thread_id in thread_ids:
+            histories[thread_id] = workers[index].result()
+    return histories
+
+
+def _throughput(workers: list[_Worker]) -> float:
+    # 워커 시작(import)과 그래프 컴파일은 측정에서 뺍니다.
+    for index, worker in enumerate(workers):
+        assert worker.call("chat", f"warmup-{index}", "hi") == ["hi", "reply:1"]
+
+    started = time.perf_counter()
+    _run_turns(workers, 0)
+    histories = _run_turns(workers, 1)
+    elapsed = time.perf_counter() - started
+
+    # 두 번째 턴은 다른 워커가 받았어도 첫 턴 기록을 이어서 씁니다.
+    for history in histories.values():
+        assert history == ["turn-0", "reply:1", "turn-1", "reply:3"]
+    return 2 * _CONVERSATIONS / elapsed
+
+
+def test_throughput_scales_with_worker_count(spawn_workers, tmp_path, monkeypatch):
+    # 워커 하나는 한 번에 한 실행만 처리하고, 실행마다 고정 지연(_CALL_DELAY)이 있습니다.
+    # 같은 STATE_DIR을 쓰는 워커 두 개면 공유 체크포인트가 병목이 아닌 한 처리량이 거의 두 배가 됩니다.
+    single = _throughput(spawn_workers(1))
+
+    # 두 번째 측정은 새 STATE_DIR에서 (이전 측정의 대화와 섞이지 않게)
+    monkeypatch.setenv("STATE_DIR", str(tmp_path / "pair"))
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "pair" / "cache.sqlite"))
+    pair = _throughput(spawn_workers(2))
+
+    assert pair > single * 1.5, f"1 worker {single:.1f}/s, 2 workers {pair:.1f}/s"
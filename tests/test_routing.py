@@ -0,0 +1,71 @@
+"""
+라우터의 고정(sticky) 라우팅 규칙 테스트
+
+직전 상점이 있는 스레드에서 로컬 분류기만으로 다른 상점으로 옮기는 것은
+상점명/브랜드를 직접 언급한 경우뿐이고, 상품 키워드나 모델 추측은 LLM 재라우팅으로 넘깁니다.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from shopping_agent.agents.classifier import StorePrediction, classify_store
+from shopping_agent.agents.routing import _resolve_sticky
+
+STORES = {"monos": None, "everlane": None, "allbirds": None, "kith": None, "general": None}
+
+
+def _resolve(previous: str, text: str) -> tuple:
+    return _resolve_sticky(previous, text, classify_store(text), STORES)
+
+
+@pytest.mark.parametrize(
+    "previous, text",
+    [
+        ("kith", "t-shirt"),
+        ("kith", "jeans"),
+        ("kith", "denim jacket"),
+        ("kith", "sweater 있어?"),
+        ("everlane", "tree"),
+    ],
+)
+def test_product_guess_does_not_switch_store(previous, text):
+    store, reason = _resolve(previous, text)
+    assert reason != "switch"
+    assert store in (previous, None)
+
+
+@pytest.mark.parametrize(
+    "previous, text, expected",
+    [
+        ("kith", "에버레인에서 티셔츠 보여줘", "everlane"),
+        ("kith", "allbirds 신발 보여줘", "allbirds"),
+        ("everlane", "나이키 덩크 있어?", "kith"),
+        ("everlane", "monos 캐리어", "monos"),
+    ],
+)
+def test_store_name_or_brand_switches_locally(previous, text, expected):
+    assert _resolve(previous, text) == (expected, "switch")
+
+
+def test_model_guess_for_other_store_goes_to_llm():
+    prediction = StorePrediction("everlane", 0.99, "model")
+    assert _resolve_sticky("kith", "sweater 있어?", prediction, STORES) == (None, "possible-switch")
+
+
+def test_keyword_match_for_other_store_goes_to_llm():
+    prediction = StorePrediction("everlane", 0.9, "lexicon+model")
+    assert _resolve_sticky("kith", "t-shirt", prediction, STORES) == (None, "possible-switch")
+
+
+def test_purchase_intent_stays_on_previous_store():
+    assert _resolve("kith", "그거 결제해줘") == ("kith", "purchase")
+    assert _resolve("kith", "I want to buy the t-shirt") == ("kith", "purchase")
+
+
+def test_ambiguous_store_mention_goes_to_llm():
+    assert _resolve("kith", "monos랑 allbirds 중에 뭐가 좋아?") == (None, "ambiguous")
+
+
+def test_follow_up_stays():
+    assert _resolve("kith", "사이즈 10 재고 있어?") == ("kith", "follow-up")
@@ -0,0 +1,100 @@
+"""
+도구 결과 캐시 미들웨어 테스트
+
+- 같은 thread의 같은 인자 호출은 도구를 다시 실행하지 않고, 처음 보낸 화면용 이벤트를 다시 보냅니다.
+- 비동기 경로는 SharedStore(SQLite) 조회/저장을 이벤트 루프 스레드에서 하지 않습니다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from langchain_core.messages import ToolMessage
+
+from shopping_agent.agents import tool_cache
+from shopping_agent.agents.tool_cache import ToolResultCacheMiddleware
+from shopping_agent.shared_store import SharedStore
+from shopping_agent.tools import output
+
+
+class _RecordingStore(SharedStore):
+    """SharedStore 호출이 어느 스레드에서 일어났는지 기록"""
+
+    def __init__(self, path) -> None:
+        super().__init__(path)
+        self.threads: list[int] = []
+
+    def _record(self) -> None:
+        self.threads.append(threading.get_ident())
+
+    def get(self, *args, **kwargs):
+        self._record()
+        return super().get(*args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        self._record()
+        return super().put(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        self._record()
+        return super().incr(*args, **kwargs)
+
+    def clear(self, *args, **kwargs):
+        self._record()
+        return super().clear(*args, **kwargs)
+
+
+def _request(name: str, args: dict, call_id: str = "call-1"):
+    runtime = SimpleNamespace(config={"configurable": {"thread_id": "thread-1"}})
+    return SimpleNamespace(tool_call={"name": name, "args": args, "id": call_id}, runtime=runtime)
+
+
+def _middleware(tmp_path):
+    store = _RecordingStore(tmp_path / "shared.sqlite")
+    return ToolResultCacheMiddleware(store=lambda: store), store
+
+
+def test_async_hit_skips_tool_and_replays_events(tmp_path, monkeypatch):
+    middleware, store = _middleware(tmp_path)
+    emitted: list = []
+    monkeypatch.setattr(tool_cache, "emit", lambda name, value: emitted.append((name, value)))
+    calls: list = []
+
+    async def handler(request):
+        calls.append(request.tool_call["id"])
+        # 실제 도구처럼 output.emit으로 상품 카드를 보냅니다 (record_events가 기록).
+        output.emit("products", {"items": [1, 2]})
+        return ToolMessage(content='{"total":2}', tool_call_id=request.tool_call["id"], name="search_product")
+
+    async def run():
+        loop_thread = threading.get_ident()
+        first = await middleware.awrap_tool_call(_request("search_product", {"q": "dunk"}), handler)
+        second = await middleware.awrap_tool_call(_request("search_product", {"q": "dunk"}, "call-2"), handler)
+        return loop_thread, first, second
+
+    loop_thread, first, second = asyncio.run(run())
+
+    assert calls == ["call-1"]
+    assert second.content == first.content == '{"total":2}'
+    assert second.tool_call_id == "call-2"
+    assert second.response_metadata["tool_cache"]["hit"] is True
+    assert emitted == [("products", {"items": [1, 2]})]
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_state_change_invalidates_thread_cache(tmp_path):
+    middleware, _ = _middleware(tmp_path)
+    runs: list = []
+
+    def handler(request):
+        runs.append(request.tool_call["name"])
+        return ToolMessage(content="ok", tool_call_id=request.tool_call["id"], name=request.tool_call["name"])
+
+    middleware.wrap_tool_call(_request("get_shipping_address_info", {}), handler)
+    middleware.wrap_tool_call(_request("get_shipping_address_info", {}), handler)
+    middleware.wrap_tool_call(_request("set_shipping_address", {"country": "KR"}), handler)
+    middleware.wrap_tool_call(_request("get_shipping_address_info", {}), handler)
+
+    assert runs == ["get_shipping_address_info", "set_shipping_address", "get_shipping_address_info"]
@@ -0,0 +1,67 @@
+"""
+워밍업 테스트: 상점 그래프는 /ready 전에, 이벤트 루프 밖에서 컴파일됩니다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from shopping_agent.agents.registry import StoreGraphRegistry
+from shopping_agent.agents.routing import _aget_graph
+from shopping_agent.warmup import WarmupState, warm_up_all
+
+
+def _registry(names, threads: list, fail: str = ""):
+    def factory(name: str):
+        threads.append(threading.get_ident())
+        if name == fail:
+            raise RuntimeError("compile failed")
+        return f"graph:{name}"
+
+    return StoreGraphRegistry(names, factory)
+
+
+def test_warm_up_builds_graphs_off_loop(monkeypatch):
+    monkeypatch.setattr("shopping_agent.warmup.warm_up_exchange_rates", lambda: {"skipped": "test"})
+    threads: list = []
+    graphs = _registry(["kith", "monos"], threads)
+    state = WarmupState()
+
+    async def run():
+        return threading.get_ident(), await warm_up_all({}, state, graphs=graphs)
+
+    loop_thread, snapshot = asyncio.run(run())
+
+    assert snapshot["ready"] is True
+    assert snapshot["targets"]["graphs"]["status"] == "ready"
+    assert snapshot["targets"]["graphs"]["built"] == ["kith", "monos"]
+    assert graphs.built() == ["kith", "monos"]
+    assert threads and loop_thread not in threads
+
+
+def test_warm_up_records_graph_errors(monkeypatch):
+    monkeypatch.setattr("shopping_agent.warmup.warm_up_exchange_rates", lambda: {"skipped": "test"})
+    graphs = _registry(["kith", "monos"], [], fail="monos")
+    state = WarmupState()
+
+    snapshot = asyncio.run(warm_up_all({}, state, graphs=graphs))
+
+    assert snapshot["ready"] is True
+    assert snapshot["targets"]["graphs"]["status"] == "error"
+    assert "monos" in snapshot["targets"]["graphs"]["error"]
+    assert graphs.built() == ["kith"]
+
+
+def test_lazy_graph_compiles_off_loop():
+    threads: list = []
+    graphs = _registry(["kith"], threads)
+
+    async def run():
+        return threading.get_ident(), await _aget_graph(graphs, "kith"), await _aget_graph(graphs, "kith")
+
+    loop_thread, first, second = asyncio.run(run())
+
+    assert first == second == "graph:kith"
+    assert threads and loop_thread not in threads
+    assert len(threads) == 1